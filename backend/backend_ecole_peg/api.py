@@ -2,10 +2,17 @@ from ninja import NinjaAPI
 from eleves.api import router as eleves_router
 from cours.api import router as cours_router
 from factures.api import router as factures_router
+from recherche.api import router as recherche_router
+from performance.api import router as performance_router
+from taches.api import router as taches_router
 from .auth_api import router as auth_router
+from .renderers import RenduJSON
 
-api = NinjaAPI(title="API École PEG", version="1.0")
+api = NinjaAPI(title="API École PEG", version="1.0", renderer=RenduJSON())
 api.add_router("/eleves/", eleves_router, tags=["Élèves"])
 api.add_router("/cours/", cours_router, tags=["Cours"])
 api.add_router("/factures/", factures_router, tags=["Factures"])
+api.add_router("/recherche/", recherche_router, tags=["Recherche"])
+api.add_router("/taches/", taches_router, tags=["Tâches"])
 api.add_router("/auth/", auth_router, tags=["Auth"])
+api.add_router("/_perf/", performance_router, tags=["Performance"])
@@ -0,0 +1,83 @@
+"""
+Lectures ORM indépendantes exécutées en parallèle depuis une vue async.
+
+L'ORM async de Django 4.2 (acount, afirst…) passe par
+sync_to_async(thread_sensitive=True) : toutes les requêtes d'une requête
+HTTP partagent un même thread, et un asyncio.gather de plusieurs appels les
+exécute l'un après l'autre. ``en_parallele`` lance au contraire chaque
+fonction dans un thread du pool, donc sur sa propre connexion :
+
+    resultats = await en_parallele(factures=panneau_factures, cours=panneau_cours)
+
+Seulement avec le pool de connexions (DB_POOL_TAILLE > 0) : sans lui, chaque
+thread ouvrirait puis fermerait sa propre connexion (TCP, authentification,
+init_command), ce qui coûte plus que les lectures recouvertes. Sans pool, et
+sous SQLite, les fonctions s'exécutent l'une après l'autre sur la connexion
+de la requête, qui lit alors un seul état de la base.
+
+Les execute_wrapper posés sur les connexions du thread de la requête
+(InstrumentationSQLMiddleware, banc_endpoints, conseiller_index) sont repris
+dans chaque thread, et les connexions y sont fermées (ou rendues au pool,
+voir performance.connexions) en fin de fonction : sous WSGI, async_to_sync
+crée un pool de threads par requête, dont les threads ne sont pas
+réutilisés, et une connexion gardée selon CONN_MAX_AGE y resterait ouverte.
+
+``verrouiller_libres`` sert les traitements de type file d'attente : chaque
+worker réserve des lignes sans attendre celles qu'un autre a déjà verrouillées.
+"""
+import asyncio
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import QuerySet
+
+
+def _wrappers_courants() -> Dict[str, List[Callable]]:
+    return {c.alias: list(c.execute_wrappers) for c in connections.all() if c.execute_wrappers}
+
+
+def _isoler(fonction: Callable, wrappers: Dict[str, List[Callable]]) -> Callable:
+    def executer():
+        try:
+            with ExitStack() as pile:
+                for alias, liste in wrappers.items():
+                    for wrapper in liste:
+                        pile.enter_context(connections[alias].execute_wrapper(wrapper))
+                return fonction()
+        finally:
+            connections.close_all()
+
+    return sync_to_async(executer, thread_sensitive=False)
+
+
+def _en_sequence(fonctions: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+    return {nom: fonction() for nom, fonction in fonctions.items()}
+
+
+async def en_parallele(**fonctions: Callable[[], Any]) -> Dict[str, Any]:
+    """Appelle chaque fonction (sans argument) dans son thread ; résultats par nom."""
+    if connection.vendor == "sqlite" or not settings.DB_POOL_TAILLE:
+        # SQLite s'exécute dans le processus : des threads n'ajouteraient que
+        # de la contention sur le GIL, sans attente réseau à recouvrir.
+        # Sans pool, une connexion neuve par thread coûte plus qu'elle ne rapporte
+        return await sync_to_async(_en_sequence)(fonctions)
+    wrappers = await sync_to_async(_wrappers_courants)()
+    resultats = await asyncio.gather(*(_isoler(f, wrappers)() for f in fonctions.values()))
+    return dict(zip(fonctions, resultats))
+
+
+def verrouiller_libres(qs: QuerySet) -> QuerySet:
+    """
+    SELECT … FOR UPDATE SKIP LOCKED (à évaluer dans une transaction).
+
+    Sans SKIP LOCKED (MySQL < 8, MariaDB < 10.6), le verrou attend que les
+    lignes se libèrent : les workers se relaient au lieu de se répartir les
+    lignes. SQLite ignore FOR UPDATE, ses transactions d'écriture étant déjà
+    exclusives.
+    """
+    if connections[qs.db].features.has_select_for_update_skip_locked:
+        return qs.select_for_update(skip_locked=True)
+    return qs.select_for_update()
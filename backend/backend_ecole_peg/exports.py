@@ -0,0 +1,183 @@
+"""
+Exports tableur : CSV en flux, XLSX produit par le worker.
+
+Un export est déclaré dans le ``exports.py`` d'une app :
+
+    @export("eleves")
+    def exporter_eleves(recherche=None, statut=None) -> Tableau: ...
+
+La fonction reçoit les filtres (sérialisables en JSON) et renvoie un
+``Tableau`` : nom de fichier, en-têtes et un itérable de lignes produit par
+``parcourir``, qui lit la base par lots de EXPORTS_TAILLE_LOT lignes. Rien
+n'est chargé en entier : la mémoire ne dépend pas du nombre de lignes.
+
+``repondre(request, nom, format, **filtres)`` sert l'export depuis un endpoint :
+
+- ``csv`` : StreamingHttpResponse écrite au fil de la lecture (UTF-8 avec BOM,
+  séparateur EXPORTS_SEPARATEUR_CSV, pour une ouverture directe dans Excel) ;
+- ``xlsx`` : tâche ``exporter_xlsx`` mise en file (réponse 202 avec son id).
+  Le worker écrit le classeur avec openpyxl en mode write_only dans
+  EXPORTS_DOSSIER (stockage par défaut) ; GET /api/taches/{id}/ suit la
+  tâche, GET /api/taches/{id}/fichier/ télécharge le fichier une fois terminée.
+"""
+import csv
+import json
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Literal, Sequence
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from taches.file import planifier
+
+from .pagination import filtre_apres
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    openpyxl = None
+
+# Paramètre ``format`` des endpoints d'export
+FormatExport = Literal["csv", "xlsx"]
+
+
+@dataclass
+class Tableau:
+    nom: str
+    entetes: Sequence[str]
+    lignes: Iterable[Sequence[Any]]
+
+
+EXPORTS: Dict[str, Callable[..., Tableau]] = {}
+
+
+def export(nom: str):
+    def enregistrer(fonction):
+        EXPORTS[nom] = fonction
+        return fonction
+
+    return enregistrer
+
+
+def tableau(nom: str, filtres: dict) -> Tableau:
+    if nom not in EXPORTS:
+        # Worker : les exports.py des apps ne sont pas importés par les URLs
+        autodiscover_modules("exports")
+    return EXPORTS[nom](**filtres)
+
+
+# ------------------- LECTURE -------------------
+def parcourir(qs, tri: Sequence[str]):
+    """
+    Lignes de ``qs`` triées sur ``tri`` (terminé par une clé unique), lues par
+    lots. ``.iterator()`` garde un curseur ouvert et lit EXPORTS_TAILLE_LOT
+    lignes à la fois (curseur serveur sous PostgreSQL) ; PyMySQL, lui,
+    rapatrierait tout le résultat : sous MySQL les lots sont relus par clé
+    (``filtre_apres``, comme la pagination par curseur). Avec ``tri``, les
+    lignes doivent être des dicts (``values()``) contenant les champs de tri.
+    """
+    qs = qs.order_by(*tri)
+    taille = settings.EXPORTS_TAILLE_LOT
+    if connections[qs.db].vendor != "mysql":
+        yield from qs.iterator(chunk_size=taille)
+        return
+    cle = None
+    while True:
+        lot = list((qs.filter(filtre_apres(tri, cle)) if cle else qs)[:taille])
+        yield from lot
+        if len(lot) < taille:
+            return
+        cle = [lot[-1][champ.lstrip("-")] for champ in tri]
+
+
+# ------------------- CSV -------------------
+class _Tampon:
+    """csv.writer écrit dans ce « fichier », qui renvoie la ligne au lieu de la garder."""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _morceaux_csv(donnees: Tableau, lignes_par_morceau: int = 500):
+    ecrivain = csv.writer(_Tampon(), delimiter=settings.EXPORTS_SEPARATEUR_CSV)
+    yield "\ufeff" + ecrivain.writerow(donnees.entetes)
+    morceau = []
+    for ligne in donnees.lignes:
+        morceau.append(ecrivain.writerow(ligne))
+        if len(morceau) >= lignes_par_morceau:
+            yield "".join(morceau)
+            morceau = []
+    if morceau:
+        yield "".join(morceau)
+
+
+async def _flux_async(morceaux):
+    # Sous ASGI, Django chargerait un itérateur synchrone en entier avant
+    # l'envoi : on le lit morceau par morceau, dans le thread de la requête
+    suivant = sync_to_async(next, thread_sensitive=True)
+    while True:
+        morceau = await suivant(morceaux, None)
+        if morceau is None:
+            return
+        yield morceau
+
+
+def reponse_csv(request, donnees: Tableau) -> StreamingHttpResponse:
+    morceaux = _morceaux_csv(donnees)
+    response = StreamingHttpResponse(
+        _flux_async(morceaux) if isinstance(request, ASGIRequest) else morceaux,
+        content_type="text/csv; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{donnees.nom}.csv"'
+    return response
+
+
+# ------------------- XLSX -------------------
+def ecrire_xlsx(nom: str, filtres: dict) -> dict:
+    """Exécuté par le worker (tâche ``exporter_xlsx``) ; renvoie le chemin du fichier écrit."""
+    donnees = tableau(nom, filtres)
+    classeur = openpyxl.Workbook(write_only=True)
+    feuille = classeur.create_sheet(nom[:31])
+    feuille.append(list(donnees.entetes))
+    nombre = 0
+    for ligne in donnees.lignes:
+        feuille.append(list(ligne))
+        nombre += 1
+    with tempfile.TemporaryFile() as fichier:
+        classeur.save(fichier)
+        fichier.seek(0)
+        chemin = default_storage.save(
+            f"{settings.EXPORTS_DOSSIER}/{donnees.nom}_{timezone.now():%Y%m%d_%H%M%S}.xlsx",
+            File(fichier),
+        )
+    return {"fichier": chemin, "lignes": nombre}
+
+
+def repondre(request, nom: str, format: str, **filtres):
+    if format == "xlsx":
+        if openpyxl is None:
+            return JsonResponse(
+                {"message": "Export XLSX indisponible : openpyxl n'est pas installé."}, status=501
+            )
+        # Dates des filtres en texte ISO pour les arguments JSON de la tâche
+        filtres = json.loads(json.dumps(filtres, cls=DjangoJSONEncoder))
+        tache = planifier("exporter_xlsx", export=nom, filtres=filtres)
+        return JsonResponse(
+            {
+                "tache_id": tache.id,
+                "statut": tache.statut,
+                "suivi": f"/api/taches/{tache.id}/",
+                "fichier": f"/api/taches/{tache.id}/fichier/",
+            },
+            status=202,
+        )
+    return reponse_csv(request, tableau(nom, filtres))
@@ -0,0 +1,42 @@
+"""
+Lecture par lots : ``?ids=3,1,2`` sur les listes remplace un appel au détail
+par identifiant. Une seule requête ``id__in``, résultats dans l'ordre de la
+demande ; les ids inexistants sont simplement absents.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from ninja.errors import HttpError
+
+TAILLE_MAX_LOT = 200
+
+
+def analyser_ids(ids: Optional[str]) -> Optional[List[int]]:
+    """``"3,1,3,2"`` -> ``[3, 1, 2]`` ; None si le paramètre est absent."""
+    if ids is None:
+        return None
+    try:
+        valeurs = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HttpError(400, "Paramètre ids invalide : entiers séparés par des virgules attendus")
+    valeurs = list(dict.fromkeys(valeurs))
+    if len(valeurs) > TAILLE_MAX_LOT:
+        raise HttpError(400, f"Au plus {TAILLE_MAX_LOT} ids par appel")
+    return valeurs
+
+
+def dans_l_ordre(objets: Iterable[Any], ids: List[int]) -> List[Any]:
+    """Remet ``objets`` (dicts ou instances portant ``id``) dans l'ordre de ``ids``."""
+    par_id: Dict[int, Any] = {
+        (o["id"] if isinstance(o, dict) else o.id): o for o in objets
+    }
+    return [par_id[i] for i in ids if i in par_id]
+
+
+def reponse_lot(cle: str, objets: List[Any]) -> dict:
+    """Même forme que les listes paginées, sur une seule page."""
+    return {
+        cle: objets,
+        "nombre_total": len(objets),
+        "a_suivant": False,
+        "curseur_suivant": None,
+    }
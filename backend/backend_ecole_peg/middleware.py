@@ -0,0 +1,93 @@
+import gzip
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .routage import COOKIE_ECRITURE, replica_configuree
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+ACCEPTE_BROTLI = re.compile(r"\bbr\b")
+ACCEPTE_GZIP = re.compile(r"\bgzip\b")
+
+
+class CompressionReponseMiddleware:
+    """
+    Compresse les réponses JSON volumineuses selon Accept-Encoding :
+    brotli si le module est installé et accepté par le client, sinon gzip.
+    Activé par COMPRESSION_REPONSES ; en dessous de COMPRESSION_SEUIL octets
+    la réponse part telle quelle.
+    """
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_REPONSES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.seuil = settings.COMPRESSION_SEUIL
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith("application/json")
+            or len(response.content) < self.seuil
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        accepte = request.META.get("HTTP_ACCEPT_ENCODING", "")
+
+        if brotli is not None and ACCEPTE_BROTLI.search(accepte):
+            contenu, encodage = brotli.compress(response.content, quality=4), "br"
+        elif ACCEPTE_GZIP.search(accepte):
+            contenu, encodage = gzip.compress(response.content, compresslevel=6), "gzip"
+        else:
+            return response
+
+        if len(contenu) >= len(response.content):
+            return response
+
+        response.content = contenu
+        response["Content-Length"] = str(len(contenu))
+        response["Content-Encoding"] = encodage
+        # Même règle que GZipMiddleware : l'ETag ne désigne plus les mêmes octets
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+
+class CoherenceReplicaMiddleware:
+    """
+    Après une écriture réussie, pose le cookie qui renvoie les lectures du
+    client vers la base principale pendant REPLICA_DELAI_COHERENCE secondes
+    (voir backend_ecole_peg.routage). Inactif sans réplique.
+    """
+
+    METHODES_LECTURE = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        if not replica_configuree():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in self.METHODES_LECTURE and response.status_code < 400:
+            response.set_cookie(
+                COOKIE_ECRITURE,
+                str(time.time()),
+                max_age=settings.REPLICA_DELAI_COHERENCE,
+                httponly=True,
+                samesite="Lax",
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
@@ -0,0 +1,126 @@
+"""
+Pagination partagée des listes de l'API.
+
+Deux modes coexistent pour que le frontend puisse migrer progressivement :
+ - page/taille (historique) : OFFSET + COUNT(*) via le Paginator de Django ;
+ - curseur : pagination par clé (keyset) sur la clé de tri de l'endpoint,
+   activée dès que le paramètre ``curseur`` est présent (vide pour la
+   première page). Le coût ne dépend plus de la profondeur de la page.
+
+Dans les deux modes, ``avec_total=False`` supprime le COUNT(*) : la réponse
+contient alors ``nombre_total: null`` et ``a_suivant`` est calculé en lisant
+une ligne de plus.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from ninja.errors import HttpError
+
+
+@dataclass
+class PageResultat:
+    objets: List[Any]
+    nombre_total: Optional[int]
+    a_suivant: bool
+    curseur_suivant: Optional[str]
+
+    def metadonnees(self) -> dict:
+        return {
+            "nombre_total": self.nombre_total,
+            "a_suivant": self.a_suivant,
+            "curseur_suivant": self.curseur_suivant,
+        }
+
+
+def encoder_curseur(valeurs: Sequence[Any]) -> str:
+    brut = json.dumps(list(valeurs), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip("=")
+
+
+def decoder_curseur(curseur: str, taille_cle: int) -> list:
+    try:
+        brut = base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4))
+        valeurs = json.loads(brut)
+    except (binascii.Error, ValueError):
+        raise HttpError(400, "Curseur invalide")
+    if not isinstance(valeurs, list) or len(valeurs) != taille_cle:
+        raise HttpError(400, "Curseur invalide")
+    return valeurs
+
+
+def _valeur(objet: Any, champ: str) -> Any:
+    if isinstance(objet, dict):
+        return objet[champ]
+    return getattr(objet, champ)
+
+
+def _cle(objet: Any, tri: Sequence[str]) -> list:
+    return [_valeur(objet, champ.lstrip("-")) for champ in tri]
+
+
+def filtre_apres(tri: Sequence[str], valeurs: Sequence[Any]) -> Q:
+    """
+    Condition « strictement après » pour une clé de tri composée, ex. pour
+    ("nom", "prenom", "id") : nom > a OR (nom = a AND prenom > b) OR ...
+    """
+    condition = Q()
+    egalites: dict = {}
+    for champ, valeur in zip(tri, valeurs):
+        nom = champ.lstrip("-")
+        operateur = "lt" if champ.startswith("-") else "gt"
+        condition |= Q(**egalites, **{f"{nom}__{operateur}": valeur})
+        egalites[nom] = valeur
+    return condition
+
+
+def paginer(
+    qs,
+    tri: Sequence[str],
+    page: int = 1,
+    taille: int = 10,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
+    transformer: Callable[[Iterable[Any]], List[Any]] = list,
+    cle: Optional[Callable[[Any], Sequence[Any]]] = None,
+) -> PageResultat:
+    """
+    Pagine ``qs`` trié sur ``tri``, qui doit se terminer par une clé unique
+    (en général "id" ou "-id") pour que le curseur soit déterministe.
+    ``transformer`` convertit les lignes de la page (modèles, tuples...) en
+    objets de réponse ; le curseur suivant est lu sur ces objets, ou par
+    ``cle`` sur la dernière ligne brute quand la clé de tri est une
+    annotation absente de la réponse (ex. Lower("nom")).
+    """
+    taille = max(1, taille)
+    qs = qs.order_by(*tri)
+
+    if curseur is not None:
+        total = qs.count() if avec_total else None
+        if curseur:
+            qs = qs.filter(filtre_apres(tri, decoder_curseur(curseur, len(tri))))
+        lignes = list(qs[: taille + 1])
+        a_suivant = len(lignes) > taille
+        lignes = lignes[:taille]
+    elif avec_total:
+        paginator = Paginator(qs, taille)
+        page_obj = paginator.get_page(page)
+        total = paginator.count
+        a_suivant = page_obj.has_next()
+        lignes = list(page_obj.object_list)
+    else:
+        debut = (max(1, page) - 1) * taille
+        lignes = list(qs[debut : debut + taille + 1])
+        total = None
+        a_suivant = len(lignes) > taille
+        lignes = lignes[:taille]
+    objets = transformer(lignes)
+
+    curseur_suivant = None
+    if a_suivant and objets:
+        curseur_suivant = encoder_curseur(cle(lignes[-1]) if cle else _cle(objets[-1], tri))
+    return PageResultat(objets, total, a_suivant, curseur_suivant)
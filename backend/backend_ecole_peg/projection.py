@@ -0,0 +1,104 @@
+"""
+Projection des listes directement depuis la base vers les dicts de réponse.
+
+Les colonnes sont déduites du Schema de sortie : ``.values_list()`` remplace
+l'instanciation des modèles et ``model_validate`` par ligne. Les données
+venant de la base sont considérées fiables ; seules les conversions qui
+changent le JSON produit (Decimal -> float) sont appliquées.
+"""
+from decimal import Decimal
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+)
+
+from ninja import Schema
+from ninja.errors import HttpError
+
+
+def _identite(valeur: Any) -> Any:
+    return valeur
+
+
+def _vers_float(valeur: Any) -> Any:
+    return float(valeur) if isinstance(valeur, Decimal) else valeur
+
+
+def _convertisseur(annotation: Any) -> Callable[[Any], Any]:
+    if get_origin(annotation) is Union:
+        types = [a for a in get_args(annotation) if a is not type(None)]
+        annotation = types[0] if len(types) == 1 else None
+    return _vers_float if annotation is float else _identite
+
+
+class Projection:
+    """
+    ``Projection(SessionOut, id_cours="cours_id")`` : chaque champ du Schema
+    est lu dans la colonne du même nom (les lookups "cours__nom" sont permis),
+    sauf ceux renommés par mot-clé. Les champs listés dans ``exclure``
+    (relations multiples, valeurs calculées) sont laissés à l'appelant.
+    """
+
+    def __init__(self, schema: Type[Schema], exclure: Iterable[str] = (), **sources: str):
+        self.schema = schema
+        self.sources = sources
+        exclus = set(exclure)
+        self.champs: List[str] = [c for c in schema.model_fields if c not in exclus]
+        self.chemins: List[str] = [sources.get(c, c) for c in self.champs]
+        self._conversions = [
+            (i, conv)
+            for i, conv in enumerate(
+                _convertisseur(schema.model_fields[c].annotation) for c in self.champs
+            )
+            if conv is not _identite
+        ]
+
+    def restreindre(
+        self, champs: Optional[str], toujours: Sequence[str] = ("id",)
+    ) -> "Projection":
+        """
+        Projection limitée aux champs de ``?champs=a,b,c`` (plus ceux de
+        ``toujours``, nécessaires à l'appelant : identifiant, clé de tri).
+        Sans paramètre, la projection complète est renvoyée.
+        """
+        if not champs:
+            return self
+        demandes = {c.strip() for c in champs.split(",") if c.strip()}
+        inconnus = demandes - set(self.champs)
+        if inconnus:
+            raise HttpError(400, f"Champ(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+        gardes = demandes | set(toujours)
+        return Projection(
+            self.schema,
+            exclure=[c for c in self.schema.model_fields if c not in gardes],
+            **self.sources,
+        )
+
+    def requete(self, qs):
+        return qs.values_list(*self.chemins)
+
+    def lignes(self, rangees: Iterable[tuple]) -> List[Dict[str, Any]]:
+        champs = self.champs
+        conversions = self._conversions
+        if not conversions:
+            return [dict(zip(champs, r)) for r in rangees]
+
+        resultat = []
+        for rangee in rangees:
+            rangee = list(rangee)
+            for i, conv in conversions:
+                rangee[i] = conv(rangee[i])
+            resultat.append(dict(zip(champs, rangee)))
+        return resultat
+
+    def liste(self, qs) -> List[Dict[str, Any]]:
+        return self.lignes(self.requete(qs))
@@ -0,0 +1,52 @@
+"""
+Rendu JSON de l'API.
+
+orjson encode nativement date, time, datetime et UUID ; le reste (Schemas
+pydantic, Decimal, durées, chaînes paresseuses) passe par ``_defaut`` avec
+les mêmes conventions que NinjaJSONEncoder, pour que le JSON produit ne
+change pas (seuls les datetimes gardent leurs microsecondes au lieu d'être
+tronqués à la milliseconde). Sans orjson installé, on retombe sur le rendu
+standard.
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+from django.http import HttpRequest
+from django.utils.duration import duration_iso_string
+from django.utils.functional import Promise
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+
+def _defaut(o: Any) -> Any:
+    if isinstance(o, BaseModel):
+        return o.model_dump()
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, timedelta):
+        return duration_iso_string(o)
+    if isinstance(o, (Promise, Enum)):
+        return str(o)
+    raise TypeError(f"Type non sérialisable en JSON : {type(o).__name__}")
+
+
+class RenduJSON(BaseRenderer):
+    media_type = "application/json"
+
+    def render(self, request: HttpRequest, data: Any, *, response_status: int) -> Any:
+        if orjson is None:
+            return json.dumps(data, cls=NinjaJSONEncoder)
+        return orjson.dumps(
+            data,
+            default=_defaut,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
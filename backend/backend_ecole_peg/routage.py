@@ -0,0 +1,173 @@
+"""
+Lectures sur la réplique (alias ``replica``, DATABASE_REPLICA_URL).
+
+Seuls les endpoints marqués lisent sur la réplique ; tout le reste, et toutes
+les écritures, restent sur la base principale :
+
+    @router.get("/factures/")
+    @lecture_replica
+    def factures(request): ...
+
+- Lire ses propres écritures : après une requête d'écriture (POST, PUT,
+  PATCH, DELETE), CoherenceReplicaMiddleware pose un cookie qui renvoie les
+  lectures de ce client vers la base principale pendant
+  REPLICA_DELAI_COHERENCE secondes, le temps que la réplique rattrape.
+- Dans une transaction ouverte sur la base principale, les lectures y
+  restent aussi.
+- Réplique indisponible : si la connexion échoue ou si une requête échoue
+  sur la réplique, la vue est rejouée sur la base principale et la réplique
+  est écartée pendant REPLICA_PAUSE secondes. Une erreur de la base
+  principale (verrou, interblocage) est propagée telle quelle.
+
+Sans DATABASE_REPLICA_URL, le décorateur et le routeur ne changent rien.
+"""
+import asyncio
+import functools
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.backends.signals import connection_created
+from ninja.decorators import decorate_view
+
+from performance.metriques import REGISTRE
+
+ALIAS_REPLICA = "replica"
+COOKIE_ECRITURE = "peg_ecriture"
+
+logger = logging.getLogger(__name__)
+
+
+class _Lecture:
+    def __init__(self):
+        # Erreur levée par une requête exécutée sur la réplique
+        self.erreur: Optional[DatabaseError] = None
+
+
+# Renseignée par lecture_replica pendant la vue ; copiée dans les threads de
+# sync_to_async (ORM async, en_parallele)
+_lecture: ContextVar[Optional[_Lecture]] = ContextVar("lecture_replica", default=None)
+_ecartee_jusqua = 0.0
+
+
+def replica_configuree() -> bool:
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+def _ecarter(erreur: Exception) -> None:
+    global _ecartee_jusqua
+    _ecartee_jusqua = time.monotonic() + settings.REPLICA_PAUSE
+    logger.warning("Réplique écartée pendant %s s : %s", settings.REPLICA_PAUSE, erreur)
+    REGISTRE.incrementer("peg_replica_indisponible_total")
+    try:
+        connections[ALIAS_REPLICA].close()
+    except DatabaseError:
+        pass
+
+
+def _replica_disponible() -> bool:
+    if time.monotonic() < _ecartee_jusqua:
+        return False
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return False
+    connexion = connections[ALIAS_REPLICA]
+    if connexion.connection is None:
+        try:
+            connexion.ensure_connection()
+        except DatabaseError as erreur:
+            _ecarter(erreur)
+            return False
+    return True
+
+
+def _noter_erreur(execute, sql, params, many, context):
+    try:
+        return execute(sql, params, many, context)
+    except DatabaseError as erreur:
+        lecture = _lecture.get()
+        if lecture is not None:
+            lecture.erreur = erreur
+        raise
+
+
+def _suivre_connexion(sender, connection, **kwargs):
+    # execute_wrapper permanent : les erreurs ne portent pas l'alias de leur base
+    if connection.alias == ALIAS_REPLICA and _noter_erreur not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_noter_erreur)
+
+
+connection_created.connect(_suivre_connexion)
+
+
+class RoutageReplica:
+    """Routeur de DATABASE_ROUTERS."""
+
+    def db_for_read(self, model, **hints):
+        lecture = _lecture.get()
+        if lecture is None or not _replica_disponible():
+            return None
+        return ALIAS_REPLICA
+
+    def db_for_write(self, model, **hints):
+        # Explicite : un objet lu sur la réplique serait sinon réécrit là-bas
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def _ecriture_recente(request) -> bool:
+    valeur = request.COOKIES.get(COOKIE_ECRITURE)
+    try:
+        return valeur is not None and time.time() - float(valeur) < settings.REPLICA_DELAI_COHERENCE
+    except ValueError:
+        return False
+
+
+def _sur_replica(vue):
+    if asyncio.iscoroutinefunction(vue):
+
+        @functools.wraps(vue)
+        async def appel_async(request, *args, **kwargs):
+            if not replica_configuree() or _ecriture_recente(request):
+                return await vue(request, *args, **kwargs)
+            lecture = _Lecture()
+            jeton = _lecture.set(lecture)
+            try:
+                return await vue(request, *args, **kwargs)
+            except DatabaseError as erreur:
+                if lecture.erreur is None:
+                    raise
+                await sync_to_async(_ecarter)(erreur)
+            finally:
+                _lecture.reset(jeton)
+            return await vue(request, *args, **kwargs)
+
+        return appel_async
+
+    @functools.wraps(vue)
+    def appel(request, *args, **kwargs):
+        if not replica_configuree() or _ecriture_recente(request):
+            return vue(request, *args, **kwargs)
+        lecture = _Lecture()
+        jeton = _lecture.set(lecture)
+        try:
+            return vue(request, *args, **kwargs)
+        except DatabaseError as erreur:
+            if lecture.erreur is None:
+                raise
+            _ecarter(erreur)
+        finally:
+            _lecture.reset(jeton)
+        return vue(request, *args, **kwargs)
+
+    return appel
+
+
+# Appliqué à l'opération ninja : la sérialisation de la réponse (querysets
+# paresseux) lit elle aussi sur la réplique
+lecture_replica = decorate_view(_sur_replica)
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 from datetime import timedelta
 from dotenv import load_dotenv, find_dotenv
 
@@ -32,11 +33,18 @@ INSTALLED_APPS = [
     "cours.apps.CoursConfig",
     "eleves",
     "factures.apps.FacturesConfig",
+    "recherche.apps.RechercheConfig",
+    "performance.apps.PerformanceConfig",
+    "taches.apps.TachesConfig",
 ]
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "backend_ecole_peg.middleware.CoherenceReplicaMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "backend_ecole_peg.middleware.CompressionReponseMiddleware",
+    "performance.middleware.MetriquesMiddleware",
+    "performance.middleware.InstrumentationSQLMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -44,6 +52,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "performance.middleware.ProfilageMiddleware",
 ]
 
 ROOT_URLCONF = "backend_ecole_peg.urls"
@@ -73,9 +82,23 @@ TEMPLATES = [
 import pymysql
 pymysql.install_as_MySQLdb()
 
+# Connexions (performance.connexions) : sans pool, une connexion persistante
+# par thread gardée DB_CONN_MAX_AGE secondes ; avec DB_POOL_TAILLE > 0 (défaut
+# en SERVEUR_MODE=asgi, où chaque requête a son thread), les connexions sont
+# rendues au pool du worker en fin de requête et reprises après vérification.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))  # secondes
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() == "true"
+DB_POOL_TAILLE = int(
+    os.getenv("DB_POOL_TAILLE", "10" if os.getenv("SERVEUR_MODE", "wsgi").lower() == "asgi" else "0")
+)
+CONNEXIONS = {
+    "CONN_MAX_AGE": 0 if DB_POOL_TAILLE else DB_CONN_MAX_AGE,
+    "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        "ENGINE": "performance.db.mysql",
         "NAME": os.getenv("DB_NAME"),
         "USER": os.getenv("DB_USER"),
         "PASSWORD": os.getenv("DB_PASSWORD"),
@@ -84,9 +107,85 @@ DATABASES = {
         "OPTIONS": {
             "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
         },
+        **CONNEXIONS,
     }
 }
 
+# DB_ENGINE=postgresql : service "db" de docker-compose.yml (psycopg)
+if os.getenv("DB_ENGINE", "mysql") == "postgresql":
+    DATABASES["default"] = {
+        "ENGINE": "performance.db.postgresql",
+        "NAME": os.getenv("DB_NAME"),
+        "USER": os.getenv("DB_USER"),
+        "PASSWORD": os.getenv("DB_PASSWORD"),
+        "HOST": os.getenv("DB_HOST", "localhost"),
+        "PORT": os.getenv("DB_PORT", "5432"),
+        **CONNEXIONS,
+    }
+
+# DB_ENGINE=sqlite : base locale sans serveur (développement, banc_endpoints)
+if os.getenv("DB_ENGINE", "mysql") == "sqlite":
+    DATABASES["default"] = {
+        "ENGINE": "performance.db.sqlite3",
+        "NAME": os.getenv("DB_NAME") or BASE_DIR / "db.sqlite3",
+        **CONNEXIONS,
+    }
+
+# DATABASE_URL (mysql://, postgres://, sqlite:///…) : prioritaire sur DB_ENGINE / DB_*
+MOTEURS_SUIVIS = {
+    "django.db.backends.mysql": "performance.db.mysql",
+    "django.db.backends.postgresql": "performance.db.postgresql",
+    "django.db.backends.sqlite3": "performance.db.sqlite3",
+}
+
+
+def base_depuis_url(url):
+    import dj_database_url
+
+    base = dj_database_url.parse(
+        url,
+        conn_max_age=CONNEXIONS["CONN_MAX_AGE"],
+        conn_health_checks=CONNEXIONS["CONN_HEALTH_CHECKS"],
+    )
+    base["ENGINE"] = MOTEURS_SUIVIS.get(base["ENGINE"], base["ENGINE"])
+    if base["ENGINE"] == "performance.db.mysql":
+        base.setdefault("OPTIONS", {})["init_command"] = "SET sql_mode='STRICT_TRANS_TABLES'"
+    return base
+
+
+if os.getenv("DATABASE_URL"):
+    DATABASES["default"] = base_depuis_url(os.environ["DATABASE_URL"])
+
+# Réplique en lecture (backend_ecole_peg.routage) : seuls les endpoints marqués
+# @lecture_replica y lisent. Localement : DATABASE_REPLICA_URL=sqlite:///replica.sqlite3
+if os.getenv("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = {
+        **base_depuis_url(os.environ["DATABASE_REPLICA_URL"]),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["backend_ecole_peg.routage.RoutageReplica"]
+REPLICA_DELAI_COHERENCE = int(os.getenv("REPLICA_DELAI_COHERENCE", "5"))  # secondes après une écriture
+REPLICA_PAUSE = int(os.getenv("REPLICA_PAUSE", "30"))  # secondes sans réplique après une erreur
+
+# Tests (manage.py test) : les migrations ne sont pas versionnées (makemigrations
+# au déploiement), la base de test est créée depuis les modèles ; SQLite en
+# mémoire sauf DB_ENGINE ou DATABASE_URL explicite
+if sys.argv[1:2] == ["test"]:
+    # Les tests utilisent à la fois le Client de Django et le TestClient de ninja
+    os.environ.setdefault("NINJA_SKIP_REGISTRY", "1")
+    MIGRATION_MODULES = {
+        app: None for app in ("cours", "eleves", "factures", "recherche", "performance", "taches")
+    }
+    if not os.getenv("DB_ENGINE") and not os.getenv("DATABASE_URL"):
+        DATABASES["default"] = {"ENGINE": "performance.db.sqlite3", "NAME": ":memory:", **CONNEXIONS}
+
+# MySQL/MariaDB ignore les index partiels des modèles (models.W037) : les
+# index complets sur les mêmes colonnes servent alors ces requêtes. MariaDB
+# ignore aussi les index sur LOWER(...) (models.W043) : ses collations sont
+# déjà insensibles à la casse
+if DATABASES["default"]["ENGINE"] == "performance.db.mysql":
+    SILENCED_SYSTEM_CHECKS = ["models.W037", "models.W043"]
+
 # --- Password validation ---
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -116,3 +215,85 @@ CSRF_COOKIE_SECURE = os.getenv("CSRF_COOKIE_SECURE", "False").lower() == "true"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+
+# --- Compression des réponses JSON (brotli si installé, sinon gzip) ---
+COMPRESSION_REPONSES = os.getenv("COMPRESSION_REPONSES", "False").lower() == "true"
+COMPRESSION_SEUIL = int(os.getenv("COMPRESSION_SEUIL", "2048"))  # octets
+
+# --- Caches ---
+# "objets" : réponses de détail déjà encodées (performance.cache_objets).
+# locmem = un cache par worker ; fichier / redis / memcached pour le partager
+# entre workers (CACHE_OBJETS_EMPLACEMENT = dossier ou URL du serveur).
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "fichier": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+}
+CACHES = {
+    "default": {"BACKEND": CACHE_BACKENDS["locmem"]},
+    "objets": {
+        "BACKEND": CACHE_BACKENDS[os.getenv("CACHE_OBJETS", "locmem")],
+        "LOCATION": os.getenv("CACHE_OBJETS_EMPLACEMENT", "objets"),
+        "TIMEOUT": int(os.getenv("CACHE_OBJETS_DUREE", "300")),  # secondes
+        "KEY_PREFIX": "peg",
+    },
+}
+
+# --- Instrumentation (nombre de requêtes SQL / temps par endpoint) ---
+INSTRUMENTATION_SQL = os.getenv("INSTRUMENTATION_SQL", "False").lower() == "true"
+
+# --- Métriques /metrics (format Prometheus) ---
+METRIQUES = os.getenv("METRIQUES", "False").lower() == "true"
+# Dossier partagé par les workers gunicorn (un fichier par processus), à vider au démarrage
+METRIQUES_DOSSIER = os.getenv("METRIQUES_DOSSIER") or None
+# Si défini, /metrics exige "Authorization: Bearer <jeton>"
+METRIQUES_JETON = os.getenv("METRIQUES_JETON") or None
+
+# --- Journal des requêtes SQL lentes ---
+REQUETES_LENTES = os.getenv("REQUETES_LENTES", "False").lower() == "true"
+REQUETES_LENTES_SEUIL_MS = float(os.getenv("REQUETES_LENTES_SEUIL_MS", "200"))
+# EXPLAIN de chaque nouvelle requête lente (une fois par empreinte et par processus)
+REQUETES_LENTES_EXPLAIN = os.getenv("REQUETES_LENTES_EXPLAIN", str(DEBUG)).lower() == "true"
+
+# --- Profilage (?__profile=1 pour les comptes staff, échantillonnage 1/N) ---
+PROFILAGE = os.getenv("PROFILAGE", "False").lower() == "true"
+# 0 = pas de profilage en fond ; sinon une requête sur N, par processus
+PROFILAGE_ECHANTILLON = int(os.getenv("PROFILAGE_ECHANTILLON", "0"))
+PROFILAGE_DOSSIER = os.getenv("PROFILAGE_DOSSIER") or None
+PROFILAGE_FICHIERS_MAX = int(os.getenv("PROFILAGE_FICHIERS_MAX", "200"))
+
+# --- File de tâches (app taches, manage.py worker) ---
+TACHES_INTERVALLE = float(os.getenv("TACHES_INTERVALLE", "1"))  # secondes entre deux lectures de la file vide
+TACHES_BACKOFF_BASE = float(os.getenv("TACHES_BACKOFF_BASE", "10"))  # secondes avant le 1er nouvel essai
+TACHES_BACKOFF_MAX = float(os.getenv("TACHES_BACKOFF_MAX", "3600"))
+# Une tâche en cours depuis plus longtemps est considérée abandonnée par son worker
+TACHES_DELAI_EXPIRATION = int(os.getenv("TACHES_DELAI_EXPIRATION", "1800"))
+
+# --- Exports tableur (CSV en flux, XLSX par le worker) ---
+EXPORTS_TAILLE_LOT = int(os.getenv("EXPORTS_TAILLE_LOT", "2000"))  # lignes lues par aller-retour avec la base
+EXPORTS_SEPARATEUR_CSV = os.getenv("EXPORTS_SEPARATEUR_CSV", ";")  # « ; » : attendu par Excel en français
+EXPORTS_DOSSIER = os.getenv("EXPORTS_DOSSIER", "exports")  # dans MEDIA_ROOT
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "simple"},
+    },
+    "loggers": {
+        "performance": {
+            "handlers": ["console"],
+            "level": os.getenv("PERFORMANCE_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+        "taches": {
+            "handlers": ["console"],
+            "level": os.getenv("TACHES_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
@@ -0,0 +1,265 @@
+import gzip
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from ninja import Schema
+from ninja.errors import HttpError
+from ninja.responses import NinjaJSONEncoder
+
+from cours.api import clean_expired_sessions
+from cours.models import Enseignant, Session
+from cours.schemas import PROJECTION_SESSIONS, SessionOut
+from eleves.models import Eleve
+from eleves.tests import creer_eleve, creer_session
+from factures.models import Facture, Paiement
+from performance.metriques import REGISTRE
+
+from . import routage
+from .concurrence import _isoler, en_parallele
+from .middleware import CoherenceReplicaMiddleware, CompressionReponseMiddleware
+from .projection import Projection
+from .renderers import RenduJSON
+
+
+class _PaiementOut(Schema):
+    id: int
+    montant: float
+    date_paiement: date
+    methode_paiement: Optional[str] = None
+    eleve: Optional[str] = None
+
+
+class ProjectionTests(TestCase):
+    def test_meme_contenu_que_le_schema(self):
+        session = creer_session()
+        session.enseignant = Enseignant.objects.create(nom="Martin", prenom="Luc")
+        session.save()
+        creer_session()
+
+        with self.assertNumQueries(1):
+            lignes = PROJECTION_SESSIONS.liste(Session.objects.order_by("id"))
+
+        attendues = [
+            SessionOut(
+                id=s.id,
+                id_cours=s.cours_id,
+                id_enseignant=s.enseignant_id,
+                enseignant__nom=s.enseignant.nom if s.enseignant else None,
+                enseignant__prenom=s.enseignant.prenom if s.enseignant else None,
+                cours__nom=s.cours.nom,
+                cours__type_cours=s.cours.type_cours,
+                cours__niveau=s.cours.niveau,
+                date_debut=s.date_debut,
+                date_fin=s.date_fin,
+                periode_journee=s.periode_journee,
+                statut=s.statut,
+                capacite_max=s.capacite_max,
+                seances_mois=s.seances_mois,
+            ).dict()
+            for s in Session.objects.order_by("id")
+        ]
+        self.assertEqual(lignes, attendues)
+
+    def test_decimaux_convertis_pour_les_champs_float(self):
+        facture = Facture.objects.create(eleve=creer_eleve("Dupont"))
+        Paiement.objects.create(facture=facture, montant="12.50", mode_paiement="PER")
+        projection = Projection(_PaiementOut, eleve="facture__eleve__nom")
+
+        (ligne,) = projection.liste(Paiement.objects.all())
+
+        self.assertEqual(ligne["montant"], 12.5)
+        self.assertIs(type(ligne["montant"]), float)
+        self.assertEqual(ligne["eleve"], "Dupont")
+
+    def test_restreindre(self):
+        projection = Projection(_PaiementOut).restreindre("montant")
+        self.assertEqual(projection.champs, ["id", "montant"])
+        with self.assertRaises(HttpError) as erreur:
+            Projection(_PaiementOut).restreindre("montant,inconnu")
+        self.assertEqual(erreur.exception.status_code, 400)
+
+
+class RenduTests(SimpleTestCase):
+    def test_meme_json_que_le_rendu_standard(self):
+        donnees = {
+            "paiement": _PaiementOut(id=1, montant=12.5, date_paiement=date(2025, 3, 1)),
+            "montant": Decimal("10.50"),
+            "emission": datetime(2025, 3, 1, 8, 30),
+            "duree": timedelta(hours=1, minutes=30),
+            "libelle": gettext_lazy("Actif"),
+            "ids": [1, 2, 3],
+        }
+
+        rendu = RenduJSON().render(None, donnees, response_status=200)
+
+        self.assertEqual(json.loads(rendu), json.loads(json.dumps(donnees, cls=NinjaJSONEncoder)))
+
+
+@override_settings(COMPRESSION_REPONSES=True, COMPRESSION_SEUIL=100)
+class CompressionTests(SimpleTestCase):
+    def repondre(self, contenu, accepte="gzip, deflate", **entetes):
+        reponse = HttpResponse(contenu, content_type="application/json")
+        for nom, valeur in entetes.items():
+            reponse[nom] = valeur
+        requete = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accepte)
+        return CompressionReponseMiddleware(lambda r: reponse)(requete)
+
+    def test_reponse_volumineuse_compressee(self):
+        contenu = json.dumps([{"nom": "Dupont", "prenom": "Marie"}] * 50).encode()
+
+        reponse = self.repondre(contenu, ETag='"abc"')
+
+        self.assertEqual(reponse["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(reponse.content), contenu)
+        self.assertEqual(reponse["ETag"], 'W/"abc"')
+        self.assertIn("Accept-Encoding", reponse["Vary"])
+
+    def test_petite_reponse_ou_client_sans_gzip(self):
+        self.assertFalse(self.repondre(b'{"id": 1}').has_header("Content-Encoding"))
+        contenu = json.dumps([{"nom": "Dupont"}] * 50).encode()
+        self.assertFalse(self.repondre(contenu, accepte="identity").has_header("Content-Encoding"))
+
+
+class ConcurrenceTests(TestCase):
+    def test_connexion_du_thread_fermee_en_fin_de_fonction(self):
+        # Avec CONN_MAX_AGE > 0, close_old_connections la laisserait ouverte
+        # dans un thread qui ne sera jamais réutilisé
+        fermetures = []
+        moteur = type(connections["default"])
+        fermer = moteur.close
+
+        def close(self):
+            fermetures.append(threading.get_ident())
+            return fermer(self)
+
+        def lire():
+            Eleve.objects.count()
+            return threading.get_ident()
+
+        with mock.patch.object(moteur, "close", close):
+            thread = async_to_sync(_isoler(lire, {}))()
+
+        self.assertNotEqual(thread, threading.get_ident())
+        self.assertIn(thread, fermetures)
+
+
+    def executer_en_parallele(self):
+        with mock.patch("backend_ecole_peg.concurrence.connection", mock.Mock(vendor="mysql")):
+            return async_to_sync(en_parallele)(a=threading.get_ident, b=threading.get_ident)
+
+    @override_settings(DB_POOL_TAILLE=0)
+    def test_sans_pool_sur_la_connexion_de_la_requete(self):
+        requete = threading.get_ident()
+        self.assertEqual(self.executer_en_parallele(), {"a": requete, "b": requete})
+
+    @override_settings(DB_POOL_TAILLE=2)
+    def test_avec_pool_dans_des_threads(self):
+        self.assertNotIn(threading.get_ident(), self.executer_en_parallele().values())
+
+class ReplicaTests(TestCase):
+    def setUp(self):
+        routage._ecartee_jusqua = 0.0
+        self.replica = mock.Mock(connection=object())
+        # Transaction ouverte sur la base principale : hors de celles du test
+        principale = connections[DEFAULT_DB_ALIAS]
+        blocs_du_test = len(principale.atomic_blocks)
+        defaut = mock.Mock()
+        type(defaut).in_atomic_block = mock.PropertyMock(
+            side_effect=lambda: len(principale.atomic_blocks) > blocs_du_test
+        )
+        connexions = {DEFAULT_DB_ALIAS: defaut, routage.ALIAS_REPLICA: self.replica}
+        for patch in (
+            mock.patch.object(routage, "connections", connexions),
+            mock.patch.object(routage, "replica_configuree", return_value=True),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(setattr, routage, "_ecartee_jusqua", 0.0)
+
+    def appeler(self, vue, **cookies):
+        requete = RequestFactory().get("/")
+        requete.COOKIES.update(cookies)
+        return routage._sur_replica(vue)(requete)
+
+    def indisponibilites(self):
+        return REGISTRE.compteurs("peg_replica_indisponible_total").get((), 0)
+
+    def test_lecture_sur_la_replique(self):
+        self.assertEqual(self.appeler(lambda r: Eleve.objects.db), routage.ALIAS_REPLICA)
+        # Hors des vues marquées, lectures et écritures restent sur la base principale
+        self.assertEqual(Eleve.objects.db, DEFAULT_DB_ALIAS)
+        self.assertEqual(routage.RoutageReplica().db_for_write(Eleve), DEFAULT_DB_ALIAS)
+
+    def test_lecture_de_ses_propres_ecritures(self):
+        base = self.appeler(lambda r: Eleve.objects.db, **{routage.COOKIE_ECRITURE: str(time.time())})
+        self.assertEqual(base, DEFAULT_DB_ALIAS)
+
+    def test_repli_sur_la_base_principale(self):
+        bases = []
+
+        def executer_sur_la_replique(sql, params, many, context):
+            raise OperationalError("replica injoignable")
+
+        def vue(request):
+            bases.append(Eleve.objects.db)
+            if bases[-1] == routage.ALIAS_REPLICA:
+                routage._noter_erreur(executer_sur_la_replique, "SELECT 1", None, False, {})
+            return "ok"
+
+        avant = self.indisponibilites()
+        with self.assertLogs("backend_ecole_peg.routage", "WARNING"):
+            self.assertEqual(self.appeler(vue), "ok")
+        self.assertEqual(self.appeler(vue), "ok")
+
+        # La réplique reste écartée pour la requête suivante
+        self.assertEqual(bases, [routage.ALIAS_REPLICA, DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS])
+        self.replica.close.assert_called_once()
+        self.assertEqual(self.indisponibilites(), avant + 1)
+
+    def test_erreur_de_la_base_principale_propagee(self):
+        def vue(request):
+            self.assertEqual(Eleve.objects.db, routage.ALIAS_REPLICA)
+            raise OperationalError("interblocage sur la base principale")
+
+        avant = self.indisponibilites()
+        with self.assertRaises(OperationalError):
+            self.appeler(vue)
+
+        self.replica.close.assert_not_called()
+        self.assertEqual(self.indisponibilites(), avant)
+        self.assertEqual(self.appeler(lambda r: Eleve.objects.db), routage.ALIAS_REPLICA)
+
+    def test_suivi_des_erreurs_sur_les_seules_connexions_de_la_replique(self):
+        replica = mock.Mock(alias=routage.ALIAS_REPLICA, execute_wrappers=[])
+        principale = mock.Mock(alias=DEFAULT_DB_ALIAS, execute_wrappers=[])
+        for connexion in (replica, replica, principale):
+            routage._suivre_connexion(None, connexion)
+
+        self.assertEqual(replica.execute_wrappers, [routage._noter_erreur])
+        self.assertEqual(principale.execute_wrappers, [])
+
+    def test_nettoyage_des_sessions_sur_la_base_principale(self):
+        session = creer_session()
+        Session.objects.filter(id=session.id).update(date_fin=date.today() - timedelta(days=1))
+
+        self.appeler(lambda r: clean_expired_sessions())
+
+        session.refresh_from_db()
+        self.assertEqual(session.statut, "F")
+
+    def test_cookie_pose_apres_une_ecriture(self):
+        with mock.patch("backend_ecole_peg.middleware.replica_configuree", return_value=True):
+            middleware = CoherenceReplicaMiddleware(lambda r: HttpResponse(status=201))
+        reponse = middleware(RequestFactory().post("/"))
+        self.assertIn(routage.COOKIE_ECRITURE, reponse.cookies)
+        self.assertNotIn(routage.COOKIE_ECRITURE, middleware(RequestFactory().get("/")).cookies)
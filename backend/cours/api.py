@@ -15,12 +15,14 @@ from .models import (
     CoursPrive,
     Inscription,
     FichePresences,
+    MoisChoices,
     StatutPresenceChoices,
     StatutInscriptionChoices,
     StatutSessionChoices,  # <-- Add this import
+    actualiser_statut_inscription,
 )
-from eleves.models import Eleve
-from eleves.schemas import ElevesOut
+from eleves.models import Eleve, StatutEleveChoices
+from eleves.schemas import PROJECTION_ELEVES
 from django.db.models import Q
 from .schemas import (
     CoursIn,
@@ -38,9 +40,19 @@ from .schemas import (
     InscriptionUpdateIn,
     FichePresencesIn,
     InscriptionOut,  # Added import for InscriptionOut
+    PROJECTION_SESSIONS,
+    PROJECTION_COURS_PRIVES,
 )
-from django.db import transaction
-from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, transaction
+from performance.conditionnel import get_conditionnel
+from performance.referentiel import REFERENTIEL_COURS, REFERENTIEL_ENSEIGNANTS
+from performance import cache_objets
+from performance.compteurs import SESSIONS_OUVERTES, ajuster
+from performance.versions import incrementer
+from backend_ecole_peg.exports import FormatExport, repondre
+from backend_ecole_peg.lots import analyser_ids, dans_l_ordre, reponse_lot
+from backend_ecole_peg.pagination import paginer
+from backend_ecole_peg.routage import lecture_replica
 from typing import Optional, List
 
 router = Router()
@@ -49,6 +61,7 @@ router = Router()
 
 
 @router.get("/cours/")
+@get_conditionnel(Cours)
 def get_cours(request):
     cours = Cours.objects.all()
     return [CoursOut.from_orm(c) for c in cours]
@@ -95,7 +108,15 @@ def delete_cours(request, cours_id: int):
 
 # ------------------- ENSEIGNANT -------------------
 @router.get("/enseignants/")
-def list_enseignants(request, search: Optional[str] = None):
+@get_conditionnel(Enseignant)
+def list_enseignants(request, search: Optional[str] = None, ids: Optional[str] = None):
+    id_liste = analyser_ids(ids)
+    if id_liste is not None:
+        return [
+            EnseignantOut.from_orm(e)
+            for e in dans_l_ordre(Enseignant.objects.filter(id__in=id_liste), id_liste)
+        ]
+
     enseignants = Enseignant.objects.all()
     if search:
         enseignants = enseignants.filter(
@@ -145,8 +166,10 @@ def clean_expired_sessions():
     """
     aujourd_hui = timezone.now().date()
     
-    # 1. Identifier les sessions à fermer
-    sessions_perimees = Session.objects.filter(
+    # 1. Identifier les sessions à fermer. Sur la base principale, même depuis
+    # une vue @lecture_replica : la réplique peut être en retard sur les
+    # fermetures déjà faites, et tout le nettoyage écrit sur la principale
+    sessions_perimees = Session.objects.using(DEFAULT_DB_ALIAS).filter(
         date_fin__lt=aujourd_hui,
         statut=StatutSessionChoices.OUVERTE
     )
@@ -154,16 +177,24 @@ def clean_expired_sessions():
     if sessions_perimees.exists():
         with transaction.atomic():
             # 2. Désactiver les inscriptions des sessions périmées
-            Inscription.objects.filter(
+            inscriptions_actives = Inscription.objects.filter(
                 session__in=sessions_perimees,
                 statut=StatutInscriptionChoices.ACTIF
-            ).update(statut=StatutInscriptionChoices.INACTIF)
+            )
+            eleve_ids = list(inscriptions_actives.values_list("eleve_id", flat=True))
+            cache_objets.evincer("session", sessions_perimees.values_list("id", flat=True))
+            inscriptions_actives.update(statut=StatutInscriptionChoices.INACTIF)
+            actualiser_statut_inscription(eleve_ids)
 
             # 3. Marquer les sessions comme FERMÉE
-            sessions_perimees.update(statut=StatutSessionChoices.FERMÉE)
+            fermees = sessions_perimees.update(statut=StatutSessionChoices.FERMÉE)
+            incrementer(Inscription, Session)
+            ajuster(SESSIONS_OUVERTES, -fermees)
 
 # ------------------- SESSION -------------------
 @router.get("/sessions/")
+@lecture_replica
+@get_conditionnel(Session, Cours, Enseignant, quotidien=True)
 def sessions(
     request,
     page: int = 1,
@@ -171,23 +202,19 @@ def sessions(
     type: Optional[str] = None,
     niveau: Optional[str] = None,
     statut: Optional[str] = None,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
+    ids: Optional[str] = None,
 ):
     # Appliquer le nettoyage avant de récupérer la liste
     clean_expired_sessions()
 
-    sessions_qs = (
-        Session.objects.select_related("cours", "enseignant")
-        .annotate(
-            id_cours=models.F("cours_id"),
-            id_enseignant=models.F("enseignant_id"),
-            enseignant__nom=models.F("enseignant__nom"),
-            enseignant__prenom=models.F("enseignant__prenom"),
-            cours__nom=models.F("cours__nom"),
-            cours__type_cours=models.F("cours__type_cours"),
-            cours__niveau=models.F("cours__niveau"),
-        )
-        .order_by("-date_debut")
-    )
+    id_liste = analyser_ids(ids)
+    if id_liste is not None:
+        objets = PROJECTION_SESSIONS.liste(Session.objects.filter(id__in=id_liste))
+        return reponse_lot("sessions", dans_l_ordre(objets, id_liste))
+
+    sessions_qs = Session.objects.all()
 
     if type and type != "tous":
         sessions_qs = sessions_qs.filter(cours__type_cours=type)
@@ -196,13 +223,17 @@ def sessions(
     if statut and statut != "tous":
         sessions_qs = sessions_qs.filter(statut=statut)
 
-    paginator = Paginator(sessions_qs, taille)
-    page_obj = paginator.get_page(page)
+    resultat = paginer(
+        PROJECTION_SESSIONS.requete(sessions_qs),
+        ("-date_debut", "-id"),
+        page,
+        taille,
+        curseur,
+        avec_total,
+        transformer=PROJECTION_SESSIONS.lignes,
+    )
 
-    return {
-        "sessions": [SessionOut.from_orm(s) for s in page_obj.object_list],
-        "nombre_total": paginator.count,
-    }
+    return {"sessions": resultat.objets, **resultat.metadonnees()}
 
 
 @router.get("/sessions/{id_session}/", response=SessionOut)
@@ -210,42 +241,35 @@ def rechercher_session(request, id_session: int):
     # Nettoyage également ici au cas où l'accès se fait par lien direct
     clean_expired_sessions()
 
-    session = get_object_or_404(
-        Session.objects.select_related("cours", "enseignant").annotate(
-            cours__nom=models.F("cours__nom"),
-            cours__type_cours=models.F("cours__type_cours"),
-            cours__niveau=models.F("cours__niveau"),
-            id_cours=models.F("cours__id"),
-            id_enseignant=models.F("enseignant__id"),
-            enseignant__nom=models.F("enseignant__nom"),
-            enseignant__prenom=models.F("enseignant__prenom"),
-        ),
-        id=id_session,
+    octets = cache_objets.lire_ou_calculer(
+        "session",
+        id_session,
+        lambda: next(iter(PROJECTION_SESSIONS.liste(Session.objects.filter(id=id_session))), None),
     )
-    return SessionOut.from_orm(session)
+    if octets is None:
+        raise Http404("Session introuvable")
+    return cache_objets.reponse(octets)
 
 
 @router.post("/session/")
 def create_session(request, session: SessionIn):
     try:
         with transaction.atomic():
-            cours = get_object_or_404(Cours, id=session.id_cours)
-            enseignant = (
-                get_object_or_404(Enseignant, id=session.id_enseignant)
-                if session.id_enseignant
-                else None
-            )
+            REFERENTIEL_COURS.verifier(session.id_cours)
+            if session.id_enseignant:
+                REFERENTIEL_ENSEIGNANTS.verifier(session.id_enseignant)
 
             session_obj = Session.objects.create(
-                cours=cours,
+                cours_id=session.id_cours,
                 date_debut=session.date_debut,
                 date_fin=session.date_fin,
                 periode_journee=session.periode_journee,
                 capacite_max=session.capacite_max,
-                enseignant=enseignant,
+                enseignant_id=session.id_enseignant or None,
                 seances_mois=session.seances_mois,
             )
-            session_obj.full_clean()
+            # Clés étrangères déjà validées par les référentiels
+            session_obj.full_clean(exclude=["cours", "enseignant"])
             return {"id": session_obj.id}
     except ValidationError as e:
         return {"message": "Erreurs de validation.", "erreurs": e.message_dict}
@@ -255,19 +279,17 @@ def create_session(request, session: SessionIn):
 def update_session(request, id_session: int, session: SessionIn):
     try:
         with transaction.atomic():
-            session_obj = get_object_or_404(
-                Session.objects.select_related("cours", "enseignant"), id=id_session
-            )
-            session_obj.cours = get_object_or_404(Cours, id=session.id_cours)
+            session_obj = get_object_or_404(Session, id=id_session)
+            REFERENTIEL_COURS.verifier(session.id_cours)
+            session_obj.cours_id = session.id_cours
             if session.id_enseignant:
-                session_obj.enseignant = get_object_or_404(
-                    Enseignant, id=session.id_enseignant
-                )
+                REFERENTIEL_ENSEIGNANTS.verifier(session.id_enseignant)
+                session_obj.enseignant_id = session.id_enseignant
             for attr, value in session.dict(
                 exclude={"id_cours", "id_enseignant"}
             ).items():
                 setattr(session_obj, attr, value)
-            session_obj.full_clean()
+            session_obj.full_clean(exclude=["cours", "enseignant"])
             session_obj.save()
             return {"id": session_obj.id}
     except ValidationError as e:
@@ -282,39 +304,51 @@ def delete_session(request, id_session: int):
 
 
 # ------------------- COURS PRIVE -------------------
-@router.get("/cours_prive/")
-def list_cours_prive(request, page: int = 1, taille: int = 10):
-    cours_prives_qs = (
-        CoursPrive.objects.select_related("enseignant")
-        .prefetch_related("eleves")
-        .annotate(
-            enseignant__nom=models.F("enseignant__nom"),
-            enseignant__prenom=models.F("enseignant__prenom"),
+def completer_eleves(cours_prives: List[dict]) -> List[dict]:
+    """
+    Ajoute eleves / eleves_ids aux cours privés projetés, en une seule
+    requête sur la table de liaison au lieu d'une par cours.
+    """
+    par_id = {}
+    for cours_prive in cours_prives:
+        cours_prive["eleves"] = []
+        cours_prive["eleves_ids"] = []
+        par_id[cours_prive["id"]] = cours_prive
+
+    if par_id:
+        liens = (
+            CoursPrive.eleves.through.objects.filter(coursprive_id__in=par_id)
+            .order_by("id")
+            .values_list("coursprive_id", "eleve_id", "eleve__nom", "eleve__prenom")
         )
+        for cours_prive_id, eleve_id, nom, prenom in liens:
+            par_id[cours_prive_id]["eleves"].append(f"{nom} {prenom}")
+            par_id[cours_prive_id]["eleves_ids"].append(eleve_id)
+
+    return cours_prives
+
+
+@router.get("/cours_prive/")
+@lecture_replica
+def list_cours_prive(
+    request,
+    page: int = 1,
+    taille: int = 10,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
+):
+    resultat = paginer(
+        PROJECTION_COURS_PRIVES.requete(CoursPrive.objects.all()),
+        ("date_cours_prive", "heure_debut", "id"),
+        page,
+        taille,
+        curseur,
+        avec_total,
+        transformer=lambda lignes: completer_eleves(
+            PROJECTION_COURS_PRIVES.lignes(lignes)
+        ),
     )
-    paginator = Paginator(cours_prives_qs, taille)
-    page_obj = paginator.get_page(page)
-    return {
-        "cours_prives": [
-            CoursPriveOut(
-                id=cours_prive.id,
-                date_cours_prive=cours_prive.date_cours_prive,
-                heure_debut=cours_prive.heure_debut,
-                heure_fin=cours_prive.heure_fin,
-                tarif=cours_prive.tarif,
-                lieu=cours_prive.lieu,
-                enseignant=cours_prive.enseignant.id,
-                enseignant__nom=cours_prive.enseignant.nom,
-                enseignant__prenom=cours_prive.enseignant.prenom,
-                eleves=[
-                    f"{eleve.nom} {eleve.prenom}" for eleve in cours_prive.eleves.all()
-                ],
-                eleves_ids=[eleve.id for eleve in cours_prive.eleves.all()],
-            )
-            for cours_prive in page_obj.object_list
-        ],
-        "nombre_total": paginator.count,
-    }
+    return {"cours_prives": resultat.objets, **resultat.metadonnees()}
 
 
 @router.get("/cours_prive/{cours_prive_id}/", response=CoursPriveOut)
@@ -340,26 +374,10 @@ def get_cours_prive(request, cours_prive_id: int):
 
 @router.get("/eleves/{eleve_id}/cours_prives/", response=list[CoursPriveOut])
 def get_cours_prives_by_eleve(request, eleve_id: int):
-    eleve = get_object_or_404(Eleve, id=eleve_id)
-    cours_prives = eleve.cours_prives.select_related("enseignant").all()
-    return [
-        CoursPriveOut(
-            id=cours_prive.id,
-            date_cours_prive=cours_prive.date_cours_prive,
-            heure_debut=cours_prive.heure_debut,
-            heure_fin=cours_prive.heure_fin,
-            tarif=cours_prive.tarif,
-            lieu=cours_prive.lieu,
-            enseignant=cours_prive.enseignant.id,
-            enseignant__nom=cours_prive.enseignant.nom,
-            enseignant__prenom=cours_prive.enseignant.prenom,
-            eleves=[
-                f"{eleve.nom} {eleve.prenom}" for eleve in cours_prive.eleves.all()
-            ],
-            eleves_ids=[eleve.id for eleve in cours_prive.eleves.all()],
-        )
-        for cours_prive in cours_prives
-    ]
+    get_object_or_404(Eleve, id=eleve_id)
+    return completer_eleves(
+        PROJECTION_COURS_PRIVES.liste(CoursPrive.objects.filter(eleves__id=eleve_id))
+    )
 
 
 @router.post("/cours_prive/")
@@ -370,17 +388,17 @@ def create_cours_prive(request, cours_prive: CoursPriveIn):
             if len(eleves) != len(cours_prive.eleves_ids):
                 return {"detail": "IDs d'élèves invalides"}
 
-            enseignant = get_object_or_404(Enseignant, id=cours_prive.enseignant)
+            REFERENTIEL_ENSEIGNANTS.verifier(cours_prive.enseignant)
             cours_prive_obj = CoursPrive.objects.create(
                 date_cours_prive=cours_prive.date_cours_prive,
                 heure_debut=cours_prive.heure_debut,
                 heure_fin=cours_prive.heure_fin,
                 tarif=cours_prive.tarif,
                 lieu=cours_prive.lieu,
-                enseignant=enseignant,
+                enseignant_id=cours_prive.enseignant,
             )
             cours_prive_obj.eleves.set(eleves)
-            cours_prive_obj.full_clean()
+            cours_prive_obj.full_clean(exclude=["enseignant"])
         return {"id": cours_prive_obj.id}
     except ValidationError as e:
         return {"message": "Erreurs de validation.", "erreurs": e.message_dict}
@@ -396,8 +414,8 @@ def update_cours_prive(request, cours_prive_id: int, cours_prive: CoursPriveIn):
                 return {"detail": "IDs d'élèves invalides"}
             cours_prive_obj.eleves.set(eleves)
 
-            enseignant = get_object_or_404(Enseignant, id=cours_prive.enseignant)
-            cours_prive_obj.enseignant = enseignant
+            REFERENTIEL_ENSEIGNANTS.verifier(cours_prive.enseignant)
+            cours_prive_obj.enseignant_id = cours_prive.enseignant
 
             for attr, value in cours_prive.dict(
                 exclude={"eleves_ids", "enseignant"}
@@ -543,6 +561,10 @@ def create_inscription(request, eleve_id: int, inscription: InscriptionIn):
     except ValidationError as e:
         raise HttpError(400, f"Erreur validation: {e.message_dict}")
 
+    except HttpError:
+        # Refus métier levés ci-dessus (session fermée, complète, déjà inscrit)
+        raise
+
     except Exception as e:
         print("ERREUR INSCRIPTION:", str(e))
         raise HttpError(500, "Erreur interne serveur")
@@ -613,16 +635,27 @@ def delete_inscription(request, eleve_id: int, inscription_id: int):
 
 
 @router.get("/eleves/preinscrits")
-def get_eleves_preinscrits(request, page: int = 1, taille: int = 10):
+@lecture_replica
+def get_eleves_preinscrits(
+    request,
+    page: int = 1,
+    taille: int = 10,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
+):
     eleves_preinscrits = Eleve.objects.filter(
-        inscriptions__preinscription=True
-    ).distinct()
-    paginator = Paginator(eleves_preinscrits, taille)
-    page_obj = paginator.get_page(page)
-    return {
-        "eleves": [ElevesOut.from_orm(e) for e in page_obj.object_list],
-        "nombre_total": paginator.count,
-    }
+        statut_inscription=StatutEleveChoices.PREINSCRIT
+    )
+    resultat = paginer(
+        PROJECTION_ELEVES.requete(eleves_preinscrits),
+        ("nom", "prenom", "id"),
+        page,
+        taille,
+        curseur,
+        avec_total,
+        transformer=PROJECTION_ELEVES.lignes,
+    )
+    return {"eleves": resultat.objets, **resultat.metadonnees()}
 
 
 @router.get("/session/{id_session}/eleves/")
@@ -688,6 +721,7 @@ def creer_fiche_presences(request, id_session: int, payload: FichePresencesIn):
                     )
 
             Presence.objects.bulk_create(presences_a_creer, ignore_conflicts=True)
+            incrementer(Presence)
 
         return {"id": fiche.id}
     except Exception as e:
@@ -704,6 +738,21 @@ def fiches_presences_session(request, id_session: int):
     ]
 
 
+@router.get("/session/{id_session}/presences/export/")
+def exporter_presences(
+    request, id_session: int, format: FormatExport = "csv", mois: Optional[MoisChoices] = None
+):
+    """
+    Matrice mensuelle des présences de la session (élèves × jours), toutes
+    les fiches ou celle de ``mois`` : CSV diffusé, ou ``format=xlsx`` produit
+    par le worker (202 + id de tâche).
+    """
+    get_object_or_404(Session, id=id_session)
+    return repondre(
+        request, "presences", format, session_id=id_session, mois=mois.value if mois else None
+    )
+
+
 @router.get(
     "/fiche_presences/{id_fiche_presences}/",
     response=FichePresencesOut,
@@ -763,5 +812,6 @@ def modifier_fiche_presences(
     with transaction.atomic():
         if a_modifier:
             Presence.objects.bulk_update(a_modifier, ["statut"])
+            incrementer(Presence)
 
     return {"success": True}
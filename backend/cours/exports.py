@@ -0,0 +1,50 @@
+from itertools import groupby
+from typing import Optional
+
+from backend_ecole_peg.exports import Tableau, export, parcourir
+
+from .models import MoisChoices, Presence, StatutPresenceChoices
+
+MOIS = dict(MoisChoices.choices)
+TRI = (
+    "fiche_presences__annee",
+    "fiche_presences__mois",
+    "eleve__nom",
+    "eleve__prenom",
+    "eleve_id",
+    "date_presence",
+)
+
+
+@export("presences")
+def exporter_presences(session_id: int, mois: Optional[str] = None) -> Tableau:
+    """
+    Matrice des présences d'une session : une ligne par élève et par fiche
+    mensuelle, une colonne par jour du mois (P / A, vide sans présence
+    saisie). ``mois="03"`` se limite à cette fiche.
+    """
+    qs = Presence.objects.filter(fiche_presences__session_id=session_id)
+    if mois:
+        qs = qs.filter(fiche_presences__mois=mois)
+    qs = qs.values("statut", *TRI)
+
+    def lignes():
+        # Les présences arrivent triées par (fiche, élève) : une ligne à la fois
+        for (annee, numero_mois, nom, prenom, eleve_id), presences in groupby(
+            parcourir(qs, TRI), key=lambda p: tuple(p[champ] for champ in TRI[:-1])
+        ):
+            jours = [""] * 31
+            presents = absents = 0
+            for presence in presences:
+                jours[presence["date_presence"].day - 1] = presence["statut"]
+                if presence["statut"] == StatutPresenceChoices.PRESENT:
+                    presents += 1
+                else:
+                    absents += 1
+            yield (annee, MOIS.get(numero_mois, numero_mois), eleve_id, nom, prenom, *jours, presents, absents)
+
+    return Tableau(
+        f"presences_session_{session_id}" + (f"_{mois}" if mois else ""),
+        ("Année", "Mois", "ID élève", "Nom", "Prénom", *(str(j) for j in range(1, 32)), "Présences", "Absences"),
+        lignes(),
+    )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from cours.models import actualiser_statut_inscription
+
+
+class Command(BaseCommand):
+    help = "Recalcule le statut d'inscription dénormalisé de tous les élèves"
+
+    def handle(self, *args, **kwargs):
+        nombre = actualiser_statut_inscription()
+        self.stdout.write(self.style.SUCCESS(f"{nombre} élèves mis à jour"))
@@ -1,6 +1,13 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from cours.models import Session, StatutSessionChoices, StatutInscriptionChoices
+from performance.versions import incrementer
+from cours.models import (
+    Inscription,
+    Session,
+    StatutSessionChoices,
+    StatutInscriptionChoices,
+    actualiser_statut_inscription,
+)
 
 
 class Command(BaseCommand):
@@ -18,6 +25,8 @@ class Command(BaseCommand):
                 session.inscriptions.filter(
                     statut=StatutInscriptionChoices.ACTIF
                 ).update(statut=StatutInscriptionChoices.INACTIF)
+                incrementer(Inscription)
+                actualiser_statut_inscription(session.inscriptions.values("eleve_id"))
 
                 session.statut = StatutSessionChoices.FERMÉE
                 session.save(update_fields=["statut"])
@@ -1,9 +1,10 @@
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MinLengthValidator
-from django.db.models import Q
+from django.db.models import Q, Case, When, Value, Exists, OuterRef
 from django.utils import timezone
-from eleves.models import Eleve, NiveauChoices
+from eleves.models import Eleve, NiveauChoices, StatutEleveChoices
+from performance.versions import incrementer
 
 # ------------------- Choices -------------------
 
@@ -85,7 +86,7 @@ class Cours(models.Model):
         ordering = ["type_cours", "niveau"]
         indexes = [
             models.Index(fields=["niveau"]),
-            models.Index(fields=["type_cours"]),
+            models.Index(fields=["type_cours", "niveau"]),
         ]
 
 
@@ -134,6 +135,12 @@ class Session(models.Model):
         ordering = ["date_debut"]
         indexes = [
             models.Index(fields=["statut"]),
+            # Index partiel (PostgreSQL, SQLite ; ignoré par MySQL/MariaDB)
+            models.Index(
+                fields=["date_debut"],
+                condition=Q(statut=StatutSessionChoices.OUVERTE),
+                name="session_ouverte_debut_idx",
+            ),
         ]
 
 
@@ -188,7 +195,44 @@ class Inscription(models.Model):
     class Meta:
         unique_together = (("eleve", "session"),)
         ordering = ["date_inscription"]
-        indexes = [models.Index(fields=["statut"])]
+        indexes = [
+            models.Index(fields=["statut"]),
+            models.Index(fields=["session", "statut"]),
+            models.Index(fields=["date_inscription"]),
+            # Index partiel (PostgreSQL, SQLite ; ignoré par MySQL/MariaDB)
+            models.Index(
+                fields=["session"],
+                condition=Q(statut=StatutInscriptionChoices.ACTIF),
+                name="inscription_active_session_idx",
+            ),
+        ]
+
+
+def actualiser_statut_inscription(eleve_ids=None):
+    """
+    Recalcule Eleve.statut_inscription en un seul UPDATE :
+    préinscrit s'il a une préinscription, sinon actif s'il a une inscription
+    active, sinon inactif. Sans eleve_ids, tous les élèves sont recalculés.
+    """
+    eleves = Eleve.objects.all()
+    if eleve_ids is not None:
+        eleves = eleves.filter(id__in=eleve_ids)
+
+    inscriptions = Inscription.objects.filter(eleve=OuterRef("pk"))
+    incrementer(Eleve)
+    return eleves.update(
+        statut_inscription=Case(
+            When(
+                Exists(inscriptions.filter(preinscription=True)),
+                then=Value(StatutEleveChoices.PREINSCRIT),
+            ),
+            When(
+                Exists(inscriptions.filter(statut=StatutInscriptionChoices.ACTIF)),
+                then=Value(StatutEleveChoices.ACTIF),
+            ),
+            default=Value(StatutEleveChoices.INACTIF),
+        )
+    )
 
 
 class FichePresences(models.Model):
@@ -238,7 +282,7 @@ class CoursPrive(models.Model):
             raise ValidationError("L'heure de fin doit être postérieure au début.")
 
         overlapping = CoursPrive.objects.filter(
-            Q(enseignant=self.enseignant),
+            Q(enseignant_id=self.enseignant_id),
             Q(date_cours_prive=self.date_cours_prive),
             Q(heure_debut__lt=self.heure_fin, heure_fin__gt=self.heure_debut),
         ).exclude(pk=self.pk)
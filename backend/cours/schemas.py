@@ -1,6 +1,7 @@
 from typing import Optional, List
 from ninja import Schema
 from datetime import date, time
+from backend_ecole_peg.projection import Projection
 
 # ------------------- COURS -------------------
 class CoursOut(Schema):
@@ -141,3 +142,12 @@ class FichePresencesOut(Schema):
     mois: str
     annee: int
     presences: List[PresenceOut]
+
+
+# ------------------- PROJECTIONS -------------------
+PROJECTION_SESSIONS = Projection(
+    SessionOut, id_cours="cours_id", id_enseignant="enseignant_id"
+)
+PROJECTION_COURS_PRIVES = Projection(
+    CoursPriveOut, exclure=("eleves", "eleves_ids"), enseignant="enseignant_id"
+)
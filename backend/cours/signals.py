@@ -1,7 +1,14 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Session, Inscription, StatutInscriptionChoices, StatutSessionChoices
+from performance.versions import incrementer
+from .models import (
+    Session,
+    Inscription,
+    StatutInscriptionChoices,
+    StatutSessionChoices,
+    actualiser_statut_inscription,
+)
 
 @receiver(post_save, sender=Inscription)
 def gerer_inscription_et_session(sender, instance, created, **kwargs):
@@ -20,6 +27,8 @@ def gerer_inscription_et_session(sender, instance, created, **kwargs):
         session.inscriptions.filter(statut=StatutInscriptionChoices.ACTIF).update(
             statut=StatutInscriptionChoices.INACTIF
         )
+        incrementer(Inscription)
+        actualiser_statut_inscription(session.inscriptions.values("eleve_id"))
         session.statut = StatutSessionChoices.FERMÉE
         session.save(update_fields=["statut"])
         return
@@ -36,4 +45,10 @@ def gerer_inscription_et_session(sender, instance, created, **kwargs):
     else:
         if session.statut != StatutSessionChoices.FERMÉE:
             session.statut = StatutSessionChoices.FERMÉE
-            session.save(update_fields=["statut"])
\ No newline at end of file
+            session.save(update_fields=["statut"])
+
+
+@receiver([post_save, post_delete], sender=Inscription)
+def actualiser_statut_eleve(sender, instance, **kwargs):
+    # Après gerer_inscription_et_session, qui peut encore modifier le statut
+    actualiser_statut_inscription([instance.eleve_id])
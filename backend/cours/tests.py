@@ -1,3 +1,59 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from backend_ecole_peg.lots import TAILLE_MAX_LOT
+from eleves.tests import creer_session
+
+from .models import Cours
+
+
+class LotsTests(TestCase):
+    def setUp(self):
+        self.sessions = [creer_session() for _ in range(4)]
+
+    def test_ids_dans_l_ordre_demande(self):
+        a, b, c, _ = (s.id for s in self.sessions)
+
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get("/api/cours/sessions/", {"ids": f"{c},{a},999,{c},{b}"})
+
+        self.assertEqual(reponse.status_code, 200)
+        donnees = reponse.json()
+        self.assertEqual([s["id"] for s in donnees["sessions"]], [c, a, b])
+        self.assertEqual(donnees["nombre_total"], 3)
+        self.assertFalse(donnees["a_suivant"])
+        lectures = [q for q in requetes.captured_queries if '"cours_session"."id" IN' in q["sql"]]
+        self.assertEqual(len(lectures), 1)
+
+    def test_ids_invalides(self):
+        for ids in ("1,deux", ",".join(str(i) for i in range(TAILLE_MAX_LOT + 1))):
+            reponse = self.client.get("/api/cours/sessions/", {"ids": ids})
+            self.assertEqual(reponse.status_code, 400)
+
+
+class GetConditionnelTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Cours.objects.create(nom="Français", type_cours="I", niveau="A1", tarif=500)
+
+    def test_304_sans_executer_la_vue(self):
+        premiere = self.client.get("/api/cours/cours/")
+        self.assertEqual(premiere.status_code, 200)
+        self.assertIn("no-cache", premiere["Cache-Control"])
+
+        # Seule la table des versions est lue
+        with self.assertNumQueries(1):
+            reponse = self.client.get("/api/cours/cours/", HTTP_IF_NONE_MATCH=premiere["ETag"])
+        self.assertEqual(reponse.status_code, 304)
+
+    def test_ecriture_change_l_etag(self):
+        etag = self.client.get("/api/cours/cours/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Cours.objects.create(nom="Anglais", type_cours="S", niveau="B1", tarif=400)
+        reponse = self.client.get("/api/cours/cours/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertNotEqual(reponse["ETag"], etag)
+        self.assertEqual(len(reponse.json()), 2)
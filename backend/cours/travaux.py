@@ -0,0 +1,8 @@
+from taches.file import travail
+
+from .models import actualiser_statut_inscription
+
+
+@travail("recalculer_statuts_eleves", tentatives=3)
+def recalculer_statuts_eleves():
+    return {"eleves": actualiser_statut_inscription()}
@@ -1,7 +1,15 @@
 from datetime import timedelta
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
-from django.core.paginator import Paginator
+from performance.conditionnel import get_conditionnel
+from performance.referentiel import REFERENTIEL_PAYS
+from performance import cache_objets
+from backend_ecole_peg.concurrence import en_parallele
+from backend_ecole_peg.exports import FormatExport, repondre
+from backend_ecole_peg.lots import analyser_ids, dans_l_ordre, reponse_lot
+from backend_ecole_peg.pagination import paginer
+from backend_ecole_peg.routage import lecture_replica
 from django.utils import timezone
 from django.db import transaction, models, IntegrityError
 from django.db.models import (
@@ -15,7 +23,7 @@ from django.db.models import (
     Count,
     Q,
 )
-from django.db.models.functions import Coalesce, Lower
+from django.db.models.functions import Coalesce
 from ninja import Router, File, Form
 from ninja.files import UploadedFile
 from typing import Optional  # 👈 ajouté
@@ -26,21 +34,25 @@ from .models import (
     Garant,
     Test,
     Document,
+    TRI_ELEVES,
+    filtrer_eleves,
+    trier_eleves,
 )
 from factures.models import Facture, Paiement, DetailFacture
 from .schemas import (
     Anniversaire,
     GarantIn,
     GarantOut,
-    PaysOut,
     TestIn,
     TestOut,
     DocumentOut,
     EleveIn,
-    EleveOut,
-    ElevesOut,
+    PROJECTION_ELEVE,
+    PROJECTION_ELEVES,
 )
-from cours.models import Cours, CoursPrive, Session, Enseignant
+from .expansions import analyser_inclure, etendre
+from .dossier import construire_dossier
+from cours.models import Cours, CoursPrive, Session, Enseignant, Inscription
 from .models import Commentaire
 from .schemas import CommentaireIn, CommentaireOut
 
@@ -49,6 +61,7 @@ router = Router()
 
 # ------------------- ÉLÈVES -------------------
 @router.get("/eleves/", response=dict)
+@lecture_replica
 def eleves(
     request,
     page: int = 1,
@@ -56,63 +69,94 @@ def eleves(
     recherche: Optional[str] = None,
     date_naissance: Optional[str] = None,
     statut: Optional[str] = None,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
+    champs: Optional[str] = None,
+    inclure: Optional[str] = None,
+    ids: Optional[str] = None,
 ):
-    qs = Eleve.objects.select_related("pays").annotate(
-        lower_nom=Lower("nom"),
-        lower_prenom=Lower("prenom"),
-        pays__nom=F("pays__nom"),
-        active_count=Count(
-            "inscriptions",
-            filter=Q(inscriptions__statut="A"),
-            distinct=True,
-        ),
-        preinsc_count=Count(
-            "inscriptions",
-            filter=Q(inscriptions__preinscription=True),
-            distinct=True,
-        ),
+    """
+    ``champs=id,nom,prenom`` limite les colonnes lues et renvoyées (l'id et
+    la clé de tri restent toujours présents) ; ``inclure=inscriptions,garant,factures``
+    ajoute ces relations à chaque élève, une requête par relation.
+    ``ids=3,1,2`` renvoie ces élèves-là, dans cet ordre, sans pagination ni filtres.
+    """
+    projection = PROJECTION_ELEVES.restreindre(champs, toujours=("id", "nom", "prenom"))
+    expansions = analyser_inclure(inclure)
+
+    id_liste = analyser_ids(ids)
+    if id_liste is not None:
+        objets = dans_l_ordre(projection.liste(Eleve.objects.filter(id__in=id_liste)), id_liste)
+        return reponse_lot("eleves", etendre(objets, expansions))
+
+    qs = trier_eleves(filtrer_eleves(Eleve.objects.all(), recherche, date_naissance, statut))
+
+    # Clés de tri (minuscules) lues en fin de ligne, hors de la réponse
+    position_id = projection.champs.index("id")
+    resultat = paginer(
+        qs.values_list(*projection.chemins, "nom_tri", "prenom_tri"),
+        TRI_ELEVES,
+        page,
+        taille,
+        curseur,
+        avec_total,
+        transformer=projection.lignes,
+        cle=lambda ligne: (ligne[-2], ligne[-1], ligne[position_id]),
     )
 
-    if recherche:
-        qs = qs.filter(Q(nom__icontains=recherche) | Q(prenom__icontains=recherche))
+    return {"eleves": etendre(resultat.objets, expansions), **resultat.metadonnees()}
 
-    if date_naissance:
-        qs = qs.filter(date_naissance=date_naissance)
 
-    if statut and statut != "tous":
-        if statut == "A":
-            qs = qs.filter(active_count__gt=0, preinsc_count=0)
-        elif statut == "I":
-            qs = qs.filter(active_count=0)
-        elif statut == "P":
-            qs = qs.filter(preinsc_count__gt=0)
-
-    qs = qs.order_by("lower_nom", "lower_prenom")
-
-    paginator = Paginator(qs, taille)
-    page_obj = paginator.get_page(page)
-
-    return {
-        "eleves": [
-            ElevesOut.model_validate(e, from_attributes=True)
-            for e in page_obj.object_list
-        ],
-        "nombre_total": paginator.count,
-    }
+@router.get("/eleves/export/")
+def exporter_eleves(
+    request,
+    format: FormatExport = "csv",
+    recherche: Optional[str] = None,
+    date_naissance: Optional[str] = None,
+    statut: Optional[str] = None,
+):
+    """
+    Toute la liste des élèves, avec les filtres de /eleves/ : CSV diffusé au
+    fil de la lecture, ou ``format=xlsx`` produit par le worker (202 + id de tâche).
+    """
+    return repondre(
+        request, "eleves", format, recherche=recherche, date_naissance=date_naissance, statut=statut
+    )
 
 
 @router.get("/eleve/{id_eleve}/")
-def rechercher_eleve(request, id_eleve: int):
-    try:
-        eleve = (
-            Eleve.objects.select_related("pays")
-            .annotate(pays__nom=models.F("pays__nom"))
-            .get(id=id_eleve)
+def rechercher_eleve(
+    request,
+    id_eleve: int,
+    champs: Optional[str] = None,
+    inclure: Optional[str] = None,
+):
+    if not champs and not inclure:
+        # Forme complète : servie par le cache des objets
+        octets = cache_objets.lire_ou_calculer(
+            "eleve",
+            id_eleve,
+            lambda: next(iter(PROJECTION_ELEVE.liste(Eleve.objects.filter(id=id_eleve))), None),
         )
-    except Eleve.DoesNotExist:
+        if octets is None:
+            return {"Erreur": "Cet élève n'existe pas"}
+        return cache_objets.reponse(octets)
+
+    projection = PROJECTION_ELEVE.restreindre(champs)
+    expansions = analyser_inclure(inclure)
+
+    # La jointure sur pays n'est faite que si pays__nom est demandé
+    eleve = projection.liste(Eleve.objects.filter(id=id_eleve))
+    if not eleve:
         return {"Erreur": "Cet élève n'existe pas"}
 
-    return EleveOut.model_validate(eleve, from_attributes=True)
+    return etendre(eleve, expansions)[0]
+
+
+@router.get("/eleves/{eleve_id}/dossier/", response=dict)
+async def dossier_eleve(request, eleve_id: int, limite: int = 50):
+    """Tout ce qu'affiche la page élève, en un appel (voir eleves.dossier)."""
+    return await construire_dossier(request, eleve_id, min(max(1, limite), 200))
 
 
 @router.post("/eleve/")
@@ -120,7 +164,7 @@ def creer_eleve(request, eleve: EleveIn):
     from django.http import JsonResponse
     try:
         with transaction.atomic():
-            pays = get_object_or_404(Pays, id=eleve.pays_id)
+            REFERENTIEL_PAYS.verifier(eleve.pays_id)
             data = eleve.dict(exclude={"pays_id"})
 
             # Normalisation: "" => None + trim
@@ -133,8 +177,9 @@ def creer_eleve(request, eleve: EleveIn):
                     v = v.strip()
                     data[k] = v or None
 
-            obj = Eleve(pays=pays, **data)
-            obj.full_clean()
+            obj = Eleve(pays_id=eleve.pays_id, **data)
+            # pays déjà validé par le référentiel
+            obj.full_clean(exclude=["pays"])
             obj.save()
             return {"id": obj.id}
 
@@ -148,14 +193,12 @@ def creer_eleve(request, eleve: EleveIn):
 def modifier_eleve(request, eleve_id: int, eleve: EleveIn):
     try:
         with transaction.atomic():
-            eleve_obj = get_object_or_404(
-                Eleve.objects.select_related("pays"), id=eleve_id
-            )
-            pays = get_object_or_404(Pays, id=eleve.pays_id)
+            eleve_obj = get_object_or_404(Eleve, id=eleve_id)
+            REFERENTIEL_PAYS.verifier(eleve.pays_id)
             for field, value in eleve.dict(exclude={"pays_id"}).items():
                 setattr(eleve_obj, field, value)
-            eleve_obj.pays = pays
-            eleve_obj.full_clean()
+            eleve_obj.pays_id = eleve.pays_id
+            eleve_obj.full_clean(exclude=["pays"])
             eleve_obj.save()
             return {"id": eleve_obj.id}
     except ValidationError as e:
@@ -329,18 +372,13 @@ def supprimer_commentaire(request, eleve_id: int, commentaire_id: int):
     return {"success": True}
 # ------------------- PAYS -------------------
 @router.get("/pays/")
+@get_conditionnel(Pays)
 def pays(request):
-    pays_list = Pays.objects.all().order_by("nom")
-    return [PaysOut.model_validate(p, from_attributes=True) for p in pays_list]
+    return HttpResponse(REFERENTIEL_PAYS.json(), content_type="application/json")
 
 
 # ------------------- STATISTIQUES -------------------
-@router.get("/statistiques/dashboard/")
-def statistiques_dashboard(request):
-    today = timezone.now().date()
-    first_day_month = today.replace(day=1)
-    five_days_ago = today - timedelta(days=5)
-
+def _panneau_factures(today, first_day_month):
     # Sous‐requêtes pour total et payé
     total_sq = (
         DetailFacture.objects.filter(facture=OuterRef("pk"))
@@ -355,30 +393,28 @@ def statistiques_dashboard(request):
         .values("p")
     )
 
-    # === MONTANT TOTAL IMPAYÉ (toutes factures, toutes périodes) ===
     # === Factures impayées dont l'échéance est dépassée ===
     factures_echeance_depassee_qs = (
-    Facture.objects.filter(
-        date_echeance__isnull=False,
-        date_echeance__lt=today,
-    )
-    .annotate(
-        total=Coalesce(Subquery(total_sq), Value(0), output_field=DecimalField()),
-        paye=Coalesce(Subquery(paye_sq), Value(0), output_field=DecimalField()),
-    )
-    .annotate(restant=F("total") - F("paye"))
-    .filter(restant__gt=0)
+        Facture.objects.filter(
+            impayee=True,  # index partiel des factures impayées
+            date_echeance__isnull=False,
+            date_echeance__lt=today,
+        )
+        .annotate(
+            total=Coalesce(Subquery(total_sq), Value(0), output_field=DecimalField()),
+            paye=Coalesce(Subquery(paye_sq), Value(0), output_field=DecimalField()),
+        )
+        .annotate(restant=F("total") - F("paye"))
+        .filter(restant__gt=0)
     )
 
-    montant_total_factures_echeance_depassee = (
-    factures_echeance_depassee_qs.aggregate(
+    montant_total_factures_echeance_depassee = factures_echeance_depassee_qs.aggregate(
         total_restant=Coalesce(
             Sum("restant"),
             Value(0),
             output_field=DecimalField(),
         )
     )["total_restant"]
-    )
 
     nombre_factures_echeance_depassee = factures_echeance_depassee_qs.count()
 
@@ -391,37 +427,46 @@ def statistiques_dashboard(request):
 
     # --- Détail des factures dont l'échéance est dépassée ---
     factures_echeance_depassee_data = (
-    factures_echeance_depassee_qs
-    .select_related("eleve", "inscription__eleve")
-    .annotate(
-        eleve_nom=F("eleve__nom"),
-        eleve_prenom=F("eleve__prenom"),
-    )
-    .values(
-        "id",
-        "date_emission",
-        "date_echeance",
-        "total",
-        "restant",
-        "eleve_nom",
-        "eleve_prenom",
-    )
+        factures_echeance_depassee_qs
+        .select_related("eleve", "inscription__eleve")
+        .annotate(
+            eleve_nom=F("eleve__nom"),
+            eleve_prenom=F("eleve__prenom"),
+        )
+        .values(
+            "id",
+            "date_emission",
+            "date_echeance",
+            "total",
+            "restant",
+            "eleve_nom",
+            "eleve_prenom",
+        )
     )
     factures_echeance_depassee = [
-    {
-        "id": f["id"],
-        "date_emission": f["date_emission"],
-        "date_echeance": f["date_echeance"],
-        "montant_total": float(f["total"]),
-        "montant_restant": float(f["restant"]),
-        "eleve_nom": f["eleve_nom"],
-        "eleve_prenom": f["eleve_prenom"],
+        {
+            "id": f["id"],
+            "date_emission": f["date_emission"],
+            "date_echeance": f["date_echeance"],
+            "montant_total": float(f["total"]),
+            "montant_restant": float(f["restant"]),
+            "eleve_nom": f["eleve_nom"],
+            "eleve_prenom": f["eleve_prenom"],
+        }
+        for f in factures_echeance_depassee_data
+    ]
+
+    return {
+        "montant_total_paiements_mois": float(montant_total_paiements_mois),
+        "montant_total_factures_echeance_depassee": float(montant_total_factures_echeance_depassee),
+        "nombre_factures_echeance_depassee": nombre_factures_echeance_depassee,
+        "factures_echeance_depassee": factures_echeance_depassee,
     }
-    for f in factures_echeance_depassee_data
-]
 
+
+def _repartition_cours():
     # --- Répartition par cours-type-niveau des élèves actifs ---
-    repartition_cours = list(
+    return list(
         Eleve.objects.filter(inscriptions__statut="A")
         .values(
             "inscriptions__session__cours__nom",
@@ -432,31 +477,53 @@ def statistiques_dashboard(request):
         .order_by("inscriptions__session__cours__nom")
     )
 
+
+def _presences_inferieures_80(today):
     # --- Présence < 80% lors des 7 derniers jours de session ---
     eleves_presence_inferieur_80 = []
-    for eleve in Eleve.objects.filter(inscriptions__statut="A").distinct():
-        for ins in eleve.inscriptions.filter(statut="A"):
-            sess = ins.session
-            if sess.date_fin - timedelta(days=7) <= today <= sess.date_fin:
-                total_seances = sess.seances_mois
-                if total_seances:
-                    nb_present = eleve.presences.filter(
-                        fiche_presences__session=sess, statut="P"
-                    ).count()
-                    taux = (nb_present / total_seances) * 100
-                    if taux < 80:
-                        eleves_presence_inferieur_80.append(
-                            {
-                                "nom": eleve.nom,
-                                "prenom": eleve.prenom,
-                                "date_naissance": eleve.date_naissance,
-                                "taux_presence": round(taux, 2),
-                            }
-                        )
+    inscriptions_fin_session = (
+        Inscription.objects.filter(
+            statut="A",
+            session__date_fin__gte=today,
+            session__date_fin__lte=today + timedelta(days=7),
+            session__seances_mois__gt=0,
+        )
+        .annotate(
+            nb_present=Count(
+                "eleve__presences",
+                filter=Q(
+                    eleve__presences__fiche_presences__session=F("session"),
+                    eleve__presences__statut="P",
+                ),
+            )
+        )
+        .values(
+            "eleve__nom",
+            "eleve__prenom",
+            "eleve__date_naissance",
+            "session__seances_mois",
+            "nb_present",
+        )
+        .order_by("eleve_id", "id")
+    )
+    for ins in inscriptions_fin_session:
+        taux = (ins["nb_present"] / ins["session__seances_mois"]) * 100
+        if taux < 80:
+            eleves_presence_inferieur_80.append(
+                {
+                    "nom": ins["eleve__nom"],
+                    "prenom": ins["eleve__prenom"],
+                    "date_naissance": ins["eleve__date_naissance"],
+                    "taux_presence": round(taux, 2),
+                }
+            )
+    return eleves_presence_inferieur_80
 
+
+def _preinscrits_anciens(today):
     # --- Élèves en préinscription depuis >3 jours ---
     date_limite = today - timedelta(days=3)
-    eleves_preinscrits = list(
+    return list(
         Eleve.objects.filter(
             inscriptions__preinscription=True,
             inscriptions__date_inscription__lte=date_limite,
@@ -465,37 +532,41 @@ def statistiques_dashboard(request):
         .distinct()
     )
 
-    # --- Statistiques générales supplémentaires ---
-    total_cours = Cours.objects.count()
-    sessions_actives = Session.objects.filter(statut="O").count()
-    cours_prives_programmes = CoursPrive.objects.filter(
-        date_cours_prive__gte=first_day_month
-    ).count()
+
+def _panneau_cours(first_day_month):
     sessions_ouvertes = list(
-    Session.objects.filter(statut="O")
-    .annotate(
-        eleves_restants=ExpressionWrapper(
-            F("capacite_max")
-            - Count(
-                "inscriptions",
-                filter=Q(inscriptions__statut="A")
-            ),
-            output_field=DecimalField(),
+        Session.objects.filter(statut="O")
+        .annotate(
+            eleves_restants=ExpressionWrapper(
+                F("capacite_max")
+                - Count(
+                    "inscriptions",
+                    filter=Q(inscriptions__statut="A")
+                ),
+                output_field=DecimalField(),
+            )
         )
+        .values(
+            "date_debut",
+            "eleves_restants",
+            "cours__nom",
+            "cours__type_cours",
+            "cours__niveau",
+        )
+        .order_by("date_debut")
     )
-    .values(
-        "date_debut",
-        "eleves_restants",
-        "cours__nom",
-        "cours__type_cours",
-        "cours__niveau",
-    )
-    .order_by("date_debut")
-)
-    nombre_enseignants = Enseignant.objects.count()
-    total_eleves = Eleve.objects.count()
-    eleves_actifs = Eleve.objects.filter(inscriptions__statut="A").distinct().count()
+    return {
+        "total_cours": Cours.objects.count(),
+        "sessions_actives": Session.objects.filter(statut="O").count(),
+        "cours_prives_programmes_mois": CoursPrive.objects.filter(
+            date_cours_prive__gte=first_day_month
+        ).count(),
+        "sessions_ouvertes": sessions_ouvertes,
+        "nombre_enseignants": Enseignant.objects.count(),
+    }
 
+
+def _panneau_eleves():
     pays_counts = (
         Eleve.objects.values("pays__nom")
         .annotate(total=Count("id"))
@@ -503,33 +574,45 @@ def statistiques_dashboard(request):
     )
     max_total = pays_counts.first()["total"] if pays_counts else None
     pays_plus_eleves = [p["pays__nom"] for p in pays_counts if p["total"] == max_total] if max_total else []
+    return {
+        "total_eleves": Eleve.objects.count(),
+        "eleves_actifs": Eleve.objects.filter(inscriptions__statut="A").distinct().count(),
+        "pays_plus_eleves": pays_plus_eleves,
+    }
+
+
+@router.get("/statistiques/dashboard/")
+@lecture_replica
+async def statistiques_dashboard(request):
+    today = timezone.now().date()
+    first_day_month = today.replace(day=1)
+
+    # Panneaux indépendants : en parallèle avec le pool de connexions
+    panneaux = await en_parallele(
+        factures=lambda: _panneau_factures(today, first_day_month),
+        cours=lambda: _panneau_cours(first_day_month),
+        repartition=_repartition_cours,
+        eleves=_panneau_eleves,
+        presences=lambda: _presences_inferieures_80(today),
+        preinscrits=lambda: _preinscrits_anciens(today),
+    )
 
     return {
-        "factures": {
-    "montant_total_paiements_mois": float(montant_total_paiements_mois),
-    "montant_total_factures_echeance_depassee": float(montant_total_factures_echeance_depassee),
-    "nombre_factures_echeance_depassee": nombre_factures_echeance_depassee,
-    "factures_echeance_depassee": factures_echeance_depassee,
-},
+        "factures": panneaux["factures"],
         "cours": {
-            "total_cours": total_cours,
-            "sessions_actives": sessions_actives,
-            "cours_prives_programmes_mois": cours_prives_programmes,
-            "sessions_ouvertes": sessions_ouvertes,
-            "nombre_enseignants": nombre_enseignants,
-            "repartition_eleves_actifs": repartition_cours,
+            **panneaux["cours"],
+            "repartition_eleves_actifs": panneaux["repartition"],
         },
         "eleves": {
-            "total_eleves": total_eleves,
-            "eleves_actifs": eleves_actifs,
-            "pays_plus_eleves": pays_plus_eleves,
-            "eleves_presence_inferieur_80": eleves_presence_inferieur_80,
-            "eleves_preinscription_plus_3j": eleves_preinscrits,
+            **panneaux["eleves"],
+            "eleves_presence_inferieur_80": panneaux["presences"],
+            "eleves_preinscription_plus_3j": panneaux["preinscrits"],
         },
     }
 
 
 @router.get("/anniversaires/", response=list[Anniversaire])
+@lecture_replica
 def anniversaires_mois(request, mois: Optional[int] = None, annee: Optional[int] = None):
     aujourdhui = timezone.localdate()
     mois_actuel = mois or aujourdhui.month
@@ -0,0 +1,125 @@
+"""
+Dossier complet d'un élève pour la page élève, en un seul appel.
+
+Remplace les appels séparés (élève, garant, tests, documents, commentaires,
+inscriptions, factures, cours privés) par huit requêtes en tout : une par
+section, l'élève et son garant étant lus ensemble, plus une pour les noms
+des participants des cours privés. Les sections sont lues en parallèle
+avec le pool de connexions (backend_ecole_peg.concurrence). Chaque section est limitée à ``limite``
+éléments, les plus récents d'abord ; les sections coupées sont listées dans
+``sections_tronquees``.
+"""
+from typing import Any, Dict, List, Tuple
+
+from django.http import Http404
+
+from backend_ecole_peg.concurrence import en_parallele
+from backend_ecole_peg.projection import Projection
+from cours.api import completer_eleves
+from cours.models import CoursPrive, Inscription
+from cours.schemas import PROJECTION_COURS_PRIVES
+from factures.models import Facture, annoter_montants, filtre_eleves
+
+from .expansions import PROJECTION_FACTURES, PROJECTION_GARANTS, PROJECTION_INSCRIPTIONS
+from .models import Commentaire, Document, Eleve, Test
+from .schemas import CommentaireOut, TestOut, PROJECTION_ELEVE
+
+PROJECTION_TESTS = Projection(TestOut)
+PROJECTION_COMMENTAIRES = Projection(CommentaireOut)
+COLONNES_DOCUMENTS = ("id", "nom", "fichier", "date_ajout")
+
+
+def _section(qs, projection: Projection, limite: int) -> Tuple[List[dict], bool]:
+    rangees = list(projection.requete(qs)[: limite + 1])
+    return projection.lignes(rangees[:limite]), len(rangees) > limite
+
+
+def _eleve_et_garant(eleve_id: int) -> Tuple[dict, Any]:
+    nb_eleve = len(PROJECTION_ELEVE.chemins)
+    rangee = (
+        Eleve.objects.filter(id=eleve_id)
+        .values_list(*PROJECTION_ELEVE.chemins, *PROJECTION_GARANTS.chemins)
+        .first()
+    )
+    if rangee is None:
+        raise Http404("Cet élève n'existe pas")
+    eleve = PROJECTION_ELEVE.lignes([rangee[:nb_eleve]])[0]
+    # LEFT JOIN sur le garant : id NULL quand l'élève n'en a pas
+    garant = (
+        PROJECTION_GARANTS.lignes([rangee[nb_eleve:]])[0]
+        if rangee[nb_eleve] is not None
+        else None
+    )
+    return eleve, garant
+
+
+def _cours_prives(eleve_id: int, limite: int) -> Tuple[List[dict], bool]:
+    lignes, coupee = _section(
+        CoursPrive.objects.filter(eleves__id=eleve_id).order_by(
+            "-date_cours_prive", "-heure_debut"
+        ),
+        PROJECTION_COURS_PRIVES,
+        limite,
+    )
+    return completer_eleves(lignes), coupee
+
+
+def _documents(request, eleve_id: int, limite: int) -> Tuple[List[dict], bool]:
+    documents = list(
+        Document.objects.filter(eleve_id=eleve_id).values_list(*COLONNES_DOCUMENTS)[
+            : limite + 1
+        ]
+    )
+    stockage = Document._meta.get_field("fichier").storage
+    lignes = [
+        {
+            "id": id_document,
+            "nom": nom,
+            "fichier_url": request.build_absolute_uri(stockage.url(fichier)),
+            "date_ajout": date_ajout,
+        }
+        for id_document, nom, fichier, date_ajout in documents[:limite]
+    ]
+    return lignes, len(documents) > limite
+
+
+async def construire_dossier(request, eleve_id: int, limite: int) -> Dict[str, Any]:
+    # Sections indépendantes : lues en parallèle, y compris l'élève lui-même
+    # (le 404 éventuel est levé après coup, sans autre coût que ces lectures)
+    sections = await en_parallele(
+        eleve=lambda: _eleve_et_garant(eleve_id),
+        tests=lambda: _section(
+            Test.objects.filter(eleve_id=eleve_id), PROJECTION_TESTS, limite
+        ),
+        commentaires=lambda: _section(
+            Commentaire.objects.filter(eleve_id=eleve_id),
+            PROJECTION_COMMENTAIRES,
+            limite,
+        ),
+        inscriptions=lambda: _section(
+            Inscription.objects.filter(eleve_id=eleve_id).order_by(
+                "-date_inscription", "-id"
+            ),
+            PROJECTION_INSCRIPTIONS,
+            limite,
+        ),
+        factures=lambda: _section(
+            annoter_montants(
+                Facture.objects.filter(filtre_eleves([eleve_id]))
+            ).order_by("-date_emission", "-id"),
+            PROJECTION_FACTURES,
+            limite,
+        ),
+        cours_prives=lambda: _cours_prives(eleve_id, limite),
+        documents=lambda: _documents(request, eleve_id, limite),
+    )
+
+    eleve, garant = sections.pop("eleve")
+    dossier: Dict[str, Any] = {"eleve": eleve, "garant": garant}
+    tronquees = []
+    for nom, (lignes, coupee) in sections.items():
+        dossier[nom] = lignes
+        if coupee:
+            tronquees.append(nom)
+    dossier["sections_tronquees"] = tronquees
+    return dossier
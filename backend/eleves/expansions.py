@@ -0,0 +1,99 @@
+"""
+Expansions ``?inclure=`` des élèves.
+
+Chaque expansion charge sa relation pour tous les élèves de la réponse en
+une seule requête (filtrée sur leurs ids), quel que soit leur nombre : une
+liste de N élèves avec k expansions coûte toujours 1 + k requêtes.
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db.models.functions import Coalesce
+from ninja.errors import HttpError
+
+from backend_ecole_peg.projection import Projection
+from cours.models import Inscription
+from cours.schemas import InscriptionOut
+from factures.models import Facture, annoter_montants, filtre_eleves
+from factures.schemas import FacturesOut
+
+from .models import Eleve
+from .schemas import GarantOut
+
+PROJECTION_INSCRIPTIONS = Projection(InscriptionOut, id_session="session_id")
+PROJECTION_FACTURES = Projection(
+    FacturesOut, montant_total="total_facture", montant_restant="restant_facture"
+)
+PROJECTION_GARANTS = Projection(
+    GarantOut, **{c: f"garant__{c}" for c in GarantOut.model_fields}
+)
+
+
+def _inscriptions(ids: List[int]) -> Dict[int, List[dict]]:
+    rangees = Inscription.objects.filter(eleve_id__in=ids).values_list(
+        "eleve_id", *PROJECTION_INSCRIPTIONS.chemins
+    )
+    return _grouper(rangees, PROJECTION_INSCRIPTIONS)
+
+
+def _factures(ids: List[int]) -> Dict[int, List[dict]]:
+    # Une facture appartient à l'élève directement (cours privé) ou via son inscription
+    qs = annoter_montants(
+        Facture.objects.filter(filtre_eleves(ids))
+    ).annotate(proprietaire=Coalesce("eleve_id", "inscription__eleve_id"))
+    rangees = qs.order_by("date_emission", "id").values_list(
+        "proprietaire", *PROJECTION_FACTURES.chemins
+    )
+    return _grouper(rangees, PROJECTION_FACTURES)
+
+
+def _garant(ids: List[int]) -> Dict[int, Optional[dict]]:
+    rangees = list(
+        Eleve.objects.filter(id__in=ids, garant__isnull=False).values_list(
+            "id", *PROJECTION_GARANTS.chemins
+        )
+    )
+    objets = PROJECTION_GARANTS.lignes(r[1:] for r in rangees)
+    return {r[0]: objet for r, objet in zip(rangees, objets)}
+
+
+def _grouper(rangees, projection: Projection) -> Dict[int, List[dict]]:
+    """Regroupe par élève des rangées (id_eleve, *colonnes de la projection)."""
+    rangees = list(rangees)
+    resultat: Dict[int, List[dict]] = {}
+    for rangee, objet in zip(rangees, projection.lignes(r[1:] for r in rangees)):
+        resultat.setdefault(rangee[0], []).append(objet)
+    return resultat
+
+
+EXPANSIONS: Dict[str, Callable[[List[int]], Dict[int, Any]]] = {
+    "inscriptions": _inscriptions,
+    "factures": _factures,
+    "garant": _garant,
+}
+VIDES = {"inscriptions": list, "factures": list, "garant": lambda: None}
+
+
+def analyser_inclure(inclure: Optional[str]) -> List[str]:
+    if not inclure:
+        return []
+    demandes = [e.strip() for e in inclure.split(",") if e.strip()]
+    inconnues = [e for e in demandes if e not in EXPANSIONS]
+    if inconnues:
+        raise HttpError(
+            400,
+            f"Expansion(s) inconnue(s) : {', '.join(inconnues)} "
+            f"(disponibles : {', '.join(EXPANSIONS)})",
+        )
+    return list(dict.fromkeys(demandes))
+
+
+def etendre(eleves: List[dict], expansions: List[str]) -> List[dict]:
+    """Ajoute à chaque dict d'élève (qui doit porter "id") les relations demandées."""
+    if not eleves or not expansions:
+        return eleves
+    ids = [e["id"] for e in eleves]
+    for nom in expansions:
+        valeurs = EXPANSIONS[nom](ids)
+        for eleve in eleves:
+            eleve[nom] = valeurs.get(eleve["id"], VIDES[nom]())
+    return eleves
@@ -0,0 +1,79 @@
+from typing import Optional
+
+from backend_ecole_peg.exports import Tableau, export, parcourir
+
+from .models import (
+    Eleve,
+    SexeChoices,
+    StatutEleveChoices,
+    TypePermisChoices,
+    TRI_ELEVES,
+    filtrer_eleves,
+    trier_eleves,
+)
+
+SEXES = dict(SexeChoices.choices)
+PERMIS = dict(TypePermisChoices.choices)
+STATUTS = dict(StatutEleveChoices.choices)
+
+CHAMPS = (
+    "id",
+    "nom",
+    "prenom",
+    "date_naissance",
+    "sexe",
+    "email",
+    "telephone",
+    "rue",
+    "numero",
+    "npa",
+    "localite",
+    "pays__nom",
+    "type_permis",
+    "date_permis",
+    "niveau",
+    "langue_maternelle",
+    "statut_inscription",
+)
+
+
+@export("eleves")
+def exporter_eleves(
+    recherche: Optional[str] = None,
+    date_naissance: Optional[str] = None,
+    statut: Optional[str] = None,
+) -> Tableau:
+    """Liste des élèves avec les filtres de GET /api/eleves/eleves/, même tri."""
+    qs = trier_eleves(filtrer_eleves(Eleve.objects.all(), recherche, date_naissance, statut))
+    qs = qs.values(*CHAMPS, *TRI_ELEVES[:2])
+    lignes = (
+        (
+            e["id"],
+            e["nom"],
+            e["prenom"],
+            e["date_naissance"],
+            SEXES.get(e["sexe"], e["sexe"]),
+            e["email"],
+            e["telephone"],
+            e["rue"],
+            e["numero"],
+            e["npa"],
+            e["localite"],
+            e["pays__nom"],
+            PERMIS.get(e["type_permis"], e["type_permis"]),
+            e["date_permis"],
+            e["niveau"],
+            e["langue_maternelle"],
+            STATUTS.get(e["statut_inscription"], e["statut_inscription"]),
+        )
+        for e in parcourir(qs, TRI_ELEVES)
+    )
+    return Tableau(
+        "eleves",
+        (
+            "ID", "Nom", "Prénom", "Date de naissance", "Sexe", "Email", "Téléphone",
+            "Rue", "Numéro", "NPA", "Localité", "Pays", "Permis", "Date du permis",
+            "Niveau", "Langue maternelle", "Statut",
+        ),
+        lignes,
+    )
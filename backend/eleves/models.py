@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.core.validators import (
     MinValueValidator,
     MaxValueValidator,
@@ -23,6 +24,12 @@ class TypePermisChoices(models.TextChoices):
     PAS_DE_PERMIS = "P", "Pas de Permis"
 
 
+class StatutEleveChoices(models.TextChoices):
+    ACTIF = "A", "Actif"
+    INACTIF = "I", "Inactif"
+    PREINSCRIT = "P", "Préinscrit"
+
+
 class NiveauChoices(models.TextChoices):
     A1 = "A1"
     A2 = "A2"
@@ -106,6 +113,13 @@ class Eleve(Personne):
     garant = models.ForeignKey(
         Garant, on_delete=models.SET_NULL, null=True, blank=True, related_name="eleves"
     )
+    # Dénormalisé depuis les inscriptions (voir cours.models.actualiser_statut_inscription)
+    statut_inscription = models.CharField(
+        max_length=1,
+        choices=StatutEleveChoices.choices,
+        default=StatutEleveChoices.INACTIF,
+        editable=False,
+    )
 
     def clean(self):
         super().clean()
@@ -120,9 +134,14 @@ class Eleve(Personne):
 
     class Meta:
         indexes = [
-            models.Index(fields=["nom"]),
+            models.Index(fields=["nom", "prenom"]),
             models.Index(fields=["prenom"]),
             models.Index(fields=["date_naissance"]),
+            models.Index(Lower("nom"), Lower("prenom"), "id", name="eleve_tri_nom_idx"),
+            models.Index(
+                "statut_inscription", Lower("nom"), Lower("prenom"), "id",
+                name="eleve_statut_tri_nom_idx",
+            ),
         ]
 
 
@@ -173,4 +192,35 @@ class Commentaire(models.Model):
     )
 
     class Meta:
-        ordering = ["-date_creation"]
\ No newline at end of file
+        ordering = ["-date_creation"]
+
+def filtrer_eleves(qs, recherche=None, date_naissance=None, statut=None):
+    """Filtres de la liste des élèves, partagés avec son export."""
+    if recherche:
+        qs = qs.filter(models.Q(nom__icontains=recherche) | models.Q(prenom__icontains=recherche))
+
+    if date_naissance:
+        qs = qs.filter(date_naissance=date_naissance)
+
+    # statut_inscription est maintenu par les signaux des inscriptions
+    if statut == StatutEleveChoices.INACTIF:
+        # « Inactif » désigne les élèves sans inscription active, y compris les
+        # préinscrits dont aucune inscription n'est active
+        qs = qs.filter(
+            models.Q(statut_inscription=StatutEleveChoices.INACTIF)
+            | models.Q(statut_inscription=StatutEleveChoices.PREINSCRIT)
+            & ~models.Q(inscriptions__statut="A")
+        )
+    elif statut and statut != "tous":
+        qs = qs.filter(statut_inscription=statut)
+
+    return qs
+
+
+# Ordre alphabétique sans distinction de casse, servi par les index sur
+# (LOWER(nom), LOWER(prenom), id) ; les clés sont annotées par trier_eleves
+TRI_ELEVES = ("nom_tri", "prenom_tri", "id")
+
+
+def trier_eleves(qs):
+    return qs.annotate(nom_tri=Lower("nom"), prenom_tri=Lower("prenom")).order_by(*TRI_ELEVES)
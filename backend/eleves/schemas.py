@@ -3,6 +3,7 @@ from typing import Annotated, Optional
 from ninja import Schema, UploadedFile, File
 from pydantic import StringConstraints
 from pydantic import StringConstraints
+from backend_ecole_peg.projection import Projection
 
 # ------------------- GARANT -------------------
 class GarantIn(Schema):
@@ -111,6 +112,7 @@ class ElevesOut(Schema):
     telephone: str
     email: str
     pays__nom: str
+    statut_inscription: str
 
 
 class EleveOut(Schema, from_attributes=True):
@@ -143,3 +145,8 @@ class Anniversaire(Schema):
     prenom: str
     date_naissance: date
     age: int
+
+
+# ------------------- PROJECTIONS -------------------
+PROJECTION_ELEVES = Projection(ElevesOut)
+PROJECTION_ELEVE = Projection(EleveOut)
@@ -1,3 +1,333 @@
-from django.test import TestCase
+import csv
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import skipIf
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from backend_ecole_peg.exports import openpyxl
+from cours.models import Cours, FichePresences, Inscription, Presence, Session
+from factures.models import DetailFacture, Facture, Paiement
+from taches.file import executer, reserver
+
+from .models import Commentaire, Eleve, Garant, Pays
+
+
+def creer_eleve(nom, prenom="Anne", **champs):
+    pays = Pays.objects.get_or_create(nom="Suisse", defaults={"indicatif": "+41"})[0]
+    valeurs = {
+        "nom": nom,
+        "prenom": prenom,
+        "telephone": "+41 79 123 45 67",
+        "email": f"{nom}.{prenom}@exemple.ch".lower(),
+        "date_naissance": date(2000, 1, 1),
+        "sexe": "F",
+        "type_permis": "B",
+        "pays": pays,
+        **champs,
+    }
+    return Eleve.objects.create(**valeurs)
+
+
+def creer_session():
+    cours = Cours.objects.create(nom="Français", type_cours="I", niveau="A1", tarif=500)
+    aujourdhui = date.today()
+    return Session.objects.create(
+        cours=cours,
+        date_debut=aujourdhui - timedelta(days=30),
+        date_fin=aujourdhui + timedelta(days=60),
+        periode_journee="M",
+        capacite_max=20,
+        seances_mois=8,
+    )
+
+
+class ListeElevesTests(TestCase):
+    def lister(self, **params):
+        reponse = self.client.get("/api/eleves/eleves/", params)
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def test_statut_inactif_inclut_les_preinscrits_sans_inscription_active(self):
+        session, autre = creer_session(), creer_session()
+        inactif = creer_eleve("Inactif")
+        actif = creer_eleve("Actif")
+        preinscrit_sorti = creer_eleve("Sorti")
+        preinscrit_actif = creer_eleve("Suivi")
+        Inscription.objects.create(eleve=actif, session=session)
+        Inscription.objects.create(
+            eleve=preinscrit_sorti, session=session, preinscription=True, date_sortie=date.today()
+        )
+        Inscription.objects.create(eleve=preinscrit_actif, session=session, preinscription=True)
+        Inscription.objects.create(eleve=preinscrit_actif, session=autre)
+
+        ids = {e["id"] for e in self.lister(statut="I")["eleves"]}
+
+        self.assertEqual(ids, {inactif.id, preinscrit_sorti.id})
+        self.assertEqual(
+            {e["id"] for e in self.lister(statut="P")["eleves"]},
+            {preinscrit_sorti.id, preinscrit_actif.id},
+        )
+
+    def test_tri_alphabetique_sans_distinction_de_casse(self):
+        for nom in ("bernard", "Abel", "adam", "Zoé", "Bach"):
+            creer_eleve(nom)
+
+        noms = [e["nom"] for e in self.lister()["eleves"]]
+
+        self.assertEqual(noms, ["Abel", "adam", "Bach", "bernard", "Zoé"])
+
+    def test_curseur_suit_le_meme_ordre_que_les_pages(self):
+        for i, nom in enumerate(("dupont", "Dupont", "DUPONT", "Durand", "abel", "Martin", "martin")):
+            creer_eleve(nom, prenom=f"P{i % 3}")
+
+        par_pages = []
+        for page in (1, 2, 3):
+            par_pages += [e["id"] for e in self.lister(page=page, taille=3)["eleves"]]
+
+        par_curseur, curseur = [], None
+        while True:
+            params = {"taille": 3, **({"curseur": curseur} if curseur else {})}
+            donnees = self.lister(**params)
+            par_curseur += [e["id"] for e in donnees["eleves"]]
+            curseur = donnees.get("curseur_suivant")
+            if not curseur:
+                break
+
+        self.assertEqual(len(par_pages), 7)
+        self.assertEqual(par_curseur, par_pages)
+
+
+class ChampsEtInclureTests(TestCase):
+    def setUp(self):
+        self.session = creer_session()
+
+    def creer_eleves(self, nombre):
+        garant = Garant.objects.get_or_create(
+            nom="Garant", prenom="Paul", telephone="+41 22 000 00 00", email="g@exemple.ch"
+        )[0]
+        debut = Eleve.objects.count()
+        for i in range(debut, debut + nombre):
+            eleve = creer_eleve(f"Eleve{i:02d}", garant=garant)
+            Inscription.objects.create(eleve=eleve, session=self.session)
+            facture = Facture.objects.create(eleve=eleve)
+            DetailFacture.objects.create(facture=facture, description="Cours", montant=100)
+
+    def lister(self, **params):
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get("/api/eleves/eleves/", {"taille": 50, **params})
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()["eleves"], len(requetes.captured_queries)
+
+    def test_champs_limite_la_reponse(self):
+        self.creer_eleves(2)
+
+        eleves, _ = self.lister(champs="email")
+
+        self.assertEqual(set(eleves[0]), {"id", "nom", "prenom", "email"})
+
+    def test_une_requete_par_expansion_quel_que_soit_le_nombre(self):
+        self.creer_eleves(2)
+        _, peu = self.lister(inclure="inscriptions,factures,garant")
+        self.creer_eleves(8)
+        eleves, beaucoup = self.lister(inclure="inscriptions,factures,garant")
+
+        self.assertEqual(len(eleves), 10)
+        self.assertEqual(beaucoup, peu)
+        eleve = eleves[0]
+        self.assertEqual([i["id_session"] for i in eleve["inscriptions"]], [self.session.id])
+        self.assertEqual(eleve["factures"][0]["montant_total"], 100)
+        self.assertEqual(eleve["garant"]["nom"], "Garant")
+
+    def test_expansion_inconnue(self):
+        reponse = self.client.get("/api/eleves/eleves/", {"inclure": "parents"})
+        self.assertEqual(reponse.status_code, 400)
+
+
+class DossierTests(TestCase):
+    def test_dossier_complet_en_un_appel(self):
+        eleve = creer_eleve("Dupont")
+        session = creer_session()
+        Inscription.objects.create(eleve=eleve, session=session)
+        Facture.objects.create(eleve=eleve)
+        for i in range(3):
+            Commentaire.objects.create(eleve=eleve, commentaire=f"note {i}")
+
+        # Une requête par section (sans cours privé, pas de lecture des participants)
+        with self.assertNumQueries(7):
+            reponse = self.client.get(f"/api/eleves/eleves/{eleve.id}/dossier/", {"limite": 2})
+
+        self.assertEqual(reponse.status_code, 200)
+        dossier = reponse.json()
+        self.assertEqual(dossier["eleve"]["nom"], "Dupont")
+        self.assertIsNone(dossier["garant"])
+        self.assertEqual([i["id_session"] for i in dossier["inscriptions"]], [session.id])
+        self.assertEqual(len(dossier["factures"]), 1)
+        self.assertEqual(len(dossier["commentaires"]), 2)
+        self.assertEqual(dossier["sections_tronquees"], ["commentaires"])
+
+    def test_eleve_inexistant(self):
+        reponse = self.client.get("/api/eleves/eleves/999/dossier/")
+        self.assertEqual(reponse.status_code, 404)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.aujourdhui = timezone.now().date()
+        fin_proche = creer_session()
+        Session.objects.filter(id=fin_proche.id).update(
+            date_fin=self.aujourdhui + timedelta(days=3), seances_mois=5
+        )
+        fin_proche.refresh_from_db()
+        autre = creer_session()
+        fiche = FichePresences.objects.create(
+            session=fin_proche, mois=f"{self.aujourdhui.month:02d}", annee=self.aujourdhui.year
+        )
+        fiche_autre = FichePresences.objects.create(
+            session=autre, mois=f"{self.aujourdhui.month:02d}", annee=self.aujourdhui.year
+        )
+
+        # 4 présences sur 5 séances : 80 %, pas en dessous
+        assidu = creer_eleve("Assidu")
+        Inscription.objects.create(eleve=assidu, session=fin_proche)
+        for jour in range(5):
+            self.presence(fiche, assidu, jour, "P" if jour else "A")
+        # 3 sur 5 ; la présence dans une autre session ne compte pas
+        absent = creer_eleve("Absent")
+        Inscription.objects.create(eleve=absent, session=fin_proche)
+        for jour in range(3):
+            self.presence(fiche, absent, jour, "P")
+        self.presence(fiche_autre, absent, 3, "P")
+
+        preinscrit = creer_eleve("Preinscrit")
+        inscription = Inscription.objects.create(eleve=preinscrit, session=autre, preinscription=True)
+        Inscription.objects.filter(id=inscription.id).update(
+            date_inscription=self.aujourdhui - timedelta(days=5)
+        )
+        creer_eleve("Inactif")
+
+        hier = self.aujourdhui - timedelta(days=1)
+        for eleve, montant, paye in ((absent, 100, 30), (assidu, 50, 50)):
+            facture = Facture.objects.create(eleve=eleve, date_echeance=hier)
+            DetailFacture.objects.create(facture=facture, description="Cours", montant=montant)
+            Paiement.objects.create(facture=facture, montant=paye, mode_paiement="PER")
+        self.facture_absent = Facture.objects.get(eleve=absent)
+
+    def presence(self, fiche, eleve, jour, statut):
+        Presence.objects.create(
+            fiche_presences=fiche,
+            eleve=eleve,
+            date_presence=self.aujourdhui - timedelta(days=jour),
+            statut=statut,
+        )
+
+    def test_panneaux(self):
+        reponse = self.client.get("/api/eleves/statistiques/dashboard/")
+
+        self.assertEqual(reponse.status_code, 200)
+        panneaux = reponse.json()
+        self.assertEqual(set(panneaux), {"factures", "cours", "eleves"})
+        self.assertEqual(
+            panneaux["factures"],
+            {
+                "montant_total_paiements_mois": 80.0,
+                "montant_total_factures_echeance_depassee": 70.0,
+                "nombre_factures_echeance_depassee": 1,
+                "factures_echeance_depassee": [
+                    {
+                        "id": self.facture_absent.id,
+                        "date_emission": self.aujourdhui.isoformat(),
+                        "date_echeance": (self.aujourdhui - timedelta(days=1)).isoformat(),
+                        "montant_total": 100.0,
+                        "montant_restant": 70.0,
+                        "eleve_nom": "Absent",
+                        "eleve_prenom": "Anne",
+                    }
+                ],
+            },
+        )
+
+        cours = panneaux["cours"]
+        self.assertEqual(
+            (
+                cours["total_cours"],
+                cours["sessions_actives"],
+                cours["cours_prives_programmes_mois"],
+                cours["nombre_enseignants"],
+            ),
+            (2, 2, 0, 0),
+        )
+        # Places restantes : capacité (20) moins les inscriptions actives
+        self.assertEqual(
+            sorted(s["eleves_restants"] for s in cours["sessions_ouvertes"]), ["18", "19"]
+        )
+        self.assertEqual(
+            cours["repartition_eleves_actifs"],
+            [
+                {
+                    "inscriptions__session__cours__nom": "Français",
+                    "inscriptions__session__cours__type_cours": "I",
+                    "inscriptions__session__cours__niveau": "A1",
+                    "total": 3,
+                }
+            ],
+        )
+
+        eleves = panneaux["eleves"]
+        self.assertEqual(
+            (eleves["total_eleves"], eleves["eleves_actifs"], eleves["pays_plus_eleves"]),
+            (4, 3, ["Suisse"]),
+        )
+        self.assertEqual(
+            eleves["eleves_presence_inferieur_80"],
+            [
+                {"nom": "Absent", "prenom": "Anne", "date_naissance": "2000-01-01", "taux_presence": 60.0}
+            ],
+        )
+        self.assertEqual(
+            eleves["eleves_preinscription_plus_3j"],
+            [{"nom": "Preinscrit", "prenom": "Anne", "date_naissance": "2000-01-01"}],
+        )
+
+@override_settings(EXPORTS_TAILLE_LOT=2)
+class ExportsTests(TestCase):
+    def setUp(self):
+        for nom in ("bernard", "Abel", "adam", "Zoé", "Bach"):
+            creer_eleve(nom)
+
+    def test_csv_dans_l_ordre_de_la_liste(self):
+        reponse = self.client.get("/api/eleves/eleves/export/", {"recherche": "b"})
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn('filename="eleves.csv"', reponse["Content-Disposition"])
+        contenu = b"".join(reponse.streaming_content).decode("utf-8")
+        self.assertTrue(contenu.startswith("\ufeffID;Nom;Prénom"))
+        lignes = list(csv.reader(StringIO(contenu[1:]), delimiter=";"))[1:]
+        liste = self.client.get("/api/eleves/eleves/", {"recherche": "b", "taille": 50}).json()
+        self.assertEqual([int(ligne[0]) for ligne in lignes], [e["id"] for e in liste["eleves"]])
+        self.assertEqual([ligne[1] for ligne in lignes], ["Abel", "Bach", "bernard"])
+
+    @skipIf(openpyxl is None, "openpyxl n'est pas installé")
+    def test_xlsx_produit_par_une_tache(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        with self.settings(MEDIA_ROOT=media):
+            reponse = self.client.get("/api/eleves/eleves/export/", {"format": "xlsx"})
+            self.assertEqual(reponse.status_code, 202)
+            tache_id = reponse.json()["tache_id"]
+            self.assertEqual(self.client.get(f"/api/taches/{tache_id}/fichier/").status_code, 404)
+
+            self.assertEqual(reserver(1, "test"), [tache_id])
+            executer(tache_id)
+            fichier = self.client.get(reponse.json()["fichier"])
+            self.assertEqual(fichier.status_code, 200)
+            classeur = openpyxl.load_workbook(BytesIO(b"".join(fichier.streaming_content)))
+
+        lignes = list(classeur.active.values)
+        self.assertEqual(lignes[0][:3], ("ID", "Nom", "Prénom"))
+        self.assertEqual([ligne[1] for ligne in lignes[1:]], ["Abel", "adam", "Bach", "bernard", "Zoé"])
@@ -5,7 +5,9 @@ from ninja import Router
 from ninja.errors import HttpError
 from typing import Optional
 from datetime import date
-from .models import Facture, DetailFacture, Paiement
+from .models import (
+    Facture, DetailFacture, Paiement, actualiser_factures_impayees, annoter_montants, filtre_eleves,
+)
 from cours.models import Inscription, CoursPrive
 from eleves.models import Eleve
 from .schemas import (
@@ -19,6 +21,13 @@ from .schemas import (
     PaiementWithEleveOut,  # 👈 Ajouté pour corriger l'erreur
 )
 from django.core.paginator import Paginator
+from performance.versions import incrementer
+from performance import cache_objets
+from performance.compteurs import SOLDE_IMPAYE, ajuster, montant
+from backend_ecole_peg.exports import FormatExport, repondre
+from backend_ecole_peg.lots import analyser_ids, dans_l_ordre, reponse_lot
+from backend_ecole_peg.pagination import paginer
+from backend_ecole_peg.routage import lecture_replica
 
 router = Router()
 
@@ -27,101 +36,149 @@ router = Router()
 
 
 @router.get("/factures/", response=dict)
+@lecture_replica
 def factures(
     request,
     page: int = 1,
     taille: int = 10,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
+    ids: Optional[str] = None,
 ):
     """
-    Liste toutes les factures, paginées.
+    Liste toutes les factures, paginées (page/taille ou curseur).
+    ``ids=3,1,2`` renvoie ces factures-là, dans cet ordre, en une requête.
     """
-    qs = Facture.objects.select_related("eleve", "inscription__eleve").prefetch_related(
-        "details", "paiements"
-    )
-
-    paginator = Paginator(qs, taille)
-    page_obj = paginator.get_page(page)
-
-    return {
-        "factures": [
+    id_liste = analyser_ids(ids)
+    if id_liste is not None:
+        lot = annoter_montants(Facture.objects.filter(id__in=id_liste)).select_related(
+            "eleve", "inscription__eleve"
+        )
+        objets = [
             FactureOut(
                 id=f.id,
                 date_emission=f.date_emission,
-                montant_total=float(f.montant_total),
-                montant_restant=float(f.montant_restant),
+                montant_total=float(f.total_facture),
+                montant_restant=float(f.restant_facture),
                 eleve_nom=f.eleve.nom if f.eleve else f.inscription.eleve.nom,
                 eleve_prenom=f.eleve.prenom if f.eleve else f.inscription.eleve.prenom,
             )
-            for f in page_obj.object_list
+            for f in dans_l_ordre(lot, id_liste)
+        ]
+        return reponse_lot("factures", objets)
+
+    qs = annoter_montants(Facture.objects.select_related("eleve", "inscription__eleve"))
+
+    resultat = paginer(
+        qs,
+        ("date_emission", "id"),
+        page,
+        taille,
+        curseur,
+        avec_total,
+        transformer=lambda lignes: [
+            FactureOut(
+                id=f.id,
+                date_emission=f.date_emission,
+                montant_total=float(f.total_facture),
+                montant_restant=float(f.restant_facture),
+                eleve_nom=f.eleve.nom if f.eleve else f.inscription.eleve.nom,
+                eleve_prenom=f.eleve.prenom if f.eleve else f.inscription.eleve.prenom,
+            )
+            for f in lignes
         ],
-        "nombre_total": paginator.count,
-    }
+    )
+
+    return {"factures": resultat.objets, **resultat.metadonnees()}
+
+
+@router.get("/factures/export/")
+def exporter_factures(request, format: FormatExport = "csv", impayee: Optional[bool] = None):
+    """
+    Toutes les factures avec leur solde (``impayee=true`` : non soldées) :
+    CSV diffusé, ou ``format=xlsx`` produit par le worker (202 + id de tâche).
+    """
+    return repondre(request, "factures", format, impayee=impayee)
 
 
 @router.get("/factures/payees/", response=dict)
+@lecture_replica
 def get_factures_payees(
     request,
     page: int = 1,
     taille: int = 10,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
 ):
     """
-    Liste les factures entièrement payées (montant_restant = 0).
+    Liste les factures entièrement payées (montant_restant = 0), paginées
+    (page/taille ou curseur).
     """
-    qs = Facture.objects.select_related("eleve", "inscription__eleve").prefetch_related(
-        "details", "paiements"
+    factures_soldees = annoter_montants(
+        Facture.objects.filter(impayee=False).select_related("eleve", "inscription__eleve")
     )
 
-    factures_soldees = [f for f in qs if f.montant_restant == 0]
-
-    paginator = Paginator(factures_soldees, taille)
-    page_obj = paginator.get_page(page)
-
-    result = [
-        FactureOut(
-            id=f.id,
-            date_emission=f.date_emission,
-            montant_total=float(f.montant_total),
-            montant_restant=0.0,
-            eleve_nom=f.eleve.nom if f.eleve else f.inscription.eleve.nom,
-            eleve_prenom=f.eleve.prenom if f.eleve else f.inscription.eleve.prenom,
-        )
-        for f in page_obj.object_list
-    ]
+    resultat = paginer(
+        factures_soldees,
+        ("date_emission", "id"),
+        page,
+        taille,
+        curseur,
+        avec_total,
+        transformer=lambda lignes: [
+            FactureOut(
+                id=f.id,
+                date_emission=f.date_emission,
+                montant_total=float(f.total_facture),
+                montant_restant=0.0,
+                eleve_nom=f.eleve.nom if f.eleve else f.inscription.eleve.nom,
+                eleve_prenom=f.eleve.prenom if f.eleve else f.inscription.eleve.prenom,
+            )
+            for f in lignes
+        ],
+    )
 
-    return {"factures": result, "nombre_total": paginator.count}
+    return {"factures": resultat.objets, **resultat.metadonnees()}
 
 
 @router.get("/factures/impayees/", response=dict)
+@lecture_replica
 def get_factures_impayees(
     request,
     page: int = 1,
     taille: int = 10,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
 ):
     """
-    Liste les factures partiellement ou totalement impayées (montant_restant > 0).
+    Liste les factures partiellement ou totalement impayées (montant_restant > 0),
+    paginées (page/taille ou curseur).
     """
-    qs = Facture.objects.select_related("eleve", "inscription__eleve").prefetch_related(
-        "details", "paiements"
+    factures_impayees = annoter_montants(
+        Facture.objects.filter(impayee=True).select_related("eleve", "inscription__eleve")
     )
 
-    factures_impayees = [f for f in qs if f.montant_restant > 0]
-
-    paginator = Paginator(factures_impayees, taille)
-    page_obj = paginator.get_page(page)
-
-    result = [
-        FactureOut(
-            id=f.id,
-            date_emission=f.date_emission,
-            montant_total=float(f.montant_total),
-            montant_restant=float(f.montant_restant),
-            eleve_nom=f.eleve.nom if f.eleve else f.inscription.eleve.nom,
-            eleve_prenom=f.eleve.prenom if f.eleve else f.inscription.eleve.prenom,
-        )
-        for f in page_obj.object_list
-    ]
+    resultat = paginer(
+        factures_impayees,
+        ("date_emission", "id"),
+        page,
+        taille,
+        curseur,
+        avec_total,
+        transformer=lambda lignes: [
+            FactureOut(
+                id=f.id,
+                date_emission=f.date_emission,
+                montant_total=float(f.total_facture),
+                montant_restant=float(f.restant_facture),
+                eleve_nom=f.eleve.nom if f.eleve else f.inscription.eleve.nom,
+                eleve_prenom=f.eleve.prenom if f.eleve else f.inscription.eleve.prenom,
+            )
+            for f in lignes
+        ],
+    )
 
-    return {"factures": result, "nombre_total": paginator.count}
+    return {"factures": resultat.objets, **resultat.metadonnees()}
 
 
 @router.get("/factures/eleve/{eleve_id}/", response=dict)
@@ -132,9 +189,11 @@ def factures_eleve(
     taille: int = 10,
 ):
     _ = get_object_or_404(Eleve, id=eleve_id)
-    qs = Facture.objects.filter(
-        models.Q(eleve_id=eleve_id) | models.Q(inscription__eleve_id=eleve_id)
-    ).select_related("eleve", "inscription__eleve")
+    qs = annoter_montants(
+        Facture.objects.filter(
+            filtre_eleves([eleve_id])
+        )
+    ).order_by("date_emission", "id")
     paginator = Paginator(qs, taille)
     page_obj = paginator.get_page(page)
 
@@ -143,8 +202,8 @@ def factures_eleve(
             FacturesOut(
                 id=f.id,
                 date_emission=f.date_emission,
-                montant_total=f.montant_total,
-                montant_restant=f.montant_restant,
+                montant_total=f.total_facture,
+                montant_restant=f.restant_facture,
             )
             for f in page_obj.object_list
         ],
@@ -159,16 +218,16 @@ def factures_eleve_payees(
     page: int = 1,
     taille: int = 10,
 ):
-    qs = (
-        Facture.objects.filter(
-            models.Q(eleve_id=eleve_id) | models.Q(inscription__eleve_id=eleve_id)
+    factures_payees = (
+        annoter_montants(
+            Facture.objects.filter(
+                filtre_eleves([eleve_id])
+            )
         )
-        .select_related("eleve", "inscription__eleve")
-        .prefetch_related("details", "paiements")
+        .filter(restant_facture=0)
+        .order_by("date_emission", "id")
     )
 
-    factures_payees = [f for f in qs if f.montant_restant == 0]
-
     paginator = Paginator(factures_payees, taille)
     page_obj = paginator.get_page(page)
 
@@ -177,7 +236,7 @@ def factures_eleve_payees(
             FacturesOut(
                 id=f.id,
                 date_emission=f.date_emission,
-                montant_total=float(f.montant_total),
+                montant_total=float(f.total_facture),
                 montant_restant=0.0,
             )
             for f in page_obj.object_list
@@ -193,16 +252,16 @@ def factures_eleve_impayees(
     page: int = 1,
     taille: int = 10,
 ):
-    qs = (
-        Facture.objects.filter(
-            models.Q(eleve_id=eleve_id) | models.Q(inscription__eleve_id=eleve_id)
+    factures_impayees = (
+        annoter_montants(
+            Facture.objects.filter(
+                filtre_eleves([eleve_id])
+            )
         )
-        .select_related("eleve", "inscription__eleve")
-        .prefetch_related("details", "paiements")
+        .filter(restant_facture__gt=0)
+        .order_by("date_emission", "id")
     )
 
-    factures_impayees = [f for f in qs if f.montant_restant > 0]
-
     paginator = Paginator(factures_impayees, taille)
     page_obj = paginator.get_page(page)
 
@@ -211,8 +270,8 @@ def factures_eleve_impayees(
             FacturesOut(
                 id=f.id,
                 date_emission=f.date_emission,
-                montant_total=float(f.montant_total),
-                montant_restant=float(f.montant_restant),
+                montant_total=float(f.total_facture),
+                montant_restant=float(f.restant_facture),
             )
             for f in page_obj.object_list
         ],
@@ -222,6 +281,13 @@ def factures_eleve_impayees(
 
 @router.get("/facture/{facture_id}/", response=FactureOut)
 def get_facture(request, facture_id: int):
+    octets = cache_objets.lire_ou_calculer(
+        "facture", facture_id, lambda: construire_facture(facture_id)
+    )
+    return cache_objets.reponse(octets)
+
+
+def construire_facture(facture_id: int) -> FactureOut:
     facture = get_object_or_404(
         Facture.objects.select_related("eleve", "inscription__eleve", "eleve__garant")
                .prefetch_related("details", "paiements"),
@@ -337,6 +403,9 @@ def create_facture(request, payload: FactureIn):
 
             details = [DetailFacture(facture=facture, **d) for d in details_data]
             DetailFacture.objects.bulk_create(details)
+            actualiser_factures_impayees([facture.id])
+            incrementer(DetailFacture)
+            ajuster(SOLDE_IMPAYE, sum(montant(d.montant) for d in details))
 
             return 201, facture.id
 
@@ -400,25 +469,24 @@ def paiements_eleve(
     eleve_id: int,
     page: int = 1,
     taille: int = 10,
+    curseur: Optional[str] = None,
+    avec_total: bool = True,
 ):
     """
     Liste paginée des paiements pour un élève donné.
     """
     _ = get_object_or_404(Eleve, id=eleve_id)
-    qs = (
-        Paiement.objects.filter(
-            models.Q(facture__eleve_id=eleve_id)
-            | models.Q(facture__inscription__eleve_id=eleve_id)
-        )
-        .distinct()
-        .order_by("-date_paiement")
+    qs = Paiement.objects.filter(filtre_eleves([eleve_id], prefixe="facture__"))
+    resultat = paginer(
+        qs,
+        ("-date_paiement", "-id"),
+        page,
+        taille,
+        curseur,
+        avec_total,
+        transformer=lambda lignes: [PaiementOut.from_orm(p) for p in lignes],
     )
-    paginator = Paginator(qs, taille)
-    page_obj = paginator.get_page(page)
-    return {
-        "paiements": [PaiementOut.from_orm(p) for p in page_obj.object_list],
-        "nombre_total": paginator.count,
-    }
+    return {"paiements": resultat.objets, **resultat.metadonnees()}
 
 
 @router.get("/factures/{facture_id}/paiements/total/")
@@ -429,7 +497,22 @@ def get_total_paiements_facture(request, facture_id: int):
     total = paiements.aggregate(total_amount=models.Sum("montant"))["total_amount"] or 0
 
 
+@router.get("/paiements/export/")
+def exporter_paiements(
+    request,
+    format: FormatExport = "csv",
+    date_debut: Optional[date] = None,
+    date_fin: Optional[date] = None,
+):
+    """
+    Paiements avec le nom de l'élève, bornes de date incluses : CSV diffusé,
+    ou ``format=xlsx`` produit par le worker (202 + id de tâche).
+    """
+    return repondre(request, "paiements", format, date_debut=date_debut, date_fin=date_fin)
+
+
 @router.get("/paiements/", response=dict)
+@lecture_replica
 def paiements(request):
     qs = Paiement.objects.select_related(
         "facture",
@@ -0,0 +1,106 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from django.db.models.functions import Coalesce
+
+from backend_ecole_peg.exports import Tableau, export, parcourir
+
+from .models import (
+    Facture,
+    MethodePaiementChoices,
+    ModePaiementChoices,
+    Paiement,
+    annoter_montants,
+)
+
+CENTIME = Decimal("0.01")
+MODES = dict(ModePaiementChoices.choices)
+METHODES = dict(MethodePaiementChoices.choices)
+
+
+@export("factures")
+def exporter_factures(impayee: Optional[bool] = None) -> Tableau:
+    """Factures avec total, montant payé et solde ; ``impayee`` restreint aux (non) soldées."""
+    qs = Facture.objects.all()
+    if impayee is not None:
+        qs = qs.filter(impayee=impayee)
+    qs = annoter_montants(qs).values(
+        "id",
+        "date_emission",
+        "date_echeance",
+        "total_facture",
+        "total_paiements",
+        "restant_facture",
+        "inscription_id",
+        "cours_prive_id",
+        # Facture de cours privé : élève direct ; sinon celui de l'inscription
+        id_eleve=Coalesce("eleve_id", "inscription__eleve_id"),
+        eleve_nom=Coalesce("eleve__nom", "inscription__eleve__nom"),
+        eleve_prenom=Coalesce("eleve__prenom", "inscription__eleve__prenom"),
+    )
+    lignes = (
+        (
+            f["id"],
+            f["date_emission"],
+            f["date_echeance"],
+            f["id_eleve"],
+            f["eleve_nom"],
+            f["eleve_prenom"],
+            f["inscription_id"],
+            f["cours_prive_id"],
+            # Sommes SQL : SQLite renvoie des décimales en trop
+            f["total_facture"].quantize(CENTIME),
+            f["total_paiements"].quantize(CENTIME),
+            f["restant_facture"].quantize(CENTIME),
+        )
+        for f in parcourir(qs, ("date_emission", "id"))
+    )
+    return Tableau(
+        "factures",
+        (
+            "ID", "Date d'émission", "Échéance", "ID élève", "Nom", "Prénom",
+            "ID inscription", "ID cours privé", "Montant total", "Montant payé", "Solde",
+        ),
+        lignes,
+    )
+
+
+@export("paiements")
+def exporter_paiements(
+    date_debut: Optional[date] = None, date_fin: Optional[date] = None
+) -> Tableau:
+    """Paiements avec le nom de l'élève, du plus récent au plus ancien (bornes incluses)."""
+    qs = Paiement.objects.all()
+    if date_debut:
+        qs = qs.filter(date_paiement__gte=date_debut)
+    if date_fin:
+        qs = qs.filter(date_paiement__lte=date_fin)
+    qs = qs.values(
+        "id",
+        "date_paiement",
+        "montant",
+        "mode_paiement",
+        "methode_paiement",
+        "facture_id",
+        eleve_nom=Coalesce("facture__eleve__nom", "facture__inscription__eleve__nom"),
+        eleve_prenom=Coalesce("facture__eleve__prenom", "facture__inscription__eleve__prenom"),
+    )
+    lignes = (
+        (
+            p["id"],
+            p["date_paiement"],
+            p["montant"],
+            MODES.get(p["mode_paiement"], p["mode_paiement"]),
+            METHODES.get(p["methode_paiement"], p["methode_paiement"]),
+            p["facture_id"],
+            p["eleve_nom"],
+            p["eleve_prenom"],
+        )
+        for p in parcourir(qs, ("-date_paiement", "-id"))
+    )
+    return Tableau(
+        "paiements",
+        ("ID", "Date", "Montant", "Mode", "Méthode", "ID facture", "Nom", "Prénom"),
+        lignes,
+    )
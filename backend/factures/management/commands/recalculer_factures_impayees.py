@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from factures.models import actualiser_factures_impayees
+
+
+class Command(BaseCommand):
+    help = "Recalcule l'indicateur dénormalisé « impayée » de toutes les factures"
+
+    def handle(self, *args, **kwargs):
+        nombre = actualiser_factures_impayees()
+        self.stdout.write(self.style.SUCCESS(f"{nombre} factures mises à jour"))
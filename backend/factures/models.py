@@ -1,5 +1,7 @@
 from django.core.exceptions import ValidationError
 from django.db.models import Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import GreaterThan
 from django.core.validators import MinValueValidator
 from django.db import models, transaction
 
@@ -46,12 +48,24 @@ class Facture(models.Model):
         null=True,
         related_name="factures",
     )
+    # Dénormalisé depuis les détails et paiements (voir actualiser_factures_impayees)
+    impayee = models.BooleanField(default=False, editable=False)
 
     _cached_montant_total = None
     _cached_montant_restant = None
 
     class Meta:
         ordering = ["date_emission"]
+        indexes = [
+            models.Index(fields=["date_emission"]),
+            models.Index(fields=["date_echeance"]),
+            # Index partiel (PostgreSQL, SQLite ; ignoré par MySQL/MariaDB)
+            models.Index(
+                fields=["date_echeance"],
+                condition=models.Q(impayee=True),
+                name="facture_impayee_echeance_idx",
+            ),
+        ]
 
     @property
     def montant_total(self):
@@ -153,6 +167,7 @@ class Paiement(models.Model):
 
     class Meta:
         ordering = ["-date_paiement"]
+        indexes = [models.Index(fields=["date_paiement"])]
 
     def clean(self):
         super().clean()
@@ -165,3 +180,70 @@ class Paiement(models.Model):
                 )
         if self.montant <= 0:
             raise ValidationError("Le montant du paiement doit être supérieur à 0.")
+
+
+def _somme(modele):
+    """Somme des montants de ``modele`` pour la facture de la requête externe."""
+    return Coalesce(
+        models.Subquery(
+            modele.objects.filter(facture=models.OuterRef("pk"))
+            .order_by()
+            .values("facture")
+            .annotate(s=Sum("montant"))
+            .values("s"),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        models.Value(0, output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+    )
+
+
+def annoter_montants(qs):
+    """
+    Ajoute ``total_facture`` et ``restant_facture`` calculés en SQL, pour
+    lire les montants de nombreuses factures sans requête par facture
+    (équivalent de montant_total / montant_restant).
+    """
+    zero = models.Value(0, output_field=models.DecimalField(max_digits=10, decimal_places=2))
+    return qs.annotate(
+        total_facture=_somme(DetailFacture),
+        total_paiements=_somme(Paiement),
+    ).annotate(
+        restant_facture=Greatest(
+            models.F("total_facture") - models.F("total_paiements"), zero
+        )
+    )
+
+
+def actualiser_factures_impayees(facture_ids=None):
+    """
+    Recalcule Facture.impayee en un seul UPDATE : vraie tant que le total des
+    détails dépasse celui des paiements. Sans facture_ids, toutes les
+    factures sont recalculées.
+    """
+    factures = Facture.objects.all()
+    if facture_ids is not None:
+        factures = factures.filter(id__in=facture_ids)
+    return factures.update(
+        impayee=models.Case(
+            models.When(GreaterThan(_somme(DetailFacture), _somme(Paiement)), then=models.Value(True)),
+            default=models.Value(False),
+        )
+    )
+
+
+def filtre_eleves(eleve_ids, prefixe=""):
+    """
+    Q des factures appartenant aux élèves ``eleve_ids``, directement (cours
+    privé) ou via une inscription. ``prefixe`` désigne la facture depuis un
+    autre modèle (``"facture__"`` pour Paiement).
+
+    L'inscription est filtrée par sous-requête plutôt que par jointure : les
+    deux branches du OR restent sur la table des factures et chacune utilise
+    l'index de sa clé étrangère, au lieu d'un parcours complet.
+    """
+    from cours.models import Inscription
+
+    inscriptions = Inscription.objects.filter(eleve_id__in=eleve_ids).values("id")
+    return models.Q(**{f"{prefixe}eleve_id__in": eleve_ids}) | models.Q(
+        **{f"{prefixe}inscription__in": inscriptions}
+    )
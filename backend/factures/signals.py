@@ -2,7 +2,7 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.db import transaction
 from django.db.models import Q
-from .models import DetailFacture, Paiement, Facture
+from .models import DetailFacture, Paiement, Facture, actualiser_factures_impayees
 
 
 @receiver([post_save, post_delete], sender=DetailFacture)
@@ -16,3 +16,10 @@ def reset_facture_cache_on_paiement_change(sender, instance, **kwargs):
     if instance.facture:
         transaction.on_commit(lambda: instance.facture.reset_cache())
 
+
+
+@receiver([post_save, post_delete], sender=DetailFacture)
+@receiver([post_save, post_delete], sender=Paiement)
+def actualiser_facture_impayee(sender, instance, **kwargs):
+    if instance.facture_id:
+        actualiser_factures_impayees([instance.facture_id])
@@ -1,3 +1,137 @@
+from datetime import date, timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from cours.models import Inscription
+from eleves.tests import creer_eleve, creer_session
+
+from .models import DetailFacture, Facture, Paiement
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.eleve = creer_eleve("Dupont", "Marie")
+        for i in range(23):
+            facture = Facture.objects.create(eleve=self.eleve)
+            # Plusieurs factures par date : le curseur départage par id
+            Facture.objects.filter(id=facture.id).update(
+                date_emission=date(2025, 1, 1) + timedelta(days=(i * 7) % 4)
+            )
+
+    def lister(self, url, cle, **params):
+        reponse = self.client.get(url, params)
+        self.assertEqual(reponse.status_code, 200)
+        donnees = reponse.json()
+        return [o["id"] for o in donnees[cle]], donnees
+
+    def parcourir(self, url, cle):
+        ids, curseur = [], ""
+        while curseur is not None:
+            page, donnees = self.lister(url, cle, taille=5, curseur=curseur, avec_total="false")
+            self.assertIsNone(donnees["nombre_total"])
+            ids += page
+            curseur = donnees["curseur_suivant"]
+        return ids
+
+    def test_curseur_et_pages_dans_le_meme_ordre(self):
+        par_pages = []
+        for page in range(1, 6):
+            ids, donnees = self.lister("/api/factures/factures/", "factures", page=page, taille=5)
+            self.assertEqual(donnees["nombre_total"], 23)
+            par_pages += ids
+
+        attendu = list(Facture.objects.order_by("date_emission", "id").values_list("id", flat=True))
+        self.assertEqual(par_pages, attendu)
+        self.assertEqual(self.parcourir("/api/factures/factures/", "factures"), attendu)
+
+    def test_curseur_sur_les_factures_payees_et_impayees(self):
+        impayees = list(Facture.objects.order_by("date_emission", "id")[:7])
+        for facture in impayees:
+            DetailFacture.objects.create(facture=facture, description="Cours", montant=100)
+
+        attendu = [f.id for f in impayees]
+        self.assertEqual(self.parcourir("/api/factures/factures/impayees/", "factures"), attendu)
+        payees = self.parcourir("/api/factures/factures/payees/", "factures")
+        self.assertEqual(len(payees), 16)
+        self.assertFalse(set(payees) & set(attendu))
+
+    def test_curseur_en_ordre_decroissant(self):
+        for facture in Facture.objects.all()[:12]:
+            paiement = Paiement.objects.create(facture=facture, montant=10, mode_paiement="PER")
+            Paiement.objects.filter(id=paiement.id).update(date_paiement=facture.date_emission)
+
+        attendu = list(
+            Paiement.objects.order_by("-date_paiement", "-id").values_list("id", flat=True)
+        )
+        url = f"/api/factures/paiements/eleve/{self.eleve.id}/"
+        self.assertEqual(self.parcourir(url, "paiements"), attendu)
+
+    def test_page_profonde_sans_offset(self):
+        _, donnees = self.lister("/api/factures/factures/", "factures", taille=20, curseur="")
+        with CaptureQueriesContext(connection) as requetes:
+            ids, _ = self.lister(
+                "/api/factures/factures/", "factures", taille=20, curseur=donnees["curseur_suivant"]
+            )
+
+        self.assertEqual(len(ids), 3)
+        self.assertFalse(any("OFFSET" in q["sql"] for q in requetes.captured_queries))
+
+    def test_curseur_invalide(self):
+        reponse = self.client.get("/api/factures/factures/", {"curseur": "pas-un-curseur"})
+        self.assertEqual(reponse.status_code, 400)
+
+
+class ImpayeeTests(TestCase):
+    def setUp(self):
+        self.eleve = creer_eleve("Dupont", "Marie")
+
+    def ids(self, liste):
+        reponse = self.client.get(f"/api/factures/factures/{liste}/", {"taille": 50})
+        self.assertEqual(reponse.status_code, 200)
+        return {f["id"] for f in reponse.json()["factures"]}
+
+    def payer(self, facture_id, montant):
+        reponse = self.client.post(
+            "/api/factures/paiement/",
+            {"id_facture": facture_id, "montant": montant, "mode_paiement": "PER"},
+            content_type="application/json",
+        )
+        self.assertEqual(reponse.status_code, 201, reponse.content)
+        return reponse.json()
+
+    def test_facture_change_de_liste_selon_son_solde(self):
+        inscription = Inscription.objects.create(eleve=self.eleve, session=creer_session())
+        reponse = self.client.post(
+            "/api/factures/facture/",
+            {
+                "id_eleve": self.eleve.id,
+                "id_inscription": inscription.id,
+                "details_facture": [
+                    {"description": "Cours", "montant": 80},
+                    {"description": "Matériel", "montant": 20},
+                ],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(reponse.status_code, 201, reponse.content)
+        facture_id = reponse.json()
+        self.assertIn(facture_id, self.ids("impayees"))
+
+        self.payer(facture_id, 60)
+        self.assertIn(facture_id, self.ids("impayees"))
+
+        dernier = self.payer(facture_id, 40)
+        self.assertEqual(self.ids("impayees"), set())
+        self.assertEqual(self.ids("payees"), {facture_id})
+
+        self.assertEqual(self.client.delete(f"/api/factures/paiement/{dernier}/").status_code, 204)
+        self.assertEqual(self.ids("impayees"), {facture_id})
+
+    def test_facture_sans_detail_est_soldee(self):
+        facture = Facture.objects.create(eleve=self.eleve)
+        facture.refresh_from_db()
 
-# Create your tests here.
+        self.assertFalse(facture.impayee)
+        self.assertEqual(self.ids("payees"), {facture.id})
@@ -0,0 +1,8 @@
+from taches.file import travail
+
+from .models import actualiser_factures_impayees
+
+
+@travail("recalculer_factures_impayees", tentatives=3)
+def recalculer_factures_impayees():
+    return {"factures": actualiser_factures_impayees()}
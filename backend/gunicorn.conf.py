@@ -0,0 +1,34 @@
+"""
+Configuration gunicorn, lue depuis le dossier de lancement (``gunicorn`` sans argument).
+
+SERVEUR_MODE choisit le déploiement :
+- ``wsgi`` (défaut) : workers synchrones sur backend_ecole_peg.wsgi ;
+- ``asgi`` : workers uvicorn sur backend_ecole_peg.asgi. Les vues async
+  (tableau de bord, dossier élève) lisent leurs panneaux en parallèle, sur
+  le pool de connexions (DB_POOL_TAILLE), sans bloquer le worker ; les vues sync passent par le pool de threads de Django.
+
+Nombre de workers : WEB_CONCURRENCY (lu par gunicorn), adresse : GUNICORN_BIND.
+"""
+import glob
+import os
+
+SERVEUR_MODE = os.getenv("SERVEUR_MODE", "wsgi").lower()
+
+# PORT : fourni par les hébergeurs de type Procfile
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+if SERVEUR_MODE == "asgi":
+    wsgi_app = "backend_ecole_peg.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+elif SERVEUR_MODE == "wsgi":
+    wsgi_app = "backend_ecole_peg.wsgi:application"
+else:
+    raise RuntimeError(f"SERVEUR_MODE inconnu : {SERVEUR_MODE} (wsgi ou asgi)")
+
+
+def on_starting(server):
+    # Les compteurs /metrics repartent de zéro à chaque démarrage (voir performance.metriques)
+    dossier = os.getenv("METRIQUES_DOSSIER")
+    if dossier:
+        for fichier in glob.glob(os.path.join(dossier, "*.json")):
+            os.remove(fichier)
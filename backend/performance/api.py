@@ -0,0 +1,39 @@
+from ninja import Router
+
+from .cache_objets import statistiques
+from .connexions import POOL
+from .instrumentation import AGREGATS
+
+router = Router()
+
+
+def staff_seulement(request):
+    """Réservé aux comptes staff connectés à l'admin Django (session)."""
+    utilisateur = getattr(request, "user", None)
+    return bool(utilisateur and utilisateur.is_authenticated and utilisateur.is_staff)
+
+
+# ------------------- ROUTES -------------------
+@router.get("/", auth=staff_seulement)
+def agregats_routes(request):
+    """Agrégats glissants par route (processus courant, INSTRUMENTATION_SQL activé)."""
+    return {"routes": AGREGATS.instantane()}
+
+
+@router.delete("/", auth=staff_seulement)
+def vider_agregats(request):
+    AGREGATS.vider()
+    return {"success": True}
+
+
+# ------------------- CACHE -------------------
+@router.get("/cache/", auth=staff_seulement)
+def statistiques_cache(request):
+    return statistiques()
+
+
+# ------------------- CONNEXIONS -------------------
+@router.get("/connexions/", auth=staff_seulement)
+def etat_connexions(request):
+    """Connexions à la base du processus courant (pool, attentes, fermetures)."""
+    return {"bases": POOL.instantane()}
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
+
+
+class PerformanceConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'performance'
+
+    def ready(self):
+        import performance.signals
+        from .postgresql import creer_index_trigrammes
+        from .rattrapage import noter_schema, rattraper
+
+        post_migrate.connect(creer_index_trigrammes, sender=self)
+        pre_migrate.connect(noter_schema, sender=self)
+        post_migrate.connect(rattraper, sender=self)
@@ -0,0 +1,89 @@
+"""
+Cache en lecture des réponses de détail (élève, session, facture).
+
+La réponse est stockée déjà encodée, par type et clé primaire, dans le cache
+Django "objets" (voir CACHES). Les entrées sont évincées après le commit de
+toute écriture qui les concerne, y compris via les tables liées (pays,
+cours, enseignant, garant...) : voir performance.signals. La durée de vie
+(CACHE_OBJETS_DUREE) borne l'écart possible quand une lecture concurrente
+réécrit une valeur juste après son éviction.
+"""
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from backend_ecole_peg.renderers import RenduJSON
+
+from .metriques import REGISTRE
+
+TYPES = ("eleve", "session", "facture")
+
+
+def _cache():
+    return caches["objets"]
+
+
+def _cle(type_objet: str, id_objet: Any) -> str:
+    return f"objet:{type_objet}:{id_objet}"
+
+
+def _compter(type_objet: str, resultat: str) -> None:
+    # Compté en mémoire du processus : un incr sur le cache partagé
+    # ajouterait un aller-retour réseau à chaque lecture
+    REGISTRE.incrementer("peg_cache_objets_total", type=type_objet, resultat=resultat)
+
+
+def lire_ou_calculer(
+    type_objet: str, id_objet: Any, calculer: Callable[[], Any]
+) -> Optional[bytes]:
+    """
+    Octets JSON de l'objet, depuis le cache ou ``calculer()`` (qui renvoie
+    le Schema/dict de réponse, ou None si l'objet n'existe pas : rien n'est
+    alors mis en cache).
+    """
+    cle = _cle(type_objet, id_objet)
+    octets = _cache().get(cle)
+    if octets is not None:
+        _compter(type_objet, "hits")
+        return octets
+
+    _compter(type_objet, "misses")
+    donnees = calculer()
+    if donnees is None:
+        return None
+    octets = RenduJSON().render(None, donnees, response_status=200)
+    _cache().set(cle, octets)
+    return octets
+
+
+def reponse(octets: bytes) -> HttpResponse:
+    return HttpResponse(octets, content_type="application/json")
+
+
+def evincer(type_objet: str, ids: Iterable[Any]) -> None:
+    cles = [_cle(type_objet, i) for i in ids]
+    if cles:
+        transaction.on_commit(lambda: _cache().delete_many(cles))
+
+
+def statistiques() -> Dict[str, Dict[str, Any]]:
+    """
+    Hits et misses par type, lus dans le registre des métriques : ceux du
+    processus courant, ou de tous les workers avec METRIQUES_DOSSIER.
+    """
+    comptes = {}
+    for labels, valeur in REGISTRE.compteurs("peg_cache_objets_total").items():
+        labels = dict(labels)
+        comptes[(labels["type"], labels["resultat"])] = int(valeur)
+    stats = {}
+    for type_objet in TYPES:
+        hits = comptes.get((type_objet, "hits"), 0)
+        misses = comptes.get((type_objet, "misses"), 0)
+        stats[type_objet] = {
+            "hits": hits,
+            "misses": misses,
+            "taux_hits": round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
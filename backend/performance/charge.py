@@ -0,0 +1,383 @@
+"""
+Test de charge : parcours du personnel rejoués contre un serveur lancé.
+
+``ClientHTTP`` est un client HTTP/1.1 minimal sur asyncio (une connexion
+keep-alive par utilisateur virtuel, cookies conservés), pour ne dépendre
+d'aucun paquet. Chaque utilisateur virtuel enchaîne des SCENARIOS tirés au
+sort selon leur poids ; chaque appel est mesuré sous le nom de son étape.
+
+Un 4xx est compté comme « refus » (session complète, élève déjà inscrit...),
+un 5xx, un timeout ou une connexion perdue comme « erreur ». Les scénarios
+d'écriture modifient la base du serveur visé : à lancer sur une base de
+test (generer_donnees_test), ou avec ``lecture_seule``.
+"""
+import asyncio
+import json
+import random
+import ssl
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+
+class ErreurHTTP(Exception):
+    pass
+
+
+@dataclass
+class ReponseHTTP:
+    statut: int
+    entetes: Dict[str, str]
+    corps: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.corps) if self.corps else None
+
+
+class ClientHTTP:
+    METHODES_REJOUABLES = ("GET", "HEAD")
+
+    def __init__(self, url_base: str, timeout: float = 30.0):
+        morceaux = urlsplit(url_base)
+        self.hote = morceaux.hostname or "127.0.0.1"
+        self.ssl = ssl.create_default_context() if morceaux.scheme == "https" else None
+        self.port = morceaux.port or (443 if self.ssl else 80)
+        self.prefixe = morceaux.path.rstrip("/")
+        self.timeout = timeout
+        self.cookies: Dict[str, str] = {}
+        self._lecteur: Optional[asyncio.StreamReader] = None
+        self._ecrivain: Optional[asyncio.StreamWriter] = None
+
+    async def _connecter(self) -> None:
+        self._lecteur, self._ecrivain = await asyncio.open_connection(
+            self.hote, self.port, ssl=self.ssl
+        )
+
+    async def fermer(self) -> None:
+        if self._ecrivain is not None:
+            self._ecrivain.close()
+            try:
+                await self._ecrivain.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+        self._lecteur = self._ecrivain = None
+
+    async def requete(self, methode: str, chemin: str, donnees: Any = None) -> ReponseHTTP:
+        corps = json.dumps(donnees).encode() if donnees is not None else b""
+        entetes = [
+            f"{methode} {self.prefixe}{chemin} HTTP/1.1",
+            f"Host: {self.hote}:{self.port}",
+            "Accept: application/json",
+            "Connection: keep-alive",
+            f"Content-Length: {len(corps)}",
+        ]
+        if donnees is not None:
+            entetes.append("Content-Type: application/json")
+        if self.cookies:
+            entetes.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        message = ("\r\n".join(entetes) + "\r\n\r\n").encode() + corps
+
+        # Une connexion gardée ouverte peut avoir été fermée par le serveur
+        # entre deux requêtes : une seule nouvelle tentative, sur une connexion
+        # neuve, et seulement en lecture. Une écriture a pu être traitée avant
+        # la coupure : la rejouer fausserait les mesures (doublons), elle
+        # compte comme une erreur.
+        for tentative in range(2):
+            reutilisee = self._ecrivain is not None
+            if not reutilisee:
+                await self._connecter()
+            try:
+                self._ecrivain.write(message)
+                await self._ecrivain.drain()
+                return await asyncio.wait_for(self._lire_reponse(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.fermer()
+                if not reutilisee or tentative or methode not in self.METHODES_REJOUABLES:
+                    raise
+            except BaseException:
+                await self.fermer()
+                raise
+        raise ErreurHTTP("connexion impossible")
+
+    async def _lire_reponse(self) -> ReponseHTTP:
+        ligne = await self._lecteur.readuntil(b"\r\n")
+        parties = ligne.decode("latin-1").split(" ", 2)
+        if len(parties) < 2 or not parties[0].startswith("HTTP/"):
+            raise ErreurHTTP(f"réponse invalide : {ligne!r}")
+        statut = int(parties[1])
+
+        entetes: Dict[str, str] = {}
+        while True:
+            ligne = (await self._lecteur.readuntil(b"\r\n")).decode("latin-1").rstrip("\r\n")
+            if not ligne:
+                break
+            nom, _, valeur = ligne.partition(":")
+            nom, valeur = nom.strip().lower(), valeur.strip()
+            if nom == "set-cookie":
+                cle, _, reste = valeur.partition("=")
+                self.cookies[cle] = reste.split(";", 1)[0]
+            entetes[nom] = valeur
+
+        if entetes.get("transfer-encoding", "").lower() == "chunked":
+            morceaux = []
+            while True:
+                taille = int((await self._lecteur.readuntil(b"\r\n")).split(b";")[0], 16)
+                if taille == 0:
+                    await self._lecteur.readuntil(b"\r\n")
+                    break
+                morceaux.append(await self._lecteur.readexactly(taille))
+                await self._lecteur.readexactly(2)
+            corps = b"".join(morceaux)
+        elif "content-length" in entetes:
+            corps = await self._lecteur.readexactly(int(entetes["content-length"]))
+        else:
+            corps = await self._lecteur.read()
+            entetes["connection"] = "close"
+
+        if entetes.get("connection", "").lower() == "close":
+            await self.fermer()
+        return ReponseHTTP(statut, entetes, corps)
+
+
+# ------------------- MESURES -------------------
+def percentile(valeurs: List[float], p: float) -> float:
+    if not valeurs:
+        return 0.0
+    tries = sorted(valeurs)
+    return tries[min(len(tries) - 1, int(p * len(tries)))]
+
+
+@dataclass
+class Statistiques:
+    durees: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    refus: Counter = field(default_factory=Counter)
+    erreurs: Counter = field(default_factory=Counter)
+    # Appels sans réponse (timeout, connexion), inclus dans erreurs
+    sans_reponse: Counter = field(default_factory=Counter)
+    exemples_erreurs: Dict[str, str] = field(default_factory=dict)
+    scenarios: Counter = field(default_factory=Counter)
+
+    def rapport(self, duree: float) -> Dict[str, Any]:
+        etapes = {}
+        for nom in sorted(set(self.durees) | set(self.erreurs)):
+            durees = self.durees.get(nom, [])
+            total = len(durees) + self.sans_reponse[nom]
+            etapes[nom] = {
+                "appels": total,
+                "par_seconde": round(total / duree, 2) if duree else 0.0,
+                "refus": self.refus[nom],
+                "erreurs": self.erreurs[nom],
+                "taux_erreur": round(self.erreurs[nom] / total, 4) if total else 0.0,
+                "p50_ms": round(percentile(durees, 0.50), 2),
+                "p90_ms": round(percentile(durees, 0.90), 2),
+                "p99_ms": round(percentile(durees, 0.99), 2),
+                "max_ms": round(max(durees), 2) if durees else 0.0,
+                "exemple_erreur": self.exemples_erreurs.get(nom),
+            }
+        toutes = [d for durees in self.durees.values() for d in durees]
+        appels = len(toutes) + sum(self.sans_reponse.values())
+        return {
+            "duree_s": round(duree, 2),
+            "appels": appels,
+            "par_seconde": round(appels / duree, 2) if duree else 0.0,
+            "erreurs": sum(self.erreurs.values()),
+            "refus": sum(self.refus.values()),
+            "taux_erreur": round(sum(self.erreurs.values()) / appels, 4) if appels else 0.0,
+            "p50_ms": round(percentile(toutes, 0.50), 2),
+            "p90_ms": round(percentile(toutes, 0.90), 2),
+            "p99_ms": round(percentile(toutes, 0.99), 2),
+            "scenarios": dict(self.scenarios),
+            "etapes": etapes,
+        }
+
+
+# ------------------- UTILISATEUR VIRTUEL -------------------
+class Utilisateur:
+    def __init__(self, client: ClientHTTP, stats: Statistiques, donnees: dict, rng: random.Random):
+        self.client = client
+        self.stats = stats
+        self.donnees = donnees
+        self.rng = rng
+
+    async def appel(
+        self, etape: str, methode: str, chemin: str, donnees: Any = None
+    ) -> Optional[ReponseHTTP]:
+        """Réponse 2xx, ou None (refus ou erreur, comptés dans les statistiques)."""
+        debut = time.perf_counter()
+        try:
+            reponse = await self.client.requete(methode, chemin, donnees)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ErreurHTTP) as erreur:
+            self.stats.erreurs[etape] += 1
+            self.stats.sans_reponse[etape] += 1
+            self.stats.exemples_erreurs.setdefault(etape, repr(erreur))
+            return None
+        self.stats.durees[etape].append((time.perf_counter() - debut) * 1000)
+        if reponse.statut >= 500:
+            self.stats.erreurs[etape] += 1
+            self.stats.exemples_erreurs.setdefault(
+                etape, f"{reponse.statut} {reponse.corps[:200]!r}"
+            )
+            return None
+        if reponse.statut >= 400:
+            self.stats.refus[etape] += 1
+            return None
+        return reponse
+
+
+# ------------------- SCÉNARIOS -------------------
+async def tableau_de_bord(u: Utilisateur) -> None:
+    await u.appel("dashboard", "GET", "/api/eleves/statistiques/dashboard/")
+    await u.appel("anniversaires", "GET", "/api/eleves/anniversaires/")
+    await u.appel("sessions_ouvertes", "GET", "/api/cours/sessions/?statut=O")
+
+
+async def recherche_eleve(u: Utilisateur) -> None:
+    nom = u.rng.choice(u.donnees["noms"])
+    await u.appel("recherche", "GET", f"/api/recherche/?q={quote(nom)}")
+    eleve_id = u.rng.choice(u.donnees["eleves"])
+    await u.appel("fiche_eleve", "GET", f"/api/eleves/eleve/{eleve_id}/")
+    await u.appel("dossier_eleve", "GET", f"/api/eleves/eleves/{eleve_id}/dossier/")
+    await u.appel("factures_eleve", "GET", f"/api/factures/factures/eleve/{eleve_id}/")
+
+
+async def inscription(u: Utilisateur) -> None:
+    session_id = u.rng.choice(u.donnees["sessions"])
+    eleve_id = u.rng.choice(u.donnees["eleves"])
+    await u.appel("session", "GET", f"/api/cours/sessions/{session_id}/")
+    await u.appel(
+        "inscrire", "POST", f"/api/cours/{eleve_id}/inscription/", {"id_session": session_id}
+    )
+
+
+async def presences(u: Utilisateur) -> None:
+    session_id = u.rng.choice(u.donnees["sessions"])
+    reponse = await u.appel(
+        "fiches_session", "GET", f"/api/cours/session/{session_id}/fiches_presences/"
+    )
+    fiches = reponse.json() if reponse else None
+    if not fiches:
+        return
+    fiche_id = u.rng.choice(fiches)["id"]
+    reponse = await u.appel("fiche", "GET", f"/api/cours/fiche_presences/{fiche_id}/")
+    lignes = (reponse.json() or {}).get("presences", []) if reponse else []
+    if lignes:
+        modifiees = [
+            {"id": p["id"], "statut": u.rng.choice("PA")}
+            for p in u.rng.sample(lignes, min(10, len(lignes)))
+        ]
+        await u.appel("marquer_presences", "PUT", f"/api/cours/fiche_presences/{fiche_id}/", modifiees)
+
+
+async def paiement(u: Utilisateur) -> None:
+    page = u.rng.randint(1, 5)
+    reponse = await u.appel(
+        "factures_impayees", "GET", f"/api/factures/factures/impayees/?page={page}&taille=20"
+    )
+    factures = (reponse.json() or {}).get("factures", []) if reponse else []
+    if not factures:
+        return
+    facture = u.rng.choice(factures)
+    await u.appel("facture", "GET", f"/api/factures/facture/{facture['id']}/")
+    await u.appel(
+        "payer",
+        "POST",
+        "/api/factures/paiement/",
+        {
+            "montant": min(float(facture["montant_restant"]), 20.0),
+            "mode_paiement": "PER",
+            "methode_paiement": "CAR",
+            "id_facture": facture["id"],
+        },
+    )
+
+
+# nom: (poids, écrit en base, fonction)
+SCENARIOS: Dict[str, Tuple[int, bool, Callable[[Utilisateur], Awaitable[None]]]] = {
+    "tableau_de_bord": (3, False, tableau_de_bord),
+    "recherche_eleve": (5, False, recherche_eleve),
+    "inscription": (1, True, inscription),
+    "presences": (2, True, presences),
+    "paiement": (2, True, paiement),
+}
+
+
+# ------------------- EXÉCUTION -------------------
+async def decouvrir(client: ClientHTTP) -> dict:
+    """Ids et noms utilisés par les scénarios, lus via l'API du serveur visé."""
+    eleves = (await client.requete("GET", "/api/eleves/eleves/?taille=500&avec_total=false")).json()
+    sessions = (
+        await client.requete("GET", "/api/cours/sessions/?statut=O&taille=200&avec_total=false")
+    ).json()
+    donnees = {
+        "eleves": [e["id"] for e in eleves.get("eleves", [])],
+        "noms": sorted({e["nom"] for e in eleves.get("eleves", [])}),
+        "sessions": [s["id"] for s in sessions.get("sessions", [])],
+    }
+    if not donnees["eleves"] or not donnees["sessions"]:
+        raise ErreurHTTP("Aucun élève ou aucune session ouverte sur le serveur visé")
+    return donnees
+
+
+async def executer(
+    url: str,
+    utilisateurs: int = 10,
+    duree: float = 30.0,
+    montee: float = 0.0,
+    pause: float = 0.0,
+    scenarios: Optional[List[str]] = None,
+    lecture_seule: bool = False,
+    graine: int = 42,
+    mot_de_passe: Optional[str] = None,
+    timeout: float = 30.0,
+) -> Dict[str, Any]:
+    choisis = {
+        nom: (poids, fonction)
+        for nom, (poids, ecrit, fonction) in SCENARIOS.items()
+        if (not scenarios or nom in scenarios) and not (lecture_seule and ecrit)
+    }
+    if not choisis:
+        raise ValueError("Aucun scénario à exécuter")
+    noms = list(choisis)
+    poids = [choisis[n][0] for n in noms]
+
+    initial = ClientHTTP(url, timeout)
+    try:
+        donnees = await decouvrir(initial)
+    finally:
+        await initial.fermer()
+
+    stats = Statistiques()
+    fin = time.monotonic() + montee + duree
+
+    async def utilisateur(numero: int) -> None:
+        await asyncio.sleep(montee * numero / utilisateurs)
+        client = ClientHTTP(url, timeout)
+        rng = random.Random(graine * 1000 + numero)
+        u = Utilisateur(client, stats, donnees, rng)
+        try:
+            if mot_de_passe:
+                await u.appel("connexion", "POST", "/api/auth/login/", {"mot_de_passe": mot_de_passe})
+            while time.monotonic() < fin:
+                nom = rng.choices(noms, poids)[0]
+                await choisis[nom][1](u)
+                stats.scenarios[nom] += 1
+                if pause:
+                    await asyncio.sleep(rng.uniform(0.5, 1.5) * pause)
+        finally:
+            await client.fermer()
+
+    debut = time.monotonic()
+    await asyncio.gather(*(utilisateur(i) for i in range(utilisateurs)))
+    rapport = stats.rapport(time.monotonic() - debut)
+    rapport.update(
+        {
+            "date": date.today().isoformat(),
+            "url": url,
+            "utilisateurs": utilisateurs,
+            "lecture_seule": lecture_seule,
+        }
+    )
+    return rapport
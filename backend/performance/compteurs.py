@@ -0,0 +1,94 @@
+"""
+Compteurs métier maintenus par deltas.
+
+Chaque ligne d'un modèle suivi contribue une valeur à un compteur (1 par
+session ouverte, 1 par préinscription, +montant par détail de facture,
+-montant par paiement). Les signaux ajoutent au compteur la différence de
+contribution de la ligne écrite, une fois la transaction validée ; les mises
+à jour en masse appellent ``ajuster`` elles-mêmes. ``recalculer`` (commande
+recalculer_compteurs) repart des tables en cas de doute.
+
+Le solde impayé vaut donc total facturé - total payé, ce qui correspond à la
+somme des montants restants tant qu'aucune facture n'est payée au-delà de
+son total (refusé par Paiement.clean).
+"""
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from cours.models import Inscription, Session, StatutSessionChoices
+from factures.models import DetailFacture, Paiement
+
+from .models import CompteurMetier
+
+SESSIONS_OUVERTES = "sessions_ouvertes"
+PREINSCRIPTIONS = "preinscriptions_en_attente"
+SOLDE_IMPAYE = "solde_impaye"
+
+def montant(valeur) -> Decimal:
+    """Les montants peuvent encore être des float avant relecture en base."""
+    return valeur if isinstance(valeur, Decimal) else Decimal(str(valeur))
+
+
+# modèle -> (compteur, champ lu, contribution d'une ligne)
+CONTRIBUTIONS: Dict[type, Tuple[str, str, Callable[[object], Decimal]]] = {
+    Session: (
+        SESSIONS_OUVERTES,
+        "statut",
+        lambda s: Decimal(s.statut == StatutSessionChoices.OUVERTE),
+    ),
+    Inscription: (PREINSCRIPTIONS, "preinscription", lambda i: Decimal(bool(i.preinscription))),
+    DetailFacture: (SOLDE_IMPAYE, "montant", lambda d: montant(d.montant)),
+    Paiement: (SOLDE_IMPAYE, "montant", lambda p: -montant(p.montant)),
+}
+
+
+def _somme(qs) -> Decimal:
+    return qs.aggregate(s=Sum("montant"))["s"] or Decimal(0)
+
+
+CALCULS: Dict[str, Callable[[], Decimal]] = {
+    SESSIONS_OUVERTES: lambda: Decimal(
+        Session.objects.filter(statut=StatutSessionChoices.OUVERTE).count()
+    ),
+    PREINSCRIPTIONS: lambda: Decimal(Inscription.objects.filter(preinscription=True).count()),
+    SOLDE_IMPAYE: lambda: _somme(DetailFacture.objects) - _somme(Paiement.objects),
+}
+
+# Jauges exposées par /metrics : (compteur, nom de la métrique, aide)
+JAUGES: List[Tuple[str, str, str]] = [
+    (SESSIONS_OUVERTES, "peg_sessions_ouvertes", "Sessions au statut ouvert"),
+    (PREINSCRIPTIONS, "peg_preinscriptions_en_attente", "Inscriptions encore en préinscription"),
+    (SOLDE_IMPAYE, "peg_solde_impaye_chf", "Total facturé moins total payé (CHF)"),
+]
+
+
+def ajuster(nom: str, delta) -> None:
+    """
+    Ajoute ``delta`` au compteur après le commit de la transaction en cours :
+    la ligne partagée n'est verrouillée que le temps de son UPDATE, et non
+    jusqu'à la fin de chaque requête qui écrit. Rien n'est appliqué si la
+    transaction est annulée.
+    """
+    if delta:
+        transaction.on_commit(lambda: _appliquer(nom, delta))
+
+
+def _appliquer(nom: str, delta) -> None:
+    if not CompteurMetier.objects.filter(nom=nom).update(valeur=F("valeur") + delta):
+        # Première utilisation : la valeur complète inclut déjà l'écriture validée
+        recalculer([nom])
+
+
+def recalculer(noms=None) -> Dict[str, Decimal]:
+    valeurs = {}
+    for nom in noms or CALCULS:
+        valeurs[nom] = CALCULS[nom]()
+        CompteurMetier.objects.update_or_create(nom=nom, defaults={"valeur": valeurs[nom]})
+    return valeurs
+
+
+def valeurs() -> Dict[str, Decimal]:
+    return dict(CompteurMetier.objects.values_list("nom", "valeur"))
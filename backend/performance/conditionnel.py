@@ -0,0 +1,53 @@
+"""
+GET conditionnel (ETag / Last-Modified) pour les endpoints de lecture.
+
+    @router.get("/cours/")
+    @get_conditionnel(Cours)
+    def get_cours(request): ...
+
+L'ETag est dérivé du chemin complet (paramètres compris) et des versions des
+tables lues par l'endpoint : une requête ``If-None-Match`` qui correspond
+reçoit un 304 après la seule lecture des versions, sans exécuter la vue.
+``quotidien=True`` y ajoute la date du jour, pour les réponses qui en
+dépendent (ex. fermeture des sessions échues).
+"""
+import hashlib
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from ninja.decorators import decorate_view
+
+from .versions import label, lire_versions
+
+
+def get_conditionnel(*tables, quotidien: bool = False):
+    labels = sorted(label(t) for t in tables)
+
+    def versions(request):
+        # etag_func et last_modified_func sont appelées toutes les deux
+        if not hasattr(request, "_versions_tables"):
+            request._versions_tables = lire_versions(labels)
+        return request._versions_tables
+
+    def etag(request, *args, **kwargs):
+        lues = versions(request)
+        parties = [request.get_full_path()]
+        parties += [f"{nom}:{lues.get(nom, (0, None))[0]}" for nom in labels]
+        if quotidien:
+            parties.append(timezone.localdate().isoformat())
+        return hashlib.md5("|".join(parties).encode()).hexdigest()
+
+    def derniere_modification(request, *args, **kwargs):
+        dates = [date for _, date in versions(request).values()]
+        if quotidien:
+            minuit = datetime.combine(timezone.localdate(), time.min)
+            dates.append(timezone.make_aware(minuit))
+        return max(dates) if dates else None
+
+    # no-cache : le navigateur garde la réponse mais la revalide à chaque fois
+    return decorate_view(
+        condition(etag_func=etag, last_modified_func=derniere_modification),
+        cache_control(private=True, no_cache=True),
+    )
@@ -0,0 +1,166 @@
+"""
+Connexions à la base : pool par worker, vérifications et métriques.
+
+Les moteurs ``performance.db.<moteur>`` (mysql, postgresql, sqlite3)
+reprennent ceux de Django avec ``SuiviConnexions`` :
+
+- sans pool (DB_POOL_TAILLE=0), Django garde une connexion persistante par
+  thread pendant CONN_MAX_AGE secondes et la vérifie à chaque requête
+  (CONN_HEALTH_CHECKS) ; le suivi ne fait que mesurer ;
+- avec DB_POOL_TAILLE > 0, CONN_MAX_AGE vaut 0 : Django « ferme » la
+  connexion à chaque fin de requête et ``_close`` la rend au pool du worker
+  au lieu de la fermer. La connexion suivante, quel que soit son thread
+  (workers uvicorn : un thread par requête), reprend une connexion
+  disponible après un SELECT 1 si CONN_HEALTH_CHECKS est actif. Une
+  connexion plus vieille que DB_CONN_MAX_AGE est fermée au lieu d'être
+  reprise. Le pool ne borne que les connexions disponibles : une requête
+  n'attend jamais une connexion libre, elle en ouvre une.
+
+Chaque obtention de connexion (ouverture ou reprise) est mesurée : compteur
+``peg_db_connexions_total`` et histogramme ``peg_db_attente_connexion_secondes``
+dans /metrics ; état du pool du processus courant dans GET /api/_perf/connexions/.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from .metriques import REGISTRE
+
+
+class Pool:
+    def __init__(self):
+        self._verrou = threading.Lock()
+        # alias -> connexions disponibles (connexion brute, ouverte_a)
+        self._disponibles: Dict[str, Deque[Tuple[Any, float]]] = defaultdict(deque)
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    # ------------------- POOL -------------------
+    def prendre(self, alias: str, verifier: bool) -> Optional[Tuple[Any, float]]:
+        duree_max = settings.DB_CONN_MAX_AGE
+        while True:
+            with self._verrou:
+                if not self._disponibles[alias]:
+                    return None
+                brute, ouverte_a = self._disponibles[alias].pop()
+            if duree_max is not None and time.monotonic() - ouverte_a >= duree_max:
+                self._fermer(alias, brute, "age")
+                continue
+            if verifier and not self._utilisable(brute):
+                self._fermer(alias, brute, "verification")
+                continue
+            return brute, ouverte_a
+
+    def rendre(self, alias: str, brute, ouverte_a: float) -> bool:
+        with self._verrou:
+            if len(self._disponibles[alias]) >= settings.DB_POOL_TAILLE:
+                return False
+            self._disponibles[alias].append((brute, ouverte_a))
+        return True
+
+    def vider(self) -> None:
+        with self._verrou:
+            disponibles, self._disponibles = self._disponibles, defaultdict(deque)
+        for alias, file in disponibles.items():
+            for brute, _ in file:
+                self._fermer(alias, brute, "vidage")
+
+    @staticmethod
+    def _utilisable(brute) -> bool:
+        try:
+            curseur = brute.cursor()
+            try:
+                curseur.execute("SELECT 1")
+                curseur.fetchall()
+            finally:
+                curseur.close()
+            return True
+        except Exception:
+            return False
+
+    def _fermer(self, alias: str, brute, raison: str) -> None:
+        try:
+            brute.close()
+        except Exception:
+            pass
+        self.noter_fermeture(alias, raison)
+
+    # ------------------- MESURES -------------------
+    def noter_obtention(self, alias: str, origine: str, duree: float) -> None:
+        with self._verrou:
+            stats = self._stats[alias]
+            stats[f"obtenues_{origine}"] += 1
+            stats["en_cours"] += 1
+            stats["attente_totale_s"] += duree
+            stats["attente_max_s"] = max(stats["attente_max_s"], duree)
+        REGISTRE.incrementer("peg_db_connexions_total", base=alias, origine=origine)
+        REGISTRE.observer("peg_db_attente_connexion_secondes", duree, base=alias)
+
+    def noter_liberation(self, alias: str) -> None:
+        with self._verrou:
+            self._stats[alias]["en_cours"] -= 1
+
+    def noter_fermeture(self, alias: str, raison: str) -> None:
+        with self._verrou:
+            self._stats[alias][f"fermees_{raison}"] += 1
+        REGISTRE.incrementer("peg_db_connexions_fermees_total", base=alias, raison=raison)
+
+    def instantane(self) -> Dict[str, Dict[str, float]]:
+        with self._verrou:
+            resultat = {}
+            for alias in set(self._stats) | set(self._disponibles):
+                stats = dict(self._stats[alias])
+                obtenues = stats.get("obtenues_nouvelle", 0) + stats.get("obtenues_pool", 0)
+                stats["disponibles"] = len(self._disponibles[alias])
+                stats["taille_max"] = settings.DB_POOL_TAILLE
+                stats["attente_moyenne_ms"] = (
+                    round(stats.get("attente_totale_s", 0) / obtenues * 1000, 3) if obtenues else 0.0
+                )
+                stats["attente_max_ms"] = round(stats.pop("attente_max_s", 0) * 1000, 3)
+                stats.pop("attente_totale_s", None)
+                resultat[alias] = stats
+            return resultat
+
+
+POOL = Pool()
+
+
+class SuiviConnexions:
+    """À placer avant le DatabaseWrapper de Django (voir performance/db/)."""
+
+    _ouverte_a: Optional[float] = None
+    _reprise: Optional[Tuple[Any, float]] = None
+
+    def connect(self):
+        debut = time.perf_counter()
+        self._reprise = None
+        if settings.DB_POOL_TAILLE:
+            self._reprise = POOL.prendre(self.alias, self.settings_dict["CONN_HEALTH_CHECKS"])
+        super().connect()
+        POOL.noter_obtention(
+            self.alias, "pool" if self._reprise else "nouvelle", time.perf_counter() - debut
+        )
+
+    def get_new_connection(self, conn_params):
+        if self._reprise is not None:
+            brute, self._ouverte_a = self._reprise
+            return brute
+        self._ouverte_a = time.monotonic()
+        return super().get_new_connection(conn_params)
+
+    def _close(self):
+        if self.connection is None:
+            return None
+        POOL.noter_liberation(self.alias)
+        if (
+            settings.DB_POOL_TAILLE
+            and not self.in_atomic_block
+            and not self.errors_occurred
+            and self.get_autocommit()
+            and POOL.rendre(self.alias, self.connection, self._ouverte_a)
+        ):
+            return None
+        POOL.noter_fermeture(self.alias, "fermeture")
+        return super()._close()
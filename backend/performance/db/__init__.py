@@ -0,0 +1,4 @@
+"""
+Moteurs de base de données de Django avec le suivi des connexions
+(pool, vérifications, métriques : voir performance.connexions).
+"""
@@ -0,0 +1,7 @@
+from django.db.backends.mysql import base
+
+from performance.connexions import SuiviConnexions
+
+
+class DatabaseWrapper(SuiviConnexions, base.DatabaseWrapper):
+    pass
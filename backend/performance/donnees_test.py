@@ -0,0 +1,542 @@
+"""
+Jeu de données synthétique à l'échelle de la production.
+
+``Generateur`` crée, par lots de ``bulk_create``, des données cohérentes
+entre elles et avec les contraintes des modèles :
+ - emails uniques (dérivés de l'id), un garant pour ~20 % des élèves ;
+ - une inscription par (élève, session), statut calculé comme
+   Inscription.save ;
+ - une fiche par (session, mois), une présence par (élève, date) ;
+ - chaque facture liée soit à une inscription, soit à un cours privé ET un
+   élève ; paiements jamais supérieurs au montant de la facture ;
+ - cours privés sans chevauchement horaire par enseignant.
+
+Les ids sont attribués ici (à partir du maximum existant) : bulk_create ne
+les renvoie pas sous MySQL. À graine, échelle et date de référence égales,
+une base vide reçoit exactement les mêmes données.
+
+bulk_create ne déclenche aucun signal : statut des élèves, compteurs,
+versions et index de recherche sont recalculés à la fin (``finaliser``).
+"""
+import calendar
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, time as heure, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+
+from cours.models import (
+    Cours,
+    CoursPrive,
+    Enseignant,
+    FichePresences,
+    Inscription,
+    LieuCoursPriveChoices,
+    NiveauChoices,
+    PeriodeJourneeChoices,
+    Presence,
+    Session,
+    StatutInscriptionChoices,
+    StatutPresenceChoices,
+    StatutSessionChoices,
+    TypeCoursChoices,
+    actualiser_statut_inscription,
+)
+from eleves.models import Eleve, Garant, Pays, SexeChoices, TypePermisChoices
+from factures.models import (
+    DetailFacture,
+    Facture,
+    MethodePaiementChoices,
+    ModePaiementChoices,
+    Paiement,
+    actualiser_factures_impayees,
+)
+
+# Volumes à l'échelle 1
+VOLUMES = {
+    "enseignants": 100,
+    "garants": 10_000,
+    "eleves": 50_000,
+    "sessions": 5_000,
+    "cours_prives": 25_000,
+    "presences": 500_000,
+}
+
+PRENOMS = [
+    "Léa", "Emma", "Chloé", "Sarah", "Inès", "Amira", "Sofia", "Maria", "Elena", "Fatima",
+    "Lucas", "Noah", "Hugo", "Adam", "Mohamed", "Luca", "David", "Ahmed", "Pedro", "Yusuf",
+    "Anna", "Olga", "Mei", "Aïcha", "Ana", "Jonas", "Milan", "Omar", "Tenzin", "Samuel",
+]
+NOMS = [
+    "Martin", "Bernard", "Dubois", "Rossi", "Ferreira", "Silva", "Müller", "Meier", "Haddad",
+    "Nguyen", "Kovač", "Yilmaz", "Popescu", "Diallo", "Gashi", "Berisha", "Santos", "Garcia",
+    "Lopez", "Schmid", "Keller", "Weber", "Mansour", "Ivanova", "Chen", "Rahimi", "Costa",
+    "Pereira", "Moreau", "Fontaine",
+]
+LANGUES = ["Français", "Arabe", "Portugais", "Espagnol", "Tigrinya", "Ukrainien", "Dari", "Anglais"]
+LOCALITES = [("1201", "Genève"), ("1203", "Genève"), ("1205", "Genève"), ("1213", "Onex"),
+             ("1220", "Les Avanchets"), ("1227", "Carouge"), ("1204", "Genève"), ("1219", "Le Lignon")]
+DECOUVERTE = ["Internet", "Bouche-à-oreille", "Hospice général", "Office cantonal", None]
+MOTIFS_SORTIE = ["Déménagement", "Travail", "Raisons personnelles", "Niveau atteint"]
+
+CENTIME = Decimal("0.01")
+
+
+@contextmanager
+def _dates_libres(*modeles: type) -> Iterator[None]:
+    """Désactive auto_now_add le temps de la génération, pour dater le passé."""
+    champs = [
+        champ
+        for modele in modeles
+        for champ in modele._meta.concrete_fields
+        if getattr(champ, "auto_now_add", False)
+    ]
+    for champ in champs:
+        champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ in champs:
+            champ.auto_now_add = True
+
+
+class Generateur:
+    def __init__(
+        self,
+        echelle: float = 1.0,
+        graine: int = 42,
+        taille_lot: int = 5000,
+        reference: date = None,
+        journal: Callable[[str], None] = print,
+    ):
+        self.echelle = echelle
+        self.rng = random.Random(graine)
+        self.taille_lot = taille_lot
+        self.reference = reference or date.today()
+        self.journal = journal
+        self.volumes = {nom: max(1, int(v * echelle)) for nom, v in VOLUMES.items()}
+        self.crees: Dict[str, int] = {}
+
+    # ------------------- OUTILS -------------------
+    def _premier_id(self, modele) -> int:
+        return (modele.objects.aggregate(m=models.Max("id"))["m"] or 0) + 1
+
+    def _inserer(self, modele, objets) -> int:
+        """bulk_create par lots d'un itérable (générateur accepté)."""
+        debut = time.perf_counter()
+        total = 0
+        lot = []
+        for objet in objets:
+            lot.append(objet)
+            if len(lot) >= self.taille_lot:
+                modele.objects.bulk_create(lot)
+                total += len(lot)
+                lot = []
+        if lot:
+            modele.objects.bulk_create(lot)
+            total += len(lot)
+        cle = modele._meta.label
+        self.crees[cle] = self.crees.get(cle, 0) + total
+        self.journal(f"{cle:<28} {total:>9}  ({time.perf_counter() - debut:.1f} s)")
+        return total
+
+    def _date(self, debut: date, fin: date) -> date:
+        return debut + timedelta(days=self.rng.randint(0, max(0, (fin - debut).days)))
+
+    def _telephone(self) -> str:
+        r = self.rng
+        return f"+41 7{r.choice('6789')} {r.randint(100, 999)} {r.randint(10, 99)} {r.randint(10, 99)}"
+
+    def _personne(self, id_objet: int, prefixe: str) -> dict:
+        r = self.rng
+        prenom, nom = r.choice(PRENOMS), r.choice(NOMS)
+        npa, localite = r.choice(LOCALITES)
+        return {
+            "id": id_objet,
+            "nom": nom,
+            "prenom": prenom,
+            "rue": f"Rue {r.choice(NOMS)}",
+            "numero": str(r.randint(1, 120)),
+            "npa": npa,
+            "localite": localite,
+            "telephone": self._telephone(),
+            "email": f"{prefixe}{id_objet}@exemple.ch",
+        }
+
+    # ------------------- GÉNÉRATION -------------------
+    def generer(self) -> Dict[str, int]:
+        pays = list(Pays.objects.values_list("id", flat=True))
+        if not pays:
+            raise ValueError("Aucun pays en base : lancer d'abord generer_pays")
+
+        with transaction.atomic(), _dates_libres(Inscription, Facture, Paiement):
+            enseignants = self._enseignants()
+            cours = self._cours()
+            garants = self._garants()
+            eleves = self._eleves(pays, garants)
+            sessions = self._sessions(cours, enseignants)
+            inscriptions = self._inscriptions(sessions, eleves)
+            self._presences(sessions, inscriptions)
+            cours_prives = self._cours_prives(enseignants, eleves)
+            self._factures(sessions, inscriptions, cours_prives)
+        return self.crees
+
+    def _enseignants(self) -> List[int]:
+        premier = self._premier_id(Enseignant)
+        ids = list(range(premier, premier + self.volumes["enseignants"]))
+        self._inserer(
+            Enseignant,
+            (
+                Enseignant(id=i, nom=self.rng.choice(NOMS)[:20], prenom=self.rng.choice(PRENOMS))
+                for i in ids
+            ),
+        )
+        return ids
+
+    def _cours(self) -> List[Tuple[int, Decimal]]:
+        """Un cours par (type, niveau), réutilisés s'ils existent déjà."""
+        if not Cours.objects.exists():
+            premier = self._premier_id(Cours)
+            combinaisons = [(t, n) for t in TypeCoursChoices.values for n in NiveauChoices.values]
+            self._inserer(
+                Cours,
+                (
+                    Cours(
+                        id=premier + k,
+                        nom=f"Français {niveau} {'intensif' if type_cours == 'I' else 'semi-intensif'}",
+                        type_cours=type_cours,
+                        niveau=niveau,
+                        heures_par_semaine=20 if type_cours == "I" else 10,
+                        duree_semaines=4,
+                        tarif=Decimal(800 if type_cours == "I" else 450),
+                    )
+                    for k, (type_cours, niveau) in enumerate(combinaisons)
+                ),
+            )
+        return list(Cours.objects.order_by("id").values_list("id", "tarif"))
+
+    def _garants(self) -> List[int]:
+        premier = self._premier_id(Garant)
+        ids = list(range(premier, premier + self.volumes["garants"]))
+        self._inserer(Garant, (Garant(**self._personne(i, "garant")) for i in ids))
+        return ids
+
+    def _eleves(self, pays: List[int], garants: List[int]) -> List[int]:
+        r = self.rng
+        premier = self._premier_id(Eleve)
+        ids = list(range(premier, premier + self.volumes["eleves"]))
+
+        def eleves():
+            for i in ids:
+                permis = r.choice(TypePermisChoices.values)
+                yield Eleve(
+                    **self._personne(i, "eleve"),
+                    date_naissance=self._date(date(1960, 1, 1), date(2007, 12, 31)),
+                    lieu_naissance=r.choice(LOCALITES)[1] if r.random() < 0.3 else None,
+                    sexe=r.choice(SexeChoices.values),
+                    type_permis=permis,
+                    # Eleve.clean refuse un permis déjà échu
+                    date_permis=(
+                        self._date(self.reference, self.reference + timedelta(days=1500))
+                        if permis != TypePermisChoices.PAS_DE_PERMIS
+                        else None
+                    ),
+                    niveau=r.choice(NiveauChoices.values + [None]),
+                    langue_maternelle=r.choice(LANGUES),
+                    src_decouverte=r.choice(DECOUVERTE),
+                    pays_id=r.choice(pays),
+                    garant_id=r.choice(garants) if r.random() < 0.2 else None,
+                )
+
+        self._inserer(Eleve, eleves())
+        return ids
+
+    def _sessions(self, cours, enseignants) -> Dict[int, tuple]:
+        """{id: (date_debut, date_fin, seances_mois, tarif, capacite_max)}"""
+        r = self.rng
+        premier = self._premier_id(Session)
+        sessions = {}
+        objets = []
+        for i in range(premier, premier + self.volumes["sessions"]):
+            cours_id, tarif = r.choice(cours)
+            debut = self._date(
+                self.reference - timedelta(days=3 * 365), self.reference + timedelta(days=90)
+            )
+            fin = debut + timedelta(weeks=r.choice((4, 8, 12, 16, 24)))
+            capacite = r.randint(12, 30)
+            seances = r.randint(4, 16)
+            sessions[i] = (debut, fin, seances, tarif, capacite)
+            objets.append(
+                Session(
+                    id=i,
+                    date_debut=debut,
+                    date_fin=fin,
+                    periode_journee=r.choice(PeriodeJourneeChoices.values),
+                    capacite_max=capacite,
+                    statut=(
+                        StatutSessionChoices.FERMÉE
+                        if fin < self.reference
+                        else StatutSessionChoices.OUVERTE
+                    ),
+                    cours_id=cours_id,
+                    enseignant_id=r.choice(enseignants) if r.random() < 0.9 else None,
+                    seances_mois=seances,
+                )
+            )
+        self._inserer(Session, objets)
+        return sessions
+
+    def _inscriptions(self, sessions, eleves) -> Dict[int, List[Tuple[int, int, date]]]:
+        """{session_id: [(inscription_id, eleve_id, date_inscription)]}"""
+        r = self.rng
+        id_inscription = self._premier_id(Inscription)
+        par_session = {}
+        objets = []
+        for session_id, (debut, fin, _, _, capacite) in sessions.items():
+            par_session[session_id] = []
+            for eleve_id in r.sample(eleves, min(len(eleves), r.randint(capacite // 2, capacite))):
+                date_inscription = debut - timedelta(days=r.randint(0, 30))
+                date_sortie = motif = None
+                if r.random() < 0.05:
+                    date_sortie = self._date(debut, fin)
+                    motif = r.choice(MOTIFS_SORTIE)
+                # Mêmes règles que Inscription.save
+                statut = (
+                    StatutInscriptionChoices.INACTIF
+                    if date_sortie or date_inscription > fin
+                    else StatutInscriptionChoices.ACTIF
+                )
+                objets.append(
+                    Inscription(
+                        id=id_inscription,
+                        eleve_id=eleve_id,
+                        session_id=session_id,
+                        date_inscription=date_inscription,
+                        statut=statut,
+                        preinscription=debut > self.reference and r.random() < 0.1,
+                        date_sortie=date_sortie,
+                        motif_sortie=motif,
+                    )
+                )
+                par_session[session_id].append((id_inscription, eleve_id, date_inscription))
+                id_inscription += 1
+        self._inserer(Inscription, objets)
+        return par_session
+
+    def _presences(self, sessions, inscriptions) -> None:
+        r = self.rng
+        id_fiche = self._premier_id(FichePresences)
+        fiches = []
+        # (fiche_id, dates des séances, élèves) ; les présences sont tirées ensuite
+        seances: List[Tuple[int, List[date], List[int]]] = []
+        for session_id, (debut, fin, seances_mois, _, _) in sessions.items():
+            fin_effective = min(fin, self.reference)
+            annee, mois = debut.year, debut.month
+            while date(annee, mois, 1) <= fin_effective:
+                dernier = date(annee, mois, calendar.monthrange(annee, mois)[1])
+                jours = [
+                    debut_mois + timedelta(days=k)
+                    for debut_mois in [max(debut, date(annee, mois, 1))]
+                    for k in range((min(dernier, fin_effective) - debut_mois).days + 1)
+                    if (debut_mois + timedelta(days=k)).weekday() < 5
+                ]
+                if jours:
+                    fiches.append(
+                        FichePresences(
+                            id=id_fiche, session_id=session_id, mois=f"{mois:02d}", annee=annee
+                        )
+                    )
+                    eleves = [e for _, e, _ in inscriptions[session_id]]
+                    seances.append(
+                        (id_fiche, sorted(r.sample(jours, min(seances_mois, len(jours)))), eleves)
+                    )
+                    id_fiche += 1
+                annee, mois = (annee + 1, 1) if mois == 12 else (annee, mois + 1)
+        self._inserer(FichePresences, fiches)
+
+        possibles = sum(len(dates) * len(eleves) for _, dates, eleves in seances)
+        proportion = min(1.0, self.volumes["presences"] / possibles) if possibles else 0
+        deja_vues = set()
+
+        def presences():
+            id_presence = self._premier_id(Presence)
+            for fiche_id, dates, eleves in seances:
+                for eleve_id in eleves:
+                    for jour in dates:
+                        # Un élève inscrit à deux sessions le même jour : une seule présence
+                        if r.random() >= proportion or (eleve_id, jour) in deja_vues:
+                            continue
+                        deja_vues.add((eleve_id, jour))
+                        yield Presence(
+                            id=id_presence,
+                            fiche_presences_id=fiche_id,
+                            eleve_id=eleve_id,
+                            date_presence=jour,
+                            statut=(
+                                StatutPresenceChoices.PRESENT
+                                if r.random() < 0.85
+                                else StatutPresenceChoices.ABSENT
+                            ),
+                        )
+                        id_presence += 1
+
+        self._inserer(Presence, presences())
+
+    def _cours_prives(self, enseignants, eleves) -> List[Tuple[int, Decimal, date, List[int]]]:
+        """[(cours_prive_id, tarif, date, eleve_ids)]"""
+        r = self.rng
+        premier = self._premier_id(CoursPrive)
+        premier_lien = self._premier_id(CoursPrive.eleves.through)
+        occupes = set()
+        cours_prives = []
+        objets = []
+        liens = []
+        for i in range(premier, premier + self.volumes["cours_prives"]):
+            enseignant_id = r.choice(enseignants)
+            jour = self._date(self.reference - timedelta(days=730), self.reference)
+            duree = r.choice((1, 1, 2))
+            debut = r.randint(8, 20 - duree)
+            creneaux = {(enseignant_id, jour, h) for h in range(debut, debut + duree)}
+            if creneaux & occupes:
+                continue  # CoursPrive.clean refuse les chevauchements
+            occupes |= creneaux
+            tarif = Decimal(90 * duree)
+            participants = r.sample(eleves, r.choice((1, 2, 2, 3)))
+            objets.append(
+                CoursPrive(
+                    id=i,
+                    date_cours_prive=jour,
+                    heure_debut=heure(debut),
+                    heure_fin=heure(debut + duree),
+                    tarif=tarif,
+                    lieu=r.choice(LieuCoursPriveChoices.values),
+                    enseignant_id=enseignant_id,
+                )
+            )
+            for eleve_id in participants:
+                liens.append(
+                    CoursPrive.eleves.through(
+                        id=premier_lien + len(liens), coursprive_id=i, eleve_id=eleve_id
+                    )
+                )
+            cours_prives.append((i, tarif, jour, participants))
+        self._inserer(CoursPrive, objets)
+        self._inserer(CoursPrive.eleves.through, liens)
+        return cours_prives
+
+    def _factures(self, sessions, inscriptions, cours_prives) -> None:
+        r = self.rng
+        id_facture = self._premier_id(Facture)
+        id_detail = self._premier_id(DetailFacture)
+        id_paiement = self._premier_id(Paiement)
+        factures, details, paiements = [], [], []
+
+        def facturer(emission, lignes, **lien):
+            nonlocal id_facture, id_detail, id_paiement
+            factures.append(
+                Facture(
+                    id=id_facture,
+                    date_emission=emission,
+                    date_echeance=emission + timedelta(days=30) if r.random() < 0.9 else None,
+                    **lien,
+                )
+            )
+            total = Decimal(0)
+            for description, montant, periode in lignes:
+                details.append(
+                    DetailFacture(
+                        id=id_detail,
+                        facture_id=id_facture,
+                        description=description,
+                        date_debut_periode=periode[0] if periode else None,
+                        date_fin_periode=periode[1] if periode else None,
+                        montant=montant,
+                    )
+                )
+                id_detail += 1
+                total += montant
+
+            # ~65 % payées entièrement, ~15 % en partie, le reste impayé
+            tirage = r.random()
+            if emission <= self.reference and tirage < 0.8:
+                payer = total if tirage < 0.65 else (total * Decimal(r.uniform(0.2, 0.8))).quantize(CENTIME)
+                versements = [payer] if r.random() < 0.7 or payer < 2 else [
+                    (payer / 2).quantize(CENTIME),
+                    payer - (payer / 2).quantize(CENTIME),
+                ]
+                for montant in versements:
+                    paiements.append(
+                        Paiement(
+                            id=id_paiement,
+                            facture_id=id_facture,
+                            date_paiement=self._date(emission, min(emission + timedelta(days=60), self.reference)),
+                            montant=montant,
+                            mode_paiement=r.choice(ModePaiementChoices.values),
+                            methode_paiement=r.choice(MethodePaiementChoices.values),
+                        )
+                    )
+                    id_paiement += 1
+            id_facture += 1
+
+        for session_id, inscrits in inscriptions.items():
+            debut, fin, _, tarif, _ = sessions[session_id]
+            # Une facture par tranche de 4 semaines commencée, au plus 4 par inscription
+            tranches = min(4, max(1, ((fin - debut).days + 27) // 28))
+            for inscription_id, _, date_inscription in inscrits:
+                for t in range(r.randint(1, tranches)):
+                    periode = (debut + timedelta(weeks=4 * t), min(fin, debut + timedelta(weeks=4 * t + 4)))
+                    lignes = [("Frais de cours", tarif, periode)]
+                    if t == 0 and r.random() < 0.3:
+                        lignes.append(("Frais d'inscription", Decimal(50), None))
+                    facturer(
+                        max(date_inscription, periode[0] - timedelta(days=7)),
+                        lignes,
+                        inscription_id=inscription_id,
+                    )
+
+        for cours_prive_id, tarif, jour, participants in cours_prives:
+            part = (tarif / len(participants)).quantize(CENTIME)
+            for eleve_id in participants:
+                facturer(
+                    jour,
+                    [("Cours privé", part, (jour, jour))],
+                    cours_prive_id=cours_prive_id,
+                    eleve_id=eleve_id,
+                )
+
+        self._inserer(Facture, factures)
+        self._inserer(DetailFacture, details)
+        self._inserer(Paiement, paiements)
+
+    # ------------------- APRÈS GÉNÉRATION -------------------
+    def finaliser(self, indexer: bool = True) -> None:
+        """Recalcule ce que les signaux auraient maintenu à jour."""
+        from recherche.indexation import reconstruire
+
+        from .compteurs import recalculer
+        from .versions import incrementer
+
+        modeles = [
+            Enseignant, Cours, Garant, Eleve, Session, Inscription, FichePresences, Presence,
+            CoursPrive, CoursPrive.eleves.through, Facture, DetailFacture, Paiement,
+        ]
+        # Ids attribués explicitement : remettre les séquences (PostgreSQL)
+        with connection.cursor() as curseur:
+            for sql in connection.ops.sequence_reset_sql(no_style(), modeles):
+                curseur.execute(sql)
+
+        with transaction.atomic():
+            actualiser_statut_inscription()
+            actualiser_factures_impayees()
+            recalculer()
+            incrementer(*modeles)
+        self.journal("Statuts des élèves, compteurs et versions recalculés")
+
+        if indexer:
+            debut = time.perf_counter()
+            total = reconstruire()
+            self.journal(f"Index de recherche : {total} documents ({time.perf_counter() - debut:.1f} s)")
@@ -0,0 +1,120 @@
+"""
+Appel des endpoints GET des routeurs eleves, cours et factures en processus
+(ninja TestClient), avec des paramètres de chemin tirés de la base courante.
+Partagé par banc_endpoints et conseiller_index.
+"""
+import asyncio
+from typing import Dict, Iterator, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from ninja.testing import TestClient
+from ninja.testing.client import NinjaResponse
+
+from backend_ecole_peg.api import api
+from cours.api import router as cours_router
+from cours.models import CoursPrive, FichePresences, Inscription
+from eleves.api import router as eleves_router
+from factures.api import router as factures_router
+
+from .referentiel import REFERENTIEL_COURS, REFERENTIEL_ENSEIGNANTS, REFERENTIEL_PAYS
+
+ROUTEURS = {"/eleves": eleves_router, "/cours": cours_router, "/factures": factures_router}
+
+# Paramètres de requête supplémentaires mesurés en plus de l'appel nu
+VARIANTES = {
+    "eleves": ["?page=2", "?inclure=inscriptions,factures,garant", "?champs=email,telephone"],
+    "rechercher_eleve": ["?inclure=inscriptions,factures,garant"],
+    "sessions": ["?page=2"],
+    "factures": ["?page=2"],
+}
+
+# Exports tableur : les lignes sont lues pendant l'envoi de la réponse, hors
+# de la mesure, et leur nombre ne dépend que du volume de données
+EXCLUES = {"exporter_eleves", "exporter_factures", "exporter_paiements", "exporter_presences"}
+
+class _ClientTest(TestClient):
+    # Les vues async (tableau de bord, dossier) sont exécutées comme sous WSGI :
+    # boucle d'événements temporaire, ORM thread_sensitive sur le thread appelant
+    def _call(self, func, request, kwargs):
+        if asyncio.iscoroutinefunction(func):
+            return NinjaResponse(async_to_sync(func)(request, **kwargs))
+        return super()._call(func, request, kwargs)
+
+
+_client = None
+
+
+def client_test() -> TestClient:
+    # ninja refuse d'enregistrer deux fois les URLs de la même API dans un processus
+    global _client
+    if _client is None:
+        _client = _ClientTest(api)
+    return _client
+
+
+def appeler(chemin: str):
+    # La requête simulée par TestClient n'a pas de get_full_path (ETag)
+    return client_test().get(chemin, get_full_path=lambda: f"/api{chemin}")
+
+
+def vider_caches() -> None:
+    caches["objets"].clear()
+    for referentiel in (REFERENTIEL_PAYS, REFERENTIEL_COURS, REFERENTIEL_ENSEIGNANTS):
+        referentiel.invalider()
+
+
+def parametres() -> Dict[str, int]:
+    """Valeurs des paramètres de chemin, tirées d'objets liés entre eux."""
+    inscription = (
+        Inscription.objects.filter(factures__paiements__isnull=False)
+        .select_related("session")
+        .order_by("id")
+        .first()
+    ) or Inscription.objects.select_related("session").order_by("id").first()
+    if inscription is None:
+        raise ValueError("Aucune inscription en base : données insuffisantes")
+    facture = inscription.factures.order_by("id").first()
+    paiement = facture.paiements.order_by("id").first() if facture else None
+    fiche = (
+        FichePresences.objects.filter(session_id=inscription.session_id).first()
+        or FichePresences.objects.order_by("id").first()
+    )
+    cours_prive = CoursPrive.objects.order_by("id").first()
+    valeurs = {
+        "id_eleve": inscription.eleve_id,
+        "eleve_id": inscription.eleve_id,
+        "inscription_id": inscription.id,
+        "id_session": inscription.session_id,
+        "cours_id": inscription.session.cours_id,
+        "facture_id": facture and facture.id,
+        "id_facture": facture and facture.id,
+        "paiement_id": paiement and paiement.id,
+        "id_fiche_presences": fiche and fiche.id,
+        "cours_prive_id": cours_prive and cours_prive.id,
+    }
+    return {cle: valeur for cle, valeur in valeurs.items() if valeur is not None}
+
+
+def scenarios(filtre: Optional[str] = None) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    (nom, chemin) pour chaque opération GET et ses VARIANTES ; chemin vaut
+    None quand la base n'a pas de valeur pour un paramètre.
+    """
+    valeurs = parametres()
+    for prefixe, routeur in ROUTEURS.items():
+        for chemin, vue in routeur.path_operations.items():
+            for operation in vue.operations:
+                if "GET" not in operation.methods:
+                    continue
+                nom = operation.view_func.__name__
+                if nom in EXCLUES or (filtre and filtre not in nom):
+                    continue
+                try:
+                    complet = f"{prefixe}{chemin}".format(**valeurs)
+                except KeyError:
+                    yield nom, None
+                    continue
+                yield nom, complet
+                for variante in VARIANTES.get(nom, []):
+                    yield f"{nom} {variante}", complet + variante
@@ -0,0 +1,106 @@
+"""
+Mesure des requêtes SQL par requête HTTP, et agrégats glissants par route.
+
+``MesureSQL`` s'installe comme execute_wrapper sur les connexions le temps
+d'une requête HTTP : un compteur, une somme et un maximum, sans copier le
+SQL sauf pour la requête la plus lente. Les agrégats gardent, par route, les
+AGREGATS_FENETRE dernières requêtes de ce processus.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional
+
+AGREGATS_FENETRE = 500
+LONGUEUR_SQL = 300
+
+
+class MesureSQL:
+    __slots__ = ("nombre", "duree", "plus_lente", "sql_plus_lente")
+
+    def __init__(self):
+        self.nombre = 0
+        self.duree = 0.0
+        self.plus_lente = 0.0
+        self.sql_plus_lente: Optional[str] = None
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duree = time.perf_counter() - debut
+            self.nombre += 1
+            self.duree += duree
+            if duree > self.plus_lente:
+                self.plus_lente = duree
+                self.sql_plus_lente = sql
+
+
+def _percentile(valeurs, p: float) -> float:
+    if not valeurs:
+        return 0.0
+    tries = sorted(valeurs)
+    return tries[min(len(tries) - 1, int(p * len(tries)))]
+
+
+class AgregatsRoutes:
+    def __init__(self, fenetre: int = AGREGATS_FENETRE):
+        self._verrou = threading.Lock()
+        self._echantillons: Dict[str, Deque[tuple]] = defaultdict(
+            lambda: deque(maxlen=fenetre)
+        )
+        self._plus_lentes: Dict[str, tuple] = {}
+
+    def enregistrer(
+        self,
+        route: str,
+        duree: float,
+        mesure: MesureSQL,
+        taille: Optional[int],
+    ) -> None:
+        with self._verrou:
+            self._echantillons[route].append(
+                (duree, mesure.nombre, mesure.duree, taille or 0)
+            )
+            actuelle = self._plus_lentes.get(route)
+            if mesure.sql_plus_lente and (actuelle is None or mesure.plus_lente > actuelle[0]):
+                self._plus_lentes[route] = (
+                    mesure.plus_lente,
+                    mesure.sql_plus_lente[:LONGUEUR_SQL],
+                )
+
+    def instantane(self) -> Dict[str, Any]:
+        with self._verrou:
+            copie = {route: list(e) for route, e in self._echantillons.items()}
+            plus_lentes = dict(self._plus_lentes)
+
+        routes = {}
+        for route, echantillons in copie.items():
+            durees = [e[0] for e in echantillons]
+            requetes = [e[1] for e in echantillons]
+            n = len(echantillons)
+            plus_lente = plus_lentes.get(route)
+            routes[route] = {
+                "appels": n,
+                "duree_moyenne_ms": round(sum(durees) / n * 1000, 2),
+                "duree_p95_ms": round(_percentile(durees, 0.95) * 1000, 2),
+                "requetes_moyenne": round(sum(requetes) / n, 2),
+                "requetes_max": max(requetes),
+                "temps_sql_moyen_ms": round(sum(e[2] for e in echantillons) / n * 1000, 2),
+                "taille_moyenne_octets": int(sum(e[3] for e in echantillons) / n),
+                "requete_plus_lente": (
+                    {"duree_ms": round(plus_lente[0] * 1000, 2), "sql": plus_lente[1]}
+                    if plus_lente
+                    else None
+                ),
+            }
+        return dict(sorted(routes.items(), key=lambda r: -r[1]["requetes_moyenne"]))
+
+    def vider(self) -> None:
+        with self._verrou:
+            self._echantillons.clear()
+            self._plus_lentes.clear()
+
+
+AGREGATS = AgregatsRoutes()
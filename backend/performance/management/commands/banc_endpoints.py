@@ -0,0 +1,217 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from eleves.models import Eleve
+from performance.donnees_test import Generateur
+from performance.endpoints import appeler, scenarios, vider_caches
+from performance.instrumentation import MesureSQL
+
+# Nombre maximal de requêtes SQL par opération (nom de la vue, ou nom suivi
+# d'une variante de VARIANTES), cache vide. Ne dépend pas du volume de
+# données : un dépassement signale un N+1.
+BUDGETS = {
+    # eleves
+    "eleves": 2,
+    "eleves ?inclure=inscriptions,factures,garant": 5,
+    "rechercher_eleve": 1,
+    "rechercher_eleve ?inclure=inscriptions,factures,garant": 4,
+    "dossier_eleve": 8,
+    "get_garant_eleve": 1,
+    "get_tests_eleve": 3,
+    "get_documents_eleve": 2,
+    "get_commentaires": 2,
+    "pays": 3,
+    "statistiques_dashboard": 15,
+    "anniversaires_mois": 1,
+    # cours
+    "get_cours": 2,
+    "get_cours_specifique": 1,
+    "list_enseignants": 2,
+    "sessions": 4,
+    "rechercher_session": 2,
+    "list_cours_prive": 3,
+    "get_cours_prive": 2,
+    "get_cours_prives_by_eleve": 3,
+    "get_inscription": 1,
+    "get_inscriptions_by_eleve": 1,
+    "get_eleves_preinscrits": 2,
+    "eleves_session": 2,
+    "fiches_presences_session": 2,
+    "get_fiche_presences": 2,
+    # factures
+    "factures": 2,
+    "get_factures_payees": 2,
+    "get_factures_impayees": 2,
+    "factures_eleve": 3,
+    "factures_eleve_payees": 2,
+    "factures_eleve_impayees": 2,
+    "get_facture": 5,
+    "rechercher_details_facture": 2,
+    "get_paiement": 1,
+    "list_paiements_for_facture": 2,
+    "paiements_eleve": 3,
+    "get_total_paiements_facture": 2,
+    "paiements": 1,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque endpoint GET des routeurs eleves, cours et factures (latence, "
+        "requêtes SQL, octets) et échoue si un budget de requêtes est dépassé"
+    )
+    # Les vérifications d'URLs chargeraient l'API avant le client de test
+    # (performance.endpoints), que ninja refuserait alors d'enregistrer
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repetitions", type=int, default=20)
+        parser.add_argument("--sortie", help="Écrit le rapport JSON dans ce fichier")
+        parser.add_argument("--comparer", help="Rapport JSON de référence (autre commit)")
+        parser.add_argument(
+            "--tolerance", type=float, default=20.0,
+            help="Hausse de p50 (en %%) signalée lors de la comparaison",
+        )
+        parser.add_argument("--filtre", help="Ne mesure que les opérations contenant ce texte")
+        parser.add_argument(
+            "--generer", type=float, metavar="ECHELLE",
+            help="Si la base est vide, génère d'abord les données (generer_donnees_test)",
+        )
+
+    def handle(self, *args, **options):
+        if not Eleve.objects.exists():
+            if options["generer"] is None:
+                raise CommandError(
+                    "Base vide : lancer generer_donnees_test ou passer --generer 0.02"
+                )
+            generateur = Generateur(echelle=options["generer"], journal=self.stdout.write)
+            generateur.generer()
+            generateur.finaliser(indexer=False)
+
+        resultats = {}
+        depassements = []
+        erreurs = []
+
+        self.stdout.write(
+            f"{'opération':<44}{'statut':>7}{'req.':>6}{'budget':>8}{'p50 ms':>9}{'p95 ms':>9}{'octets':>10}"
+        )
+        try:
+            liste = list(scenarios(options["filtre"]))
+        except ValueError as erreur:
+            raise CommandError(str(erreur))
+        for nom, chemin in liste:
+            if chemin is None:
+                self.stdout.write(self.style.WARNING(f"{nom} ignorée : paramètre sans valeur"))
+                continue
+            resultat = self._mesurer(chemin, options["repetitions"])
+            operation = nom.split(" ")[0]
+            resultat["budget"] = BUDGETS.get(nom, BUDGETS.get(operation))
+            resultats[nom] = resultat
+
+            if resultat["statut"] >= 400:
+                erreurs.append(nom)
+            if resultat["budget"] is not None and resultat["requetes"] > resultat["budget"]:
+                depassements.append(nom)
+
+            self.stdout.write(
+                f"{nom[:43]:<44}{resultat['statut']:>7}{resultat['requetes']:>6}"
+                f"{resultat['budget'] if resultat['budget'] is not None else '-':>8}"
+                f"{resultat['p50_ms']:>9.2f}{resultat['p95_ms']:>9.2f}{resultat['octets']:>10}"
+            )
+
+        rapport = {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "base": connection.vendor,
+            "python": platform.python_version(),
+            "repetitions": options["repetitions"],
+            "eleves": Eleve.objects.count(),
+            "endpoints": resultats,
+        }
+        if options["sortie"]:
+            with open(options["sortie"], "w", encoding="utf-8") as fichier:
+                json.dump(rapport, fichier, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Rapport écrit dans {options['sortie']}")
+
+        if options["comparer"]:
+            self._comparer(rapport, options["comparer"], options["tolerance"])
+
+        sans_budget = sorted({n.split(" ")[0] for n in resultats} - set(BUDGETS))
+        if sans_budget:
+            self.stdout.write(self.style.WARNING(f"Sans budget : {', '.join(sans_budget)}"))
+        if erreurs or depassements:
+            raise CommandError(
+                "; ".join(
+                    [f"erreur HTTP : {', '.join(erreurs)}"] * bool(erreurs)
+                    + [f"budget de requêtes dépassé : {', '.join(depassements)}"] * bool(depassements)
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(resultats)} mesures, budgets respectés"))
+
+    # ------------------- MESURE -------------------
+    def _mesurer(self, chemin, repetitions):
+        vider_caches()
+        # Premier appel à froid : c'est lui qui compte pour le budget
+        mesure = MesureSQL()
+        with connection.execute_wrapper(mesure):
+            reponse = appeler(chemin)
+        octets = len(reponse.content)
+
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            appeler(chemin)
+            durees.append((time.perf_counter() - debut) * 1000)
+        durees.sort()
+        return {
+            "chemin": chemin,
+            "statut": reponse.status_code,
+            "requetes": mesure.nombre,
+            "p50_ms": round(statistics.median(durees), 3) if durees else 0.0,
+            "p95_ms": round(durees[min(len(durees) - 1, int(0.95 * len(durees)))], 3) if durees else 0.0,
+            "octets": octets,
+        }
+
+    # ------------------- COMPARAISON -------------------
+    def _comparer(self, rapport, chemin_reference, tolerance):
+        with open(chemin_reference, encoding="utf-8") as fichier:
+            reference = json.load(fichier)
+        self.stdout.write(
+            f"\nComparaison avec {reference.get('commit') or chemin_reference} "
+            f"({reference.get('base')}, {reference.get('eleves')} élèves)"
+        )
+        self.stdout.write(f"{'opération':<44}{'req.':>10}{'p50 ms':>20}{'octets':>18}")
+        for nom, actuel in rapport["endpoints"].items():
+            ancien = reference["endpoints"].get(nom)
+            if ancien is None:
+                self.stdout.write(f"{nom[:43]:<44}{'(nouveau)':>10}")
+                continue
+            variation = (
+                (actuel["p50_ms"] - ancien["p50_ms"]) / ancien["p50_ms"] * 100
+                if ancien["p50_ms"]
+                else 0.0
+            )
+            ligne = (
+                f"{nom[:43]:<44}{ancien['requetes']:>4} → {actuel['requetes']:<3}"
+                f"{ancien['p50_ms']:>8.2f} → {actuel['p50_ms']:<8.2f}{variation:>+6.0f}%"
+                f"{ancien['octets']:>8} → {actuel['octets']}"
+            )
+            if actuel["requetes"] > ancien["requetes"] or variation > tolerance:
+                ligne = self.style.WARNING(ligne)
+            self.stdout.write(ligne)
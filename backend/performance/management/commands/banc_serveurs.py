@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from performance.charge import SCENARIOS, ErreurHTTP, executer
+
+MODES = ("wsgi", "asgi")
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance gunicorn dans chaque mode (SERVEUR_MODE wsgi puis asgi, voir "
+        "gunicorn.conf.py), rejoue la même charge contre chacun et compare "
+        "débit et latences"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", default=",".join(MODES))
+        parser.add_argument("--workers", type=int, default=2, help="WEB_CONCURRENCY de chaque serveur")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--utilisateurs", type=int, default=20)
+        parser.add_argument("--duree", type=float, default=30.0)
+        parser.add_argument("--montee", type=float, default=2.0)
+        parser.add_argument(
+            "--scenarios", default="tableau_de_bord,recherche_eleve",
+            help=f"Parmi : {', '.join(SCENARIOS)} (lecture seule par défaut : "
+            "les deux serveurs voient les mêmes données)",
+        )
+        parser.add_argument("--graine", type=int, default=42)
+        parser.add_argument("--sortie", help="Écrit les deux rapports JSON dans ce fichier")
+
+    def handle(self, *args, **options):
+        modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+        if set(modes) - set(MODES):
+            raise CommandError(f"Modes possibles : {', '.join(MODES)}")
+        scenarios = [s.strip() for s in options["scenarios"].split(",") if s.strip()]
+        if set(scenarios) - set(SCENARIOS):
+            raise CommandError(f"Scénario(s) inconnu(s) : {', '.join(sorted(set(scenarios) - set(SCENARIOS)))}")
+
+        rapports = {}
+        for mode in modes:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{mode} : {options['workers']} worker(s)"))
+            serveur = self._demarrer(mode, options["port"], options["workers"])
+            try:
+                rapports[mode] = asyncio.run(
+                    executer(
+                        f"http://127.0.0.1:{options['port']}",
+                        utilisateurs=max(1, options["utilisateurs"]),
+                        duree=options["duree"],
+                        montee=options["montee"],
+                        scenarios=scenarios,
+                        graine=options["graine"],
+                    )
+                )
+            except (OSError, ErreurHTTP, ValueError) as erreur:
+                raise CommandError(f"{mode} : {erreur}")
+            finally:
+                serveur.terminate()
+                serveur.wait(timeout=30)
+
+        self._comparer(rapports)
+        if options["sortie"]:
+            with open(options["sortie"], "w", encoding="utf-8") as fichier:
+                json.dump(rapports, fichier, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Rapports écrits dans {options['sortie']}")
+
+    def _demarrer(self, mode, port, workers):
+        env = {
+            **os.environ,
+            "SERVEUR_MODE": mode,
+            "GUNICORN_BIND": f"127.0.0.1:{port}",
+            "WEB_CONCURRENCY": str(workers),
+        }
+        serveur = subprocess.Popen(
+            ["gunicorn"], cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if serveur.poll() is not None:
+                raise CommandError(f"gunicorn ({mode}) s'est arrêté au démarrage (code {serveur.returncode})")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return serveur
+            except OSError:
+                time.sleep(0.2)
+        serveur.terminate()
+        raise CommandError(f"gunicorn ({mode}) n'écoute pas sur le port {port} après 30 s")
+
+    def _comparer(self, rapports):
+        modes = list(rapports)
+        self.stdout.write("")
+        self.stdout.write(f"{'':<20}" + "".join(f"{m:>24}" for m in modes))
+        for cle, libelle in (
+            ("par_seconde", "req/s"), ("p50_ms", "p50 ms"), ("p90_ms", "p90 ms"),
+            ("p99_ms", "p99 ms"), ("erreurs", "erreurs"),
+        ):
+            self.stdout.write(f"{libelle:<20}" + "".join(f"{rapports[m][cle]:>24}" for m in modes))
+
+        self.stdout.write(f"\n{'p50 ms par étape':<20}" + "".join(f"{m:>24}" for m in modes))
+        etapes = sorted({e for r in rapports.values() for e in r["etapes"]})
+        for etape in etapes:
+            valeurs = [rapports[m]["etapes"].get(etape, {}).get("p50_ms", "-") for m in modes]
+            self.stdout.write(f"{etape:<20}" + "".join(f"{v:>24}" for v in valeurs))
@@ -0,0 +1,194 @@
+import statistics
+import time
+from datetime import date, time as heure, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from cours.api import completer_eleves
+from cours.models import Cours, CoursPrive, Enseignant, Session
+from cours.schemas import (
+    CoursPriveOut,
+    SessionOut,
+    PROJECTION_COURS_PRIVES,
+    PROJECTION_SESSIONS,
+)
+from eleves.models import Eleve, Pays
+from eleves.schemas import ElevesOut, PROJECTION_ELEVES
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare, pour 1000 lignes, la sérialisation modèles + Schema et la "
+        "projection values_list (données créées puis annulées dans une transaction)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lignes", type=int, default=1000)
+        parser.add_argument("--repetitions", type=int, default=7)
+
+    def handle(self, *args, **options):
+        lignes = options["lignes"]
+        repetitions = options["repetitions"]
+
+        with transaction.atomic():
+            eleves, sessions, cours_prives = self._creer_donnees(lignes)
+            cas = [
+                ("ElevesOut", *self._cas_eleves(eleves)),
+                ("SessionOut", *self._cas_sessions(sessions)),
+                ("CoursPriveOut", *self._cas_cours_prives(cours_prives)),
+            ]
+
+            self.stdout.write(
+                f"{'Schema':<15}{'modèles (ms)':>15}{'projection (ms)':>18}{'gain':>8}"
+            )
+            for nom, avant, apres in cas:
+                assert len(avant()) == len(apres()) == lignes
+                ms_avant = self._mesurer(avant, repetitions) * 1000 / lignes
+                ms_apres = self._mesurer(apres, repetitions) * 1000 / lignes
+                self.stdout.write(
+                    f"{nom:<15}{ms_avant:>15.1f}{ms_apres:>18.1f}{ms_avant / ms_apres:>7.1f}x"
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Temps médians ramenés à 1000 lignes."))
+
+    def _mesurer(self, fonction, repetitions):
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            fonction()
+            durees.append(time.perf_counter() - debut)
+        return statistics.median(durees) * 1000
+
+    def _creer_donnees(self, lignes):
+        pays = Pays.objects.first() or Pays.objects.create(nom="Suisse", indicatif="+41")
+        Eleve.objects.bulk_create(
+            [
+                Eleve(
+                    nom=f"Nom{i}",
+                    prenom=f"Prenom{i}",
+                    date_naissance=date(2000, 1, 1),
+                    sexe="F",
+                    type_permis="B",
+                    telephone="0791234567",
+                    email=f"bench-{i}@exemple.invalid",
+                    pays=pays,
+                )
+                for i in range(lignes)
+            ]
+        )
+        eleves = list(Eleve.objects.filter(email__startswith="bench-").values_list("id", flat=True))
+
+        cours = Cours.objects.create(nom="Bench", type_cours="I", niveau="A1", tarif=100)
+        enseignant = Enseignant.objects.create(nom="Bench", prenom="Bench")
+        debut = date.today()
+        Session.objects.bulk_create(
+            [
+                Session(
+                    date_debut=debut + timedelta(days=i),
+                    date_fin=debut + timedelta(days=i + 30),
+                    periode_journee="M",
+                    capacite_max=10,
+                    cours=cours,
+                    enseignant=enseignant,
+                    seances_mois=8,
+                )
+                for i in range(lignes)
+            ]
+        )
+        sessions = list(Session.objects.filter(cours=cours).values_list("id", flat=True))
+
+        CoursPrive.objects.bulk_create(
+            [
+                CoursPrive(
+                    date_cours_prive=debut + timedelta(days=i),
+                    heure_debut=heure(10),
+                    heure_fin=heure(11),
+                    tarif=80,
+                    lieu="E",
+                    enseignant=enseignant,
+                )
+                for i in range(lignes)
+            ]
+        )
+        cours_prives = list(
+            CoursPrive.objects.filter(enseignant=enseignant).values_list("id", flat=True)
+        )
+        Lien = CoursPrive.eleves.through
+        Lien.objects.bulk_create(
+            [
+                Lien(coursprive_id=cp, eleve_id=eleves[(i + j) % lignes])
+                for i, cp in enumerate(cours_prives)
+                for j in range(2)
+            ]
+        )
+        return eleves, sessions, cours_prives
+
+    def _cas_eleves(self, ids):
+        def avant():
+            qs = (
+                Eleve.objects.select_related("pays")
+                .annotate(pays__nom=models.F("pays__nom"))
+                .filter(id__in=ids)
+            )
+            return [ElevesOut.model_validate(e, from_attributes=True) for e in qs]
+
+        def apres():
+            return PROJECTION_ELEVES.liste(Eleve.objects.filter(id__in=ids))
+
+        return avant, apres
+
+    def _cas_sessions(self, ids):
+        def avant():
+            qs = (
+                Session.objects.select_related("cours", "enseignant")
+                .annotate(
+                    id_cours=models.F("cours_id"),
+                    id_enseignant=models.F("enseignant_id"),
+                    enseignant__nom=models.F("enseignant__nom"),
+                    enseignant__prenom=models.F("enseignant__prenom"),
+                    cours__nom=models.F("cours__nom"),
+                    cours__type_cours=models.F("cours__type_cours"),
+                    cours__niveau=models.F("cours__niveau"),
+                )
+                .filter(id__in=ids)
+            )
+            return [SessionOut.from_orm(s) for s in qs]
+
+        def apres():
+            return PROJECTION_SESSIONS.liste(Session.objects.filter(id__in=ids))
+
+        return avant, apres
+
+    def _cas_cours_prives(self, ids):
+        def avant():
+            qs = (
+                CoursPrive.objects.select_related("enseignant")
+                .prefetch_related("eleves")
+                .filter(id__in=ids)
+            )
+            return [
+                CoursPriveOut(
+                    id=cp.id,
+                    date_cours_prive=cp.date_cours_prive,
+                    heure_debut=cp.heure_debut,
+                    heure_fin=cp.heure_fin,
+                    tarif=cp.tarif,
+                    lieu=cp.lieu,
+                    enseignant=cp.enseignant.id,
+                    enseignant__nom=cp.enseignant.nom,
+                    enseignant__prenom=cp.enseignant.prenom,
+                    eleves=[f"{e.nom} {e.prenom}" for e in cp.eleves.all()],
+                    eleves_ids=[e.id for e in cp.eleves.all()],
+                )
+                for cp in qs
+            ]
+
+        def apres():
+            return completer_eleves(
+                PROJECTION_COURS_PRIVES.liste(CoursPrive.objects.filter(id__in=ids))
+            )
+
+        return avant, apres
@@ -0,0 +1,99 @@
+import gzip
+import json
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from ninja.renderers import JSONRenderer
+
+from backend_ecole_peg.renderers import RenduJSON
+from factures.schemas import PaiementWithEleveOut
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le rendu JSON par défaut de ninja et RenduJSON sur des listes "
+        "d'élèves et de paiements de la taille demandée"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lignes", type=int, default=1000)
+        parser.add_argument("--repetitions", type=int, default=20)
+
+    def handle(self, *args, **options):
+        lignes = options["lignes"]
+        repetitions = options["repetitions"]
+
+        charges = {
+            "eleves": self._liste_eleves(lignes),
+            "paiements": self._liste_paiements(lignes),
+        }
+        rendus = {"ninja (json)": JSONRenderer(), "RenduJSON": RenduJSON()}
+
+        self.stdout.write(
+            f"{'liste':<12}{'rendu':<15}{'ms':>8}{'octets':>10}{'gzip':>9}"
+        )
+        for nom_charge, donnees in charges.items():
+            references = None
+            for nom_rendu, rendu in rendus.items():
+                contenu = rendu.render(None, donnees, response_status=200)
+                if isinstance(contenu, str):
+                    contenu = contenu.encode()
+                decode = json.loads(contenu)
+                if references is not None and decode != references:
+                    self.stderr.write(f"{nom_rendu} : sortie différente pour {nom_charge}")
+                references = decode
+
+                ms = self._mesurer(
+                    lambda: rendu.render(None, donnees, response_status=200), repetitions
+                )
+                self.stdout.write(
+                    f"{nom_charge:<12}{nom_rendu:<15}{ms:>8.2f}{len(contenu):>10}"
+                    f"{len(gzip.compress(contenu, compresslevel=6)):>9}"
+                )
+
+    def _mesurer(self, fonction, repetitions):
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            fonction()
+            durees.append(time.perf_counter() - debut)
+        return statistics.median(durees) * 1000
+
+    def _liste_eleves(self, lignes):
+        # Forme produite par PROJECTION_ELEVES pour GET /eleves/eleves/
+        return {
+            "eleves": [
+                {
+                    "id": i,
+                    "nom": f"Nom{i}",
+                    "prenom": f"Prénom{i}",
+                    "date_naissance": date(1990 + i % 20, 1 + i % 12, 1 + i % 28),
+                    "telephone": "+41 79 123 45 67",
+                    "email": f"eleve{i}@exemple.ch",
+                    "pays__nom": "Suisse",
+                    "statut_inscription": "A",
+                }
+                for i in range(lignes)
+            ],
+            "nombre_total": lignes,
+        }
+
+    def _liste_paiements(self, lignes):
+        # Forme produite par GET /factures/paiements/ (Schemas pydantic)
+        return {
+            "paiements": [
+                PaiementWithEleveOut(
+                    id=i,
+                    date_paiement=date(2025, 1 + i % 12, 1 + i % 28),
+                    montant=Decimal("150.00") + i,
+                    mode_paiement="PER",
+                    methode_paiement="TWI",
+                    eleve_nom=f"Nom{i}",
+                    eleve_prenom=f"Prénom{i}",
+                )
+                for i in range(lignes)
+            ]
+        }
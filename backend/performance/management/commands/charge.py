@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from performance.charge import SCENARIOS, ErreurHTTP, executer
+
+
+class Command(BaseCommand):
+    help = (
+        "Rejoue des parcours du personnel (tableau de bord, recherche, inscription, "
+        "présences, paiement) contre un serveur lancé, à la concurrence demandée"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--utilisateurs", type=int, default=10, help="Utilisateurs simultanés")
+        parser.add_argument("--duree", type=float, default=30.0, help="Secondes, après la montée")
+        parser.add_argument("--montee", type=float, default=0.0, help="Secondes pour démarrer tous les utilisateurs")
+        parser.add_argument("--pause", type=float, default=0.0, help="Secondes de réflexion entre deux parcours")
+        parser.add_argument(
+            "--scenarios",
+            help=f"Liste séparée par des virgules parmi : {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument(
+            "--lecture-seule", action="store_true", help="Ignore les scénarios qui écrivent en base"
+        )
+        parser.add_argument("--graine", type=int, default=42)
+        parser.add_argument("--mot-de-passe", help="Se connecte d'abord (/api/auth/login/)")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--sortie", help="Écrit le rapport JSON dans ce fichier")
+
+    def handle(self, *args, **options):
+        scenarios = None
+        if options["scenarios"]:
+            scenarios = [s.strip() for s in options["scenarios"].split(",") if s.strip()]
+            inconnus = set(scenarios) - set(SCENARIOS)
+            if inconnus:
+                raise CommandError(f"Scénario(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+
+        try:
+            rapport = asyncio.run(
+                executer(
+                    options["url"],
+                    utilisateurs=max(1, options["utilisateurs"]),
+                    duree=options["duree"],
+                    montee=options["montee"],
+                    pause=options["pause"],
+                    scenarios=scenarios,
+                    lecture_seule=options["lecture_seule"],
+                    graine=options["graine"],
+                    mot_de_passe=options["mot_de_passe"],
+                    timeout=options["timeout"],
+                )
+            )
+        except (OSError, ErreurHTTP, ValueError) as erreur:
+            raise CommandError(f"{options['url']} : {erreur}")
+
+        self._afficher(rapport)
+        if options["sortie"]:
+            with open(options["sortie"], "w", encoding="utf-8") as fichier:
+                json.dump(rapport, fichier, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Rapport écrit dans {options['sortie']}")
+
+    def _afficher(self, rapport):
+        self.stdout.write(
+            f"{'étape':<20}{'appels':>8}{'req/s':>9}{'refus':>7}{'err.':>6}"
+            f"{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        for nom, e in rapport["etapes"].items():
+            ligne = (
+                f"{nom:<20}{e['appels']:>8}{e['par_seconde']:>9.1f}{e['refus']:>7}{e['erreurs']:>6}"
+                f"{e['p50_ms']:>9.1f}{e['p90_ms']:>9.1f}{e['p99_ms']:>9.1f}{e['max_ms']:>9.1f}"
+            )
+            self.stdout.write(self.style.ERROR(ligne) if e["erreurs"] else ligne)
+            if e["exemple_erreur"]:
+                self.stdout.write(f"    {e['exemple_erreur']}")
+
+        self.stdout.write(
+            f"\n{rapport['utilisateurs']} utilisateurs, {rapport['duree_s']} s : "
+            f"{rapport['appels']} requêtes ({rapport['par_seconde']} req/s), "
+            f"p50 {rapport['p50_ms']} ms, p90 {rapport['p90_ms']} ms, p99 {rapport['p99_ms']} ms, "
+            f"{rapport['refus']} refus, {rapport['erreurs']} erreurs "
+            f"({rapport['taux_erreur'] * 100:.2f} %)"
+        )
+        parcours = ", ".join(f"{nom} {n}" for nom, n in sorted(rapport["scenarios"].items()))
+        self.stdout.write(f"Parcours terminés : {parcours}")
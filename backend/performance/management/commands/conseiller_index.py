@@ -0,0 +1,139 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from eleves.models import Eleve
+from performance.donnees_test import Generateur
+from performance.endpoints import appeler, scenarios, vider_caches
+from performance.plans import CapturePlans, Conseiller
+
+INSTANTANES = Path(__file__).resolve().parents[2] / "plans"
+
+
+class Command(BaseCommand):
+    help = (
+        "Capture les plans EXPLAIN des requêtes de chaque endpoint GET, signale les "
+        "parcours complets et tris sans index, suggère des index composites et "
+        "compare avec l'instantané enregistré"
+    )
+    # Les vérifications d'URLs chargeraient l'API avant le client de test
+    # (performance.endpoints), que ninja refuserait alors d'enregistrer
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seuil", type=int, default=500,
+            help="Ignore les tables de moins de SEUIL lignes",
+        )
+        parser.add_argument("--filtre", help="N'analyse que les opérations contenant ce texte")
+        parser.add_argument("--plans", action="store_true", help="Affiche les plans complets")
+        parser.add_argument(
+            "--enregistrer", action="store_true",
+            help=f"Écrit l'instantané dans {INSTANTANES.name}/<moteur>.json",
+        )
+        parser.add_argument(
+            "--verifier", action="store_true",
+            help="Échoue si un plan présente un problème absent de l'instantané",
+        )
+        parser.add_argument(
+            "--generer", type=float, metavar="ECHELLE",
+            help="Si la base est vide, génère d'abord les données (generer_donnees_test)",
+        )
+
+    def handle(self, *args, **options):
+        if not Eleve.objects.exists():
+            if options["generer"] is None:
+                raise CommandError(
+                    "Base vide : lancer generer_donnees_test ou passer --generer 0.02"
+                )
+            generateur = Generateur(echelle=options["generer"], journal=self.stdout.write)
+            generateur.generer()
+            generateur.finaliser(indexer=False)
+
+        try:
+            conseiller = Conseiller(connection, seuil=options["seuil"])
+            liste = list(scenarios(options["filtre"]))
+        except ValueError as erreur:
+            raise CommandError(str(erreur))
+
+        instantane = {}
+        suggestions = defaultdict(set)
+        for nom, chemin in liste:
+            if chemin is None:
+                continue
+            vider_caches()
+            capture = CapturePlans()
+            with connection.execute_wrapper(capture):
+                appeler(chemin)
+
+            plans = {}
+            for cle, (sql, params) in capture.requetes.items():
+                plan = conseiller.expliquer(sql, params)
+                plans[cle] = {"sql": plan.sql, "plan": plan.lignes, "problemes": plan.problemes}
+                for suggestion in plan.suggestions:
+                    suggestions[suggestion].add(nom)
+                if plan.problemes or options["plans"]:
+                    self._afficher(nom, cle, plan, options["plans"])
+            instantane[nom] = plans
+
+        self._resumer(conseiller, suggestions)
+
+        fichier = INSTANTANES / f"{connection.vendor}.json"
+        if options["verifier"]:
+            self._verifier(instantane, fichier)
+        if options["enregistrer"]:
+            INSTANTANES.mkdir(exist_ok=True)
+            contenu = {"eleves": Eleve.objects.count(), "seuil": options["seuil"], "endpoints": instantane}
+            with open(fichier, "w", encoding="utf-8") as sortie:
+                json.dump(contenu, sortie, indent=2, ensure_ascii=False, sort_keys=True)
+                sortie.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Instantané écrit dans {fichier}"))
+
+    # ------------------- AFFICHAGE -------------------
+    def _afficher(self, nom, cle, plan, complet):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{nom} [{cle}]"))
+        self.stdout.write(f"  {plan.sql[:300]}")
+        if complet:
+            for ligne in plan.lignes:
+                self.stdout.write(f"    {ligne}")
+        for probleme in plan.problemes:
+            self.stdout.write(self.style.WARNING(f"  ! {probleme}"))
+
+    def _resumer(self, conseiller, suggestions):
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS("\nAucun index à suggérer"))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING("\nIndex suggérés"))
+        for (table, colonnes), noms in sorted(suggestions.items(), key=lambda s: -len(s[1])):
+            modele = conseiller.modeles[table]
+            champs = ", ".join(f'"{c}"' for c in conseiller.champs(table, colonnes))
+            self.stdout.write(
+                f"  {modele._meta.label}: models.Index(fields=[{champs}])"
+                f"  ← {len(noms)} endpoint(s) : {', '.join(sorted(noms)[:4])}"
+                + (" …" if len(noms) > 4 else "")
+            )
+
+    # ------------------- INSTANTANÉ -------------------
+    def _verifier(self, instantane, fichier):
+        if not fichier.exists():
+            raise CommandError(f"Pas d'instantané {fichier} : lancer d'abord avec --enregistrer")
+        with open(fichier, encoding="utf-8") as entree:
+            reference = json.load(entree)["endpoints"]
+
+        regressions = []
+        for nom, plans in instantane.items():
+            anciens = reference.get(nom, {})
+            for cle, plan in plans.items():
+                ancien = anciens.get(cle)
+                nouveaux = set(plan["problemes"]) - set(ancien["problemes"] if ancien else [])
+                if nouveaux:
+                    regressions.append(f"{nom} [{cle}] : {', '.join(sorted(nouveaux))}")
+                elif ancien and ancien["plan"] != plan["plan"]:
+                    self.stdout.write(self.style.WARNING(f"Plan modifié sans nouveau problème : {nom} [{cle}]"))
+
+        if regressions:
+            raise CommandError("Plans dégradés :\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"Plans conformes à {fichier.name}"))
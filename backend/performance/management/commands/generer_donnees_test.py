@@ -0,0 +1,52 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from performance.donnees_test import VOLUMES, Generateur
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données cohérent à l'échelle de la production "
+        f"(échelle 1 : {VOLUMES['eleves']} élèves, {VOLUMES['sessions']} sessions, "
+        f"{VOLUMES['presences']} présences, ~200000 factures)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--echelle", type=float, default=1.0)
+        parser.add_argument("--graine", type=int, default=42)
+        parser.add_argument("--lot", type=int, default=5000, help="Taille des lots de bulk_create")
+        parser.add_argument(
+            "--reference",
+            type=date.fromisoformat,
+            default=None,
+            help="Date « du jour » des données (AAAA-MM-JJ, aujourd'hui par défaut)",
+        )
+        parser.add_argument(
+            "--sans-index", action="store_true", help="Ne pas reconstruire l'index de recherche"
+        )
+
+    def handle(self, *args, **options):
+        if options["echelle"] <= 0:
+            raise CommandError("--echelle doit être positive")
+
+        generateur = Generateur(
+            echelle=options["echelle"],
+            graine=options["graine"],
+            taille_lot=options["lot"],
+            reference=options["reference"],
+            journal=self.stdout.write,
+        )
+        debut = time.perf_counter()
+        try:
+            crees = generateur.generer()
+        except ValueError as erreur:
+            raise CommandError(str(erreur))
+        generateur.finaliser(indexer=not options["sans_index"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{sum(crees.values())} lignes générées en {time.perf_counter() - debut:.1f} s"
+            )
+        )
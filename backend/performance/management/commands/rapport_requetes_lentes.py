@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from performance.models import RequeteLente
+from performance.requetes_lentes import enregistrer
+
+TRIS = {
+    "total": F("duree_totale_ms").desc(),
+    "max": F("duree_max_ms").desc(),
+    "nombre": F("nombre").desc(),
+    "recent": F("derniere_occurrence").desc(),
+}
+
+
+class Command(BaseCommand):
+    help = "Liste les requêtes SQL lentes enregistrées (REQUETES_LENTES), par empreinte"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument("--tri", choices=sorted(TRIS), default="total")
+        parser.add_argument("--plans", action="store_true", help="Affiche les plans EXPLAIN")
+        parser.add_argument("--vider", action="store_true", help="Supprime le journal")
+
+    def handle(self, *args, **options):
+        enregistrer()
+        if options["vider"]:
+            supprimees, _ = RequeteLente.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f"{supprimees} empreinte(s) supprimée(s)"))
+            return
+
+        requetes = RequeteLente.objects.order_by(TRIS[options["tri"]])[: options["top"]]
+        if not requetes:
+            self.stdout.write("Aucune requête lente enregistrée")
+            return
+
+        for requete in requetes:
+            moyenne = requete.duree_totale_ms / requete.nombre if requete.nombre else 0
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"[{requete.empreinte}] x{requete.nombre}  "
+                    f"total {requete.duree_totale_ms:.0f} ms  "
+                    f"moy {moyenne:.1f} ms  max {requete.duree_max_ms:.1f} ms  "
+                    f"({requete.base}, dernière {requete.derniere_occurrence:%Y-%m-%d %H:%M})"
+                )
+            )
+            self.stdout.write(f"  {requete.site_appel or '?'}")
+            self.stdout.write(f"  {requete.sql}")
+            if options["plans"] and requete.plan:
+                for ligne in requete.plan.splitlines():
+                    self.stdout.write(f"    {ligne}")
+            self.stdout.write("")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from performance.compteurs import recalculer
+
+
+class Command(BaseCommand):
+    help = "Recalcule depuis les tables les compteurs métier exposés par /metrics"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            valeurs = recalculer()
+        for nom, valeur in valeurs.items():
+            self.stdout.write(f"{nom} = {valeur}")
+        self.stdout.write(self.style.SUCCESS("Compteurs recalculés"))
@@ -0,0 +1,186 @@
+"""
+Métriques au format d'exposition texte (Prometheus), sans service externe.
+
+Chaque processus tient ses compteurs et histogrammes en mémoire. Avec
+METRIQUES_DOSSIER, il les écrit aussi (au plus une fois par seconde) dans
+``<dossier>/<pid>.json`` ; ``/metrics`` additionne alors les fichiers de
+tous les workers, quel que soit celui qui répond (les observations de la
+dernière seconde d'un worker devenu inactif n'apparaissent qu'à sa requête
+suivante). Les fichiers des workers arrêtés sont gardés pour que les
+compteurs ne reculent pas : le dossier est à vider au démarrage du serveur.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+
+Labels = Tuple[Tuple[str, str], ...]
+
+SEUILS_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    "peg_requetes_http_duree_secondes": ("histogram", "Durée des requêtes HTTP par opération"),
+    "peg_requetes_http_total": ("counter", "Requêtes HTTP par opération et statut"),
+    "peg_requetes_sql_total": ("counter", "Requêtes SQL exécutées, par opération"),
+    "peg_cache_objets_total": ("counter", "Lectures du cache des objets (hits / misses)"),
+    "peg_db_connexions_total": ("counter", "Connexions obtenues par base (nouvelle / pool)"),
+    "peg_db_attente_connexion_secondes": ("histogram", "Temps d'obtention d'une connexion à la base"),
+    "peg_db_connexions_fermees_total": ("counter", "Connexions fermées par base et raison"),
+    "peg_replica_indisponible_total": ("counter", "Lectures repassées sur la base principale, réplique en erreur"),
+}
+
+INTERVALLE_ECRITURE = 1.0
+
+
+def _labels(**valeurs: str) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in valeurs.items()))
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    parties = []
+    for cle, valeur in labels:
+        valeur = valeur.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parties.append(f'{cle}="{valeur}"')
+    return "{" + ",".join(parties) + "}" if parties else ""
+
+
+def _nombre(valeur: float) -> str:
+    return str(int(valeur)) if float(valeur).is_integer() else repr(float(valeur))
+
+
+class Registre:
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._verrou_ecriture = threading.Lock()
+        self._compteurs: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        # (nom, labels) -> [compte par seuil..., somme, nombre]
+        self._histogrammes: Dict[Tuple[str, Labels], List[float]] = {}
+        self._ecrit_a = 0.0
+
+    def incrementer(self, nom: str, valeur: float = 1, **labels: str) -> None:
+        with self._verrou:
+            self._compteurs[(nom, _labels(**labels))] += valeur
+
+    def observer(self, nom: str, valeur: float, **labels: str) -> None:
+        cle = (nom, _labels(**labels))
+        with self._verrou:
+            serie = self._histogrammes.get(cle)
+            if serie is None:
+                serie = self._histogrammes[cle] = [0.0] * (len(SEUILS_DUREE) + 2)
+            for i, seuil in enumerate(SEUILS_DUREE):
+                if valeur <= seuil:
+                    serie[i] += 1
+            serie[-2] += valeur
+            serie[-1] += 1
+
+    # ------------------- MULTIPROCESSUS -------------------
+    def _etat(self) -> dict:
+        with self._verrou:
+            return {
+                "compteurs": [[n, list(l), v] for (n, l), v in self._compteurs.items()],
+                "histogrammes": [[n, list(l), s] for (n, l), s in self._histogrammes.items()],
+            }
+
+    def ecrire(self, forcer: bool = False) -> None:
+        dossier = settings.METRIQUES_DOSSIER
+        if not dossier:
+            return
+        # Un seul thread écrit à la fois ; les autres n'attendent que si
+        # l'écriture est forcée (lecture de /metrics)
+        if not self._verrou_ecriture.acquire(blocking=forcer):
+            return
+        temporaire = None
+        try:
+            maintenant = time.monotonic()
+            if not forcer and maintenant - self._ecrit_a < INTERVALLE_ECRITURE:
+                return
+            self._ecrit_a = maintenant
+            chemin = os.path.join(dossier, f"{os.getpid()}.json")
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=dossier, suffix=".tmp", delete=False
+            ) as fichier:
+                temporaire = fichier.name
+                json.dump(self._etat(), fichier)
+            os.replace(temporaire, chemin)
+        except OSError:
+            # Les métriques ne doivent jamais faire échouer la requête
+            if temporaire and os.path.exists(temporaire):
+                os.unlink(temporaire)
+        finally:
+            self._verrou_ecriture.release()
+
+    def _etats(self) -> List[dict]:
+        dossier = settings.METRIQUES_DOSSIER
+        if not dossier:
+            return [self._etat()]
+        self.ecrire(forcer=True)
+        etats = []
+        for nom in os.listdir(dossier):
+            if not nom.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(dossier, nom), encoding="utf-8") as fichier:
+                    etats.append(json.load(fichier))
+            except (OSError, ValueError):
+                continue
+        return etats
+
+    def compteurs(self, nom: str) -> Dict[Labels, float]:
+        """Valeurs du compteur ``nom`` par labels, additionnées sur tous les workers."""
+        valeurs: Dict[Labels, float] = defaultdict(float)
+        for etat in self._etats():
+            for n, labels, valeur in etat["compteurs"]:
+                if n == nom:
+                    valeurs[tuple(map(tuple, labels))] += valeur
+        return dict(valeurs)
+
+    # ------------------- EXPOSITION -------------------
+    def exposition(self) -> List[str]:
+        compteurs: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        histogrammes: Dict[Tuple[str, Labels], List[float]] = {}
+        for etat in self._etats():
+            for nom, labels, valeur in etat["compteurs"]:
+                compteurs[(nom, tuple(map(tuple, labels)))] += valeur
+            for nom, labels, serie in etat["histogrammes"]:
+                cle = (nom, tuple(map(tuple, labels)))
+                cumul = histogrammes.setdefault(cle, [0.0] * len(serie))
+                for i, v in enumerate(serie):
+                    cumul[i] += v
+
+        lignes: List[str] = []
+        for nom, (type_metrique, aide) in DESCRIPTIONS.items():
+            lignes += [f"# HELP {nom} {aide}", f"# TYPE {nom} {type_metrique}"]
+            if type_metrique == "histogram":
+                for (n, labels), serie in sorted(histogrammes.items()):
+                    if n != nom:
+                        continue
+                    for seuil, compte in zip(SEUILS_DUREE, serie):
+                        lignes.append(
+                            f"{nom}_bucket{_format_labels(labels + (('le', repr(seuil)),))} {_nombre(compte)}"
+                        )
+                    lignes.append(
+                        f"{nom}_bucket{_format_labels(labels + (('le', '+Inf'),))} {_nombre(serie[-1])}"
+                    )
+                    lignes.append(f"{nom}_sum{_format_labels(labels)} {repr(serie[-2])}")
+                    lignes.append(f"{nom}_count{_format_labels(labels)} {_nombre(serie[-1])}")
+            else:
+                for (n, labels), valeur in sorted(compteurs.items()):
+                    if n == nom:
+                        lignes.append(f"{nom}{_format_labels(labels)} {_nombre(valeur)}")
+        return lignes
+
+
+def jauges(valeurs: Sequence[Tuple[str, str, float]]) -> List[str]:
+    """Lignes d'exposition pour des jauges (nom, aide, valeur) lues au moment du scrape."""
+    lignes = []
+    for nom, aide, valeur in valeurs:
+        lignes += [f"# HELP {nom} {aide}", f"# TYPE {nom} gauge", f"{nom} {_nombre(valeur)}"]
+    return lignes
+
+
+REGISTRE = Registre()
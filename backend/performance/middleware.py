@@ -0,0 +1,180 @@
+import itertools
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+
+from .instrumentation import AGREGATS, MesureSQL
+from .api import staff_seulement
+from .metriques import REGISTRE
+from .profilage import FORMATS, EchantillonneurPile, enregistrer, nom_fichier
+
+logger = logging.getLogger("performance")
+
+
+def nom_route(request) -> str:
+    """Méthode + motif d'URL résolu (ex. "GET api/eleves/eleve/<int:id_eleve>/")."""
+    correspondance = getattr(request, "resolver_match", None)
+    route = correspondance.route if correspondance else request.path
+    return f"{request.method} {route}"
+
+
+class InstrumentationSQLMiddleware:
+    """
+    Nombre de requêtes SQL, temps SQL, requête la plus lente et taille de la
+    réponse, par requête HTTP : en-tête Server-Timing, ligne de log JSON
+    (logger "performance") et agrégats servis par GET /api/_perf/.
+    Activé par INSTRUMENTATION_SQL.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_SQL:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mesure = MesureSQL()
+        debut = time.perf_counter()
+        with ExitStack() as pile:
+            for connexion in connections.all():
+                pile.enter_context(connexion.execute_wrapper(mesure))
+            response = self.get_response(request)
+        duree = time.perf_counter() - debut
+
+        route = nom_route(request)
+        taille = None if response.streaming else len(response.content)
+        AGREGATS.enregistrer(route, duree, mesure, taille)
+
+        response["Server-Timing"] = (
+            f'db;dur={mesure.duree * 1000:.1f};desc="{mesure.nombre} requetes", '
+            f"app;dur={duree * 1000:.1f}"
+        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                json.dumps(
+                    {
+                        "route": route,
+                        "statut": response.status_code,
+                        "duree_ms": round(duree * 1000, 2),
+                        "requetes": mesure.nombre,
+                        "temps_sql_ms": round(mesure.duree * 1000, 2),
+                        "plus_lente_ms": round(mesure.plus_lente * 1000, 2),
+                        "octets": taille,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        return response
+
+
+class MetriquesMiddleware:
+    """
+    Durée (histogramme), nombre de requêtes et requêtes SQL par opération
+    ninja (nom de la vue), exposés par /metrics. Activé par METRIQUES.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRIQUES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mesure = MesureSQL()
+        debut = time.perf_counter()
+        with ExitStack() as pile:
+            for connexion in connections.all():
+                pile.enter_context(connexion.execute_wrapper(mesure))
+            response = self.get_response(request)
+        duree = time.perf_counter() - debut
+
+        correspondance = getattr(request, "resolver_match", None)
+        operation = (correspondance and correspondance.url_name) or "non_resolue"
+        REGISTRE.observer("peg_requetes_http_duree_secondes", duree, operation=operation)
+        REGISTRE.incrementer(
+            "peg_requetes_http_total", operation=operation, statut=response.status_code
+        )
+        REGISTRE.incrementer("peg_requetes_sql_total", mesure.nombre, operation=operation)
+        REGISTRE.ecrire()
+        return response
+
+
+class ProfilageMiddleware:
+    """
+    Profilage d'une requête, activé par PROFILAGE :
+     - à la demande, pour un compte staff, avec ``?__profile=1`` ou l'en-tête
+       ``X-Profil: 1`` (``pstats`` à la place de ``1`` pour cProfile) : la
+       réponse est remplacée par le profil, le statut d'origine est dans
+       X-Profil-Statut ;
+     - en fond, une requête sur PROFILAGE_ECHANTILLON par processus, écrite
+       dans PROFILAGE_DOSSIER (les PROFILAGE_FICHIERS_MAX plus récentes).
+    Placé après AuthenticationMiddleware pour connaître l'utilisateur.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILAGE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._compteur = itertools.count(1)
+
+    def __call__(self, request):
+        demande = request.GET.get("__profile") or request.headers.get("X-Profil")
+        if demande and staff_seulement(request):
+            return self._a_la_demande(request, demande)
+
+        echantillon = settings.PROFILAGE_ECHANTILLON
+        if echantillon and settings.PROFILAGE_DOSSIER and next(self._compteur) % echantillon == 0:
+            return self._en_fond(request)
+        return self.get_response(request)
+
+    def _profiler(self, request, profil):
+        debut = time.perf_counter()
+        profil.demarrer()
+        try:
+            response = self.get_response(request)
+        finally:
+            profil.arreter()
+        return response, time.perf_counter() - debut
+
+    def _operation(self, request) -> str:
+        correspondance = getattr(request, "resolver_match", None)
+        return (correspondance and correspondance.url_name) or "non_resolue"
+
+    def _a_la_demande(self, request, demande):
+        profil = FORMATS.get(demande, EchantillonneurPile)()
+        response, duree = self._profiler(request, profil)
+        contenu = profil.resultat()
+        nom = nom_fichier(self._operation(request), profil.extension)
+
+        profilage = HttpResponse(contenu, content_type=profil.type_contenu)
+        profilage["Content-Disposition"] = f'attachment; filename="{nom}"'
+        profilage["X-Profil-Statut"] = response.status_code
+        profilage["X-Profil-Duree-Ms"] = f"{duree * 1000:.1f}"
+        if settings.PROFILAGE_DOSSIER:
+            # Le profil est renvoyé même si la copie sur disque échoue
+            try:
+                enregistrer(
+                    settings.PROFILAGE_DOSSIER, nom, contenu, settings.PROFILAGE_FICHIERS_MAX
+                )
+            except OSError:
+                logger.exception("écriture du profil impossible")
+        return profilage
+
+    def _en_fond(self, request):
+        profil = EchantillonneurPile()
+        response, duree = self._profiler(request, profil)
+        try:
+            chemin = enregistrer(
+                settings.PROFILAGE_DOSSIER,
+                nom_fichier(self._operation(request), profil.extension),
+                profil.resultat(),
+                settings.PROFILAGE_FICHIERS_MAX,
+            )
+            logger.info("profil %s (%.1f ms) : %s", nom_route(request), duree * 1000, chemin)
+        except OSError:
+            logger.exception("écriture du profil impossible")
+        return response
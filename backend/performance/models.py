@@ -0,0 +1,49 @@
+from django.db import models
+
+
+class VersionTable(models.Model):
+    """
+    Compteur de version par table (label de modèle, ex. "cours.session"),
+    incrémenté à chaque écriture. Sert de validateur HTTP (ETag,
+    Last-Modified) aux endpoints de lecture : voir performance.conditionnel.
+    """
+
+    nom = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    date_modification = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.nom} v{self.version}"
+
+
+class CompteurMetier(models.Model):
+    """
+    Valeur agrégée tenue à jour par deltas à chaque écriture (voir
+    performance.compteurs), pour exposer des jauges sans parcourir les tables.
+    """
+
+    nom = models.CharField(max_length=100, unique=True)
+    valeur = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.nom} = {self.valeur}"
+
+
+class RequeteLente(models.Model):
+    """
+    Requête SQL ayant dépassé REQUETES_LENTES_SEUIL_MS, agrégée par empreinte
+    (SQL normalisé) : voir performance.requetes_lentes.
+    """
+
+    empreinte = models.CharField(max_length=16, unique=True)
+    sql = models.TextField()
+    site_appel = models.CharField(max_length=255, blank=True)
+    base = models.CharField(max_length=50, default="default")
+    nombre = models.PositiveIntegerField(default=0)
+    duree_totale_ms = models.FloatField(default=0)
+    duree_max_ms = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+    derniere_occurrence = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.empreinte} x{self.nombre} ({self.duree_max_ms:.0f} ms max)"
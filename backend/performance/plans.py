@@ -0,0 +1,268 @@
+"""
+Plans d'exécution des requêtes SELECT et conseils d'index.
+
+``CapturePlans`` (execute_wrapper) relève les SELECT d'un appel ; ``expliquer``
+les passe à EXPLAIN selon le moteur et renvoie un ``Plan`` : lignes du plan
+débarrassées des coûts et estimations (comparables d'une exécution à
+l'autre), problèmes détectés (parcours complet d'une table, tri ou table
+temporaire) et index composites suggérés, déduits des colonnes filtrées
+par égalité puis par intervalle ou tri.
+
+Utilisé par la commande conseiller_index, qui enregistre et compare des
+instantanés dans performance/plans/<moteur>.json.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.apps import apps
+
+from .requetes_lentes import empreinte, normaliser
+
+# Django nomme les tables des sous-requêtes U0, U1… et les jointures répétées T2, T3…
+_ALIAS = re.compile(r'"(\w+)"\s+(?:AS\s+)?"?([UTV]\d+)"?\b')
+_COLONNE = r'(?:"(\w+)"|\b([UTV]\d+))\."(\w+)"'
+# Une égalité entre deux colonnes est une condition de jointure, pas un filtre
+_EGALITE = re.compile(
+    _COLONNE + r'\s*(?:=(?!\s*\(?\s*(?:"\w+"|[UTV]\d+)\.)|IN\s*\(|IS\s+NULL)', re.IGNORECASE
+)
+_INTERVALLE = re.compile(_COLONNE + r"\s*(?:<=?|>=?|BETWEEN\b)", re.IGNORECASE)
+_ORDRE = re.compile(r"\bORDER BY\b(.*?)(?:\bLIMIT\b|\)|$)", re.IGNORECASE | re.DOTALL)
+_COLONNE_SEULE = re.compile(_COLONNE)
+_COUTS = re.compile(r"\s*\((?:cost|actual)=[^)]*\)")
+
+
+@dataclass
+class Plan:
+    sql: str
+    lignes: List[str]
+    problemes: List[str] = field(default_factory=list)
+    suggestions: List[Tuple[str, Tuple[str, ...]]] = field(default_factory=list)
+
+    @property
+    def empreinte(self) -> str:
+        return empreinte(self.sql)
+
+
+class CapturePlans:
+    """execute_wrapper : garde les SELECT exécutés (SQL et paramètres), sans doublon."""
+
+    def __init__(self):
+        self.requetes: Dict[str, tuple] = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith("SELECT"):
+            self.requetes.setdefault(empreinte(normaliser(sql)), (sql, params))
+        return execute(sql, params, many, context)
+
+
+# ------------------- Modèles -------------------
+def _modeles_par_table() -> Dict[str, type]:
+    return {modele._meta.db_table: modele for modele in apps.get_models()}
+
+
+def _index_existants(modele) -> List[Tuple[str, ...]]:
+    """Colonnes de chaque index du modèle, dans l'ordre (clé primaire comprise)."""
+    meta = modele._meta
+    colonnes = {f.name: f.column for f in meta.concrete_fields}
+    index = [(meta.pk.column,)]
+    for champ in meta.concrete_fields:
+        if champ.db_index or champ.unique:
+            index.append((champ.column,))
+    for ensemble in meta.unique_together:
+        index.append(tuple(colonnes[nom] for nom in ensemble))
+    for declare in meta.indexes:
+        index.append(tuple(colonnes[nom.lstrip("-")] for nom in declare.fields))
+    return index
+
+
+def _couvert(colonnes: Tuple[str, ...], existants: List[Tuple[str, ...]]) -> bool:
+    return any(index[: len(colonnes)] == colonnes for index in existants)
+
+
+# ------------------- Analyse du SQL -------------------
+def _resoudre(sql: str):
+    alias = {a: table for table, a in _ALIAS.findall(sql)}
+
+    def table(quotee, nom_alias):
+        return quotee or alias.get(nom_alias)
+
+    return table
+
+
+def _colonnes(motif, sql: str, table_de) -> List[Tuple[str, str]]:
+    vues = []
+    for quotee, nom_alias, colonne in motif.findall(sql):
+        paire = (table_de(quotee, nom_alias), colonne)
+        if paire[0] and paire not in vues:
+            vues.append(paire)
+    return vues
+
+
+def _egalites(sql: str, table: str, table_de) -> List[str]:
+    return [c for t, c in _colonnes(_EGALITE, sql, table_de) if t == table]
+
+
+def suggerer(sql: str, table: str) -> Optional[Tuple[str, ...]]:
+    """
+    Colonnes d'un index composite pour ``table`` : égalités d'abord, puis
+    une colonne d'intervalle ou les colonnes de tri. None si la requête ne
+    filtre ni ne trie sur cette table.
+    """
+    sql = sql.replace("`", '"')
+    table_de = _resoudre(sql)
+    egalites = _egalites(sql, table, table_de)
+    intervalles = [
+        c for t, c in _colonnes(_INTERVALLE, sql, table_de) if t == table and c not in egalites
+    ]
+    ordre = _ORDRE.search(sql)
+    tri = []
+    if ordre:
+        tri = [
+            c
+            for t, c in _colonnes(_COLONNE_SEULE, ordre.group(1), table_de)
+            if t == table and c not in egalites
+        ]
+    # La clé primaire est déjà indexée, et implicite en fin d'index secondaire
+    colonnes = [c for c in egalites + (intervalles[:1] if intervalles else tri) if c != "id"]
+    return tuple(colonnes) or None
+
+
+def _table_du_tri(sql: str) -> Optional[str]:
+    ordre = _ORDRE.search(sql.replace("`", '"'))
+    if not ordre:
+        return None
+    tables = _colonnes(_COLONNE_SEULE, ordre.group(1), _resoudre(sql))
+    return tables[0][0] if tables else None
+
+
+# ------------------- EXPLAIN par moteur -------------------
+def _lignes_sqlite(curseur):
+    # (id, parent, inutilisé, détail) : seul le détail est stable et lisible
+    return [ligne[3] for ligne in curseur.fetchall()]
+
+
+def _problemes_sqlite(lignes, sql, table_de):
+    problemes = []
+    for detail in lignes:
+        parcours = re.match(r"SCAN (\w+)$", detail)
+        if parcours:
+            nom = parcours.group(1)
+            problemes.append(("scan", table_de(None, nom) or nom))
+        elif detail.startswith("USE TEMP B-TREE FOR"):
+            clause = detail[len("USE TEMP B-TREE FOR ") :]
+            problemes.append(("tri" if "ORDER BY" in clause else "temporaire", _table_du_tri(sql)))
+    return problemes
+
+
+def _lignes_mysql(curseur):
+    noms = [colonne[0] for colonne in curseur.description]
+    lignes = []
+    for ligne in curseur.fetchall():
+        valeurs = dict(zip(noms, ligne))
+        lignes.append(
+            f"{valeurs.get('table')} type={valeurs.get('type')} key={valeurs.get('key')} "
+            f"{valeurs.get('Extra') or ''}".strip()
+        )
+    return lignes
+
+
+def _problemes_mysql(lignes, sql, table_de):
+    problemes = []
+    for ligne in lignes:
+        nom = ligne.split(" ", 1)[0]
+        table = table_de(None, nom) or nom
+        if " type=ALL " in ligne:
+            problemes.append(("scan", table))
+        if "Using filesort" in ligne:
+            problemes.append(("tri", _table_du_tri(sql) or table))
+        if "Using temporary" in ligne:
+            problemes.append(("temporaire", table))
+    return problemes
+
+
+def _lignes_postgresql(curseur):
+    return [_COUTS.sub("", ligne[0]) for ligne in curseur.fetchall()]
+
+
+def _problemes_postgresql(lignes, sql, table_de):
+    problemes = []
+    for ligne in lignes:
+        parcours = re.search(r"Seq Scan on (\w+)(?: (\w+))?", ligne)
+        if parcours:
+            problemes.append(("scan", parcours.group(1)))
+        elif re.match(r"\s*(?:->\s*)?(?:Incremental )?Sort\b", ligne):
+            problemes.append(("tri", _table_du_tri(sql)))
+        elif re.match(r"\s*(?:->\s*)?HashAggregate\b", ligne):
+            problemes.append(("temporaire", None))
+    return problemes
+
+
+MOTEURS = {
+    "sqlite": ("EXPLAIN QUERY PLAN", _lignes_sqlite, _problemes_sqlite),
+    "mysql": ("EXPLAIN", _lignes_mysql, _problemes_mysql),
+    "postgresql": ("EXPLAIN", _lignes_postgresql, _problemes_postgresql),
+}
+
+LIBELLES = {
+    "scan": "parcours complet de {}",
+    "tri": "tri sans index ({})",
+    "temporaire": "table temporaire ({})",
+}
+
+
+class Conseiller:
+    """
+    Explique des requêtes et signale les problèmes sur les tables d'au moins
+    ``seuil`` lignes (un parcours complet d'une petite table est normal).
+    """
+
+    def __init__(self, connexion, seuil: int = 500):
+        if connexion.vendor not in MOTEURS:
+            raise ValueError(f"Moteur non pris en charge : {connexion.vendor}")
+        self.connexion = connexion
+        self.seuil = seuil
+        self.modeles = _modeles_par_table()
+        self._tailles: Dict[str, int] = {}
+
+    def taille(self, table: Optional[str]) -> int:
+        if table not in self.modeles:
+            return 0
+        if table not in self._tailles:
+            self._tailles[table] = self.modeles[table]._base_manager.count()
+        return self._tailles[table]
+
+    def expliquer(self, sql: str, params) -> Plan:
+        prefixe, lire, analyser = MOTEURS[self.connexion.vendor]
+        with self.connexion.cursor() as curseur:
+            curseur.execute(f"{prefixe} {sql}", params)
+            lignes = lire(curseur)
+
+        plan = Plan(sql=normaliser(sql), lignes=lignes)
+        table_de = _resoudre(sql.replace("`", '"'))
+        problemes = analyser(lignes, sql, table_de)
+        parcourues = {table for nature, table in problemes if nature == "scan"}
+        vus: Set[Tuple[str, Optional[str]]] = set()
+        for nature, table in problemes:
+            if (nature, table) in vus or self.taille(table) < self.seuil:
+                continue
+            # Trier les quelques lignes d'un filtre par égalité (clé étrangère) est sans enjeu
+            if (
+                nature == "tri"
+                and table not in parcourues
+                and _egalites(sql.replace("`", '"'), table, table_de)
+            ):
+                continue
+            vus.add((nature, table))
+            plan.problemes.append(LIBELLES[nature].format(table))
+            colonnes = suggerer(sql, table)
+            if colonnes and not _couvert(colonnes, _index_existants(self.modeles[table])):
+                suggestion = (table, colonnes)
+                if suggestion not in plan.suggestions:
+                    plan.suggestions.append(suggestion)
+        return plan
+
+    def champs(self, table: str, colonnes: Tuple[str, ...]) -> List[str]:
+        """Noms de champs du modèle pour des colonnes (pour Meta.indexes)."""
+        par_colonne = {f.column: f.name for f in self.modeles[table]._meta.concrete_fields}
+        return [par_colonne.get(colonne, colonne) for colonne in colonnes]
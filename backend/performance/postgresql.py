@@ -0,0 +1,54 @@
+"""
+Index propres à PostgreSQL, créés après chaque migrate.
+
+Les recherches par nom (``nom__icontains``) s'écrivent
+``UPPER("nom"::text) LIKE UPPER('%dup%')`` : aucun index B-tree ne sert un
+motif qui commence par %, mais un index GIN trigrammes (pg_trgm) sur la même
+expression si. Ces index ne peuvent pas figurer dans les Meta des modèles
+(GIN n'existe ni sous MySQL/MariaDB ni sous SQLite) : ils sont créés ici,
+seulement sur PostgreSQL, et ``IF NOT EXISTS`` rend l'opération répétable.
+Sur les autres bases, la recherche garde son parcours de table.
+
+Les index partiels (inscriptions actives, factures impayées, sessions
+ouvertes) sont, eux, déclarés dans les Meta : Django les crée sous
+PostgreSQL et SQLite et les ignore sous MySQL/MariaDB.
+"""
+from django.db import DatabaseError, connections, transaction
+
+# (app, modèle, colonne)
+INDEX_TRIGRAMMES = [
+    ("eleves", "Eleve", "nom"),
+    ("eleves", "Eleve", "prenom"),
+    ("cours", "Enseignant", "nom"),
+    ("cours", "Enseignant", "prenom"),
+]
+
+
+def creer_index_trigrammes(sender, using="default", verbosity=1, apps=None, **kwargs):
+    connexion = connections[using]
+    if connexion.vendor != "postgresql" or apps is None:
+        return
+    quote = connexion.ops.quote_name
+    try:
+        with transaction.atomic(using=using), connexion.cursor() as curseur:
+            curseur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DatabaseError as erreur:
+        # Extension non installée et droits insuffisants pour la créer
+        if verbosity:
+            print(f"  pg_trgm indisponible, index trigrammes non créés : {erreur}")
+        return
+
+    tables = set(connexion.introspection.table_names())
+    for app_label, nom_modele, colonne in INDEX_TRIGRAMMES:
+        try:
+            table = apps.get_model(app_label, nom_modele)._meta.db_table
+        except LookupError:
+            continue
+        if table not in tables:  # app pas encore migrée
+            continue
+        nom_index = f"{table}_{colonne}_trgm"
+        with connexion.cursor() as curseur:
+            curseur.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(nom_index)} ON {quote(table)} "
+                f"USING gin ((UPPER({quote(colonne)}::text)) gin_trgm_ops)"
+            )
@@ -0,0 +1,120 @@
+"""
+Profilage de requêtes HTTP : échantillonneur de pile et cProfile.
+
+``EchantillonneurPile`` relève, toutes les INTERVALLE_ECHANTILLONNAGE
+secondes depuis un thread séparé, la pile du thread qui traite la requête,
+et produit des piles repliées ("collapsed stacks", une ligne
+``frame;frame;frame nombre``) lisibles par flamegraph.pl ou speedscope.
+Son coût ne dépend pas du nombre d'appels de fonctions, contrairement à
+``ProfilCProfile`` (sortie pstats) qui mesure chaque appel.
+"""
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+INTERVALLE_ECHANTILLONNAGE = 0.001  # secondes
+PROFONDEUR_MAX = 200
+
+_RACINE = str(Path(settings.BASE_DIR).resolve()) + os.sep
+
+
+def _libelle(code) -> str:
+    fichier = code.co_filename
+    if fichier.startswith(_RACINE):
+        fichier = fichier[len(_RACINE) :]
+    elif "site-packages" + os.sep in fichier:
+        fichier = fichier.split("site-packages" + os.sep, 1)[1]
+    return f"{code.co_name} ({fichier}:{code.co_firstlineno})"
+
+
+class EchantillonneurPile:
+    extension = "collapsed"
+    type_contenu = "text/plain; charset=utf-8"
+
+    def __init__(self, intervalle: float = INTERVALLE_ECHANTILLONNAGE):
+        self.intervalle = intervalle
+        self.piles: Counter = Counter()
+        self._cible: Optional[int] = None
+        self._arret = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _echantillonner(self) -> None:
+        while not self._arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self._cible)
+            if frame is None:
+                continue
+            pile = []
+            while frame is not None and len(pile) < PROFONDEUR_MAX:
+                pile.append(_libelle(frame.f_code))
+                frame = frame.f_back
+            self.piles[";".join(reversed(pile))] += 1
+
+    def demarrer(self) -> None:
+        self._cible = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._echantillonner, name="profilage", daemon=True
+        )
+        self._thread.start()
+
+    def arreter(self) -> None:
+        self._arret.set()
+        self._thread.join()
+
+    def resultat(self) -> bytes:
+        return "".join(
+            f"{pile} {nombre}\n" for pile, nombre in self.piles.most_common()
+        ).encode()
+
+
+class ProfilCProfile:
+    extension = "pstats"
+    type_contenu = "application/octet-stream"
+
+    def __init__(self):
+        self.profil = cProfile.Profile()
+
+    def demarrer(self) -> None:
+        self.profil.enable()
+
+    def arreter(self) -> None:
+        self.profil.disable()
+
+    def resultat(self) -> bytes:
+        """Même contenu que pstats.Stats.dump_stats (lisible par snakeviz, pstats...)."""
+        self.profil.create_stats()
+        return marshal.dumps(self.profil.stats)
+
+
+FORMATS = {"collapsed": EchantillonneurPile, "pstats": ProfilCProfile}
+
+
+def enregistrer(dossier: str, nom: str, contenu: bytes, garder: int) -> str:
+    """Écrit le profil dans ``dossier`` et ne garde que les ``garder`` plus récents."""
+    os.makedirs(dossier, exist_ok=True)
+    chemin = os.path.join(dossier, nom)
+    with open(chemin, "wb") as fichier:
+        fichier.write(contenu)
+
+    profils = sorted(
+        (entree for entree in os.scandir(dossier) if entree.is_file()),
+        key=lambda entree: entree.stat().st_mtime,
+    )
+    for entree in profils[:-garder]:
+        try:
+            os.remove(entree.path)
+        except OSError:
+            pass
+    return chemin
+
+
+def nom_fichier(operation: str, extension: str) -> str:
+    horodatage = time.strftime("%Y%m%d-%H%M%S")
+    return f"{horodatage}-{int(time.time() * 1000) % 1000:03d}_{operation}_{os.getpid()}.{extension}"
@@ -0,0 +1,77 @@
+"""
+Données dénormalisées remplies après le ``migrate`` qui crée leur colonne.
+
+Les colonnes et tables calculées (Eleve.statut_inscription,
+Facture.impayee, index de la recherche) sont tenues à jour par les signaux,
+mais une base existante les reçoit vides : sans rattrapage, ``?statut=A``
+ne renverrait aucun élève, toutes les factures paraîtraient payées et la
+recherche ne trouverait rien. ``noter_schema`` (pre_migrate) relève les
+colonnes existantes, ``rattraper`` (post_migrate) lance le recalcul de
+chaque donnée apparue pendant ce ``migrate`` alors que les données dont
+elle dérive existaient déjà. Sur une base neuve ou déjà à jour, rien n'est recalculé.
+
+Les commandes recalculer_statuts_eleves, recalculer_factures_impayees et
+reconstruire_index_recherche restent disponibles pour une reprise manuelle.
+"""
+from typing import Dict, Optional, Set
+
+from django.apps import apps as apps_projet
+from django.db import connections
+from django.utils.module_loading import import_string
+
+# (modèle existant, modèle de la donnée, colonne ou None pour toute la table, recalcul)
+RATTRAPAGES = [
+    (
+        "eleves.Eleve", "eleves.Eleve", "statut_inscription",
+        "cours.models.actualiser_statut_inscription",
+    ),
+    (
+        "factures.Facture", "factures.Facture", "impayee",
+        "factures.models.actualiser_factures_impayees",
+    ),
+    ("eleves.Eleve", "recherche.TermeRecherche", None, "recherche.indexation.reconstruire"),
+]
+
+# alias -> table -> colonnes, relevé avant migrate
+_AVANT: Dict[str, Dict[str, Set[str]]] = {}
+
+
+def _schema(using: str) -> Dict[str, Set[str]]:
+    connexion = connections[using]
+    tables = set(connexion.introspection.table_names())
+    schema = {}
+    with connexion.cursor() as curseur:
+        for modele in {m for ligne in RATTRAPAGES for m in ligne[:2]}:
+            table = apps_projet.get_model(modele)._meta.db_table
+            if table in tables:
+                schema[table] = {
+                    c.name for c in connexion.introspection.get_table_description(curseur, table)
+                }
+    return schema
+
+
+def _present(schema: Dict[str, Set[str]], modele: str, colonne: Optional[str]) -> bool:
+    modele = apps_projet.get_model(modele)
+    if colonne is None:
+        return modele._meta.db_table in schema
+    return modele._meta.get_field(colonne).column in schema.get(modele._meta.db_table, ())
+
+
+def noter_schema(sender, using="default", **kwargs):
+    _AVANT[using] = _schema(using)
+
+
+def rattraper(sender, using="default", verbosity=1, **kwargs):
+    avant = _AVANT.pop(using, None)
+    if avant is None:
+        return
+    apres = _schema(using)
+    for existant, modele, colonne, recalcul in RATTRAPAGES:
+        if (
+            _present(avant, existant, None)
+            and not _present(avant, modele, colonne)
+            and _present(apres, modele, colonne)
+        ):
+            nombre = import_string(recalcul)()
+            if verbosity:
+                print(f"  {modele}{f'.{colonne}' if colonne else ''} rempli : {nombre} ligne(s)")
@@ -0,0 +1,106 @@
+"""
+Référentiels en mémoire : Pays, Cours, Enseignant.
+
+Ces tables sont petites et changent rarement ; chaque processus en garde
+une copie (lignes projetées sur le Schema de sortie et liste JSON déjà
+encodée). La copie est invalidée :
+ - immédiatement dans le processus qui écrit (abonnement à
+   performance.versions, après le commit) ;
+ - dans les autres workers au plus INTERVALLE_VERIFICATION secondes plus
+   tard, en comparant la version de la table (une requête d'une ligne).
+
+Un id absent de la copie est encore cherché en base avant d'être refusé :
+une ligne créée par un autre worker n'est jamais rejetée à tort.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Type
+
+from django.db import models
+from django.http import Http404
+from ninja import Schema
+
+from backend_ecole_peg.projection import Projection
+from backend_ecole_peg.renderers import RenduJSON
+from cours.models import Cours, Enseignant
+from cours.schemas import CoursOut, EnseignantOut
+from eleves.models import Pays
+from eleves.schemas import PaysOut
+
+from .versions import abonner, label, lire_versions
+
+INTERVALLE_VERIFICATION = 2.0
+
+
+class _Etat:
+    def __init__(self, version: Optional[int], lignes: List[dict], octets: bytes):
+        self.version = version
+        self.lignes = lignes
+        self.par_id: Dict[int, dict] = {ligne["id"]: ligne for ligne in lignes}
+        self.octets = octets
+
+
+class Referentiel:
+    def __init__(self, modele: Type[models.Model], schema: Type[Schema], tri: Sequence[str]):
+        self.modele = modele
+        self.label = label(modele)
+        self.projection = Projection(schema)
+        self.tri = tri
+        self._etat: Optional[_Etat] = None
+        self._verifie_a = 0.0
+        self._verrou = threading.Lock()
+
+    def invalider(self) -> None:
+        self._etat = None
+
+    def _courant(self) -> _Etat:
+        etat = self._etat
+        if etat is not None and time.monotonic() - self._verifie_a < INTERVALLE_VERIFICATION:
+            return etat
+
+        with self._verrou:
+            etat = self._etat
+            version = lire_versions([self.label]).get(self.label, (0, None))[0]
+            if etat is None or etat.version != version:
+                lignes = self.projection.liste(self.modele.objects.order_by(*self.tri))
+                octets = RenduJSON().render(None, lignes, response_status=200)
+                etat = _Etat(version, lignes, octets)
+                self._etat = etat
+            self._verifie_a = time.monotonic()
+            return etat
+
+    def liste(self) -> List[dict]:
+        return self._courant().lignes
+
+    def json(self) -> bytes:
+        """La liste complète, déjà encodée (même JSON que le Schema de sortie)."""
+        return self._courant().octets
+
+    def obtenir(self, id_objet: Any) -> Optional[dict]:
+        ligne = self._courant().par_id.get(id_objet)
+        if ligne is None and self.modele.objects.filter(pk=id_objet).exists():
+            # Créé ailleurs depuis le dernier chargement
+            self.invalider()
+            ligne = self._courant().par_id.get(id_objet)
+        return ligne
+
+    def verifier(self, id_objet: Any) -> None:
+        """Équivalent de get_object_or_404 pour valider une clé étrangère."""
+        if self.obtenir(id_objet) is None:
+            raise Http404(f"{self.modele._meta.verbose_name} introuvable")
+
+
+REFERENTIEL_PAYS = Referentiel(Pays, PaysOut, ("nom", "id"))
+REFERENTIEL_COURS = Referentiel(Cours, CoursOut, ("type_cours", "niveau", "id"))
+REFERENTIEL_ENSEIGNANTS = Referentiel(Enseignant, EnseignantOut, ("nom", "prenom", "id"))
+
+_PAR_LABEL = {r.label: r for r in (REFERENTIEL_PAYS, REFERENTIEL_COURS, REFERENTIEL_ENSEIGNANTS)}
+
+
+def _invalider(labels: Set[str]) -> None:
+    for nom in labels:
+        if nom in _PAR_LABEL:
+            _PAR_LABEL[nom].invalider()
+
+
+abonner(_invalider)
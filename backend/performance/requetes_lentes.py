@@ -0,0 +1,211 @@
+"""
+Journal des requêtes SQL lentes.
+
+Un execute_wrapper permanent (installé à l'ouverture de chaque connexion
+quand REQUETES_LENTES est activé) chronomètre chaque requête. Au-delà de
+REQUETES_LENTES_SEUIL_MS, la requête est journalisée (logger
+"performance.requetes_lentes") avec son empreinte (SQL normalisé, valeurs
+remplacées par ?) et la ligne du code de l'application qui l'a déclenchée.
+Avec REQUETES_LENTES_EXPLAIN (DEBUG par défaut), le plan d'exécution est
+capturé une fois par empreinte et par processus.
+
+Les occurrences sont agrégées en mémoire puis écrites dans RequeteLente à
+la fin de chaque requête HTTP (``enregistrer``), hors de la transaction de
+la vue : voir la commande rapport_requetes_lentes.
+"""
+import hashlib
+import logging
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger("performance.requetes_lentes")
+
+_SAVEPOINTS = re.compile(r'"s\d+_x\d+"')
+_CHAINES = re.compile(r"'(?:[^']|'')*'")
+_NOMBRES = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETRES = re.compile(r"%s|\?")
+_LISTES = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACES = re.compile(r"\s+")
+
+_RACINE = str(Path(settings.BASE_DIR).resolve())
+_IGNORES = (str(Path(__file__).resolve().parent),)
+
+
+def normaliser(sql: str) -> str:
+    sql = _SAVEPOINTS.sub('"?"', sql)
+    sql = _CHAINES.sub("?", sql)
+    sql = _NOMBRES.sub("?", sql)
+    sql = _PARAMETRES.sub("?", sql)
+    sql = _LISTES.sub("(...)", sql)
+    return _ESPACES.sub(" ", sql).strip()
+
+
+def empreinte(sql_normalise: str) -> str:
+    return hashlib.md5(sql_normalise.encode()).hexdigest()[:16]
+
+
+def site_appel() -> Optional[str]:
+    """
+    Première frame du code de l'application dans la pile, hors performance/
+    et middlewares (qui enveloppent toutes les vues). None pour un queryset
+    renvoyé par la vue et évalué ensuite par ninja.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        fichier = frame.f_code.co_filename
+        if (
+            fichier.startswith(_RACINE)
+            and not fichier.startswith(_IGNORES)
+            and "site-packages" not in fichier
+            and not fichier.endswith("middleware.py")
+        ):
+            relatif = fichier[len(_RACINE) + 1 :]
+            return f"{relatif}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return None
+
+
+class _Occurrences:
+    """Agrégats en attente d'écriture, par empreinte."""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.en_attente: Dict[str, dict] = {}
+        self.expliquees: set = set()
+
+
+_OCCURRENCES = _Occurrences()
+_local = threading.local()
+
+
+def _expliquer(connexion, sql: str, params) -> Optional[str]:
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    try:
+        # Dans un point de sauvegarde : un EXPLAIN en échec ne doit pas
+        # annuler la transaction de la vue (PostgreSQL)
+        with transaction.atomic(using=connexion.alias), connexion.cursor() as curseur:
+            prefixe = "EXPLAIN QUERY PLAN" if connexion.vendor == "sqlite" else "EXPLAIN"
+            curseur.execute(f"{prefixe} {sql}", params)
+            return "\n".join(" | ".join(str(c) for c in ligne) for ligne in curseur.fetchall())
+    except Exception as erreur:  # le plan est un bonus : ne jamais casser la requête
+        return f"EXPLAIN impossible : {erreur}"
+
+
+class SurveillanceRequetesLentes:
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, "actif", False):
+            return execute(sql, params, many, context)
+
+        debut = time.perf_counter()
+        reussie = False
+        try:
+            resultat = execute(sql, params, many, context)
+            reussie = True
+            return resultat
+        finally:
+            duree_ms = (time.perf_counter() - debut) * 1000
+            if duree_ms >= settings.REQUETES_LENTES_SEUIL_MS:
+                _local.actif = True
+                try:
+                    self._noter(context["connection"], sql, params, many, duree_ms, reussie)
+                finally:
+                    _local.actif = False
+
+    def _noter(self, connexion, sql, params, many, duree_ms, reussie=True):
+        normalise = normaliser(sql)
+        cle = empreinte(normalise)
+        appel = site_appel()
+
+        plan = None
+        # Après une erreur, la transaction est déjà compromise : pas d'EXPLAIN
+        if (
+            settings.REQUETES_LENTES_EXPLAIN
+            and reussie
+            and not many
+            and cle not in _OCCURRENCES.expliquees
+        ):
+            _OCCURRENCES.expliquees.add(cle)
+            plan = _expliquer(connexion, sql, params)
+
+        logger.warning(
+            "requête lente %.1f ms [%s] %s : %s",
+            duree_ms,
+            cle,
+            appel or "?",
+            normalise[:500],
+        )
+
+        with _OCCURRENCES.verrou:
+            entree = _OCCURRENCES.en_attente.setdefault(
+                cle,
+                {
+                    "sql": normalise,
+                    "site_appel": appel,
+                    "base": connexion.alias,
+                    "nombre": 0,
+                    "duree_totale_ms": 0.0,
+                    "duree_max_ms": 0.0,
+                    "plan": None,
+                },
+            )
+            entree["nombre"] += 1
+            entree["duree_totale_ms"] += duree_ms
+            entree["duree_max_ms"] = max(entree["duree_max_ms"], duree_ms)
+            entree["plan"] = entree["plan"] or plan
+
+
+SURVEILLANCE = SurveillanceRequetesLentes()
+
+
+def installer(connexion) -> None:
+    if SURVEILLANCE not in connexion.execute_wrappers:
+        connexion.execute_wrappers.append(SURVEILLANCE)
+
+
+def enregistrer() -> int:
+    """Écrit les agrégats en attente dans RequeteLente ; renvoie le nombre d'empreintes."""
+    from .models import RequeteLente
+
+    with _OCCURRENCES.verrou:
+        en_attente, _OCCURRENCES.en_attente = _OCCURRENCES.en_attente, {}
+    if not en_attente:
+        return 0
+
+    maintenant = timezone.now()
+    _local.actif = True
+    try:
+        for cle, entree in en_attente.items():
+            modifiees = RequeteLente.objects.filter(empreinte=cle).update(
+                nombre=F("nombre") + entree["nombre"],
+                duree_totale_ms=F("duree_totale_ms") + entree["duree_totale_ms"],
+                duree_max_ms=Greatest("duree_max_ms", entree["duree_max_ms"]),
+                derniere_occurrence=maintenant,
+            )
+            if not modifiees:
+                RequeteLente.objects.create(
+                    empreinte=cle,
+                    sql=entree["sql"],
+                    site_appel=entree["site_appel"] or "",
+                    base=entree["base"],
+                    nombre=entree["nombre"],
+                    duree_totale_ms=entree["duree_totale_ms"],
+                    duree_max_ms=entree["duree_max_ms"],
+                    plan=entree["plan"] or "",
+                    derniere_occurrence=maintenant,
+                )
+            elif entree["plan"]:
+                RequeteLente.objects.filter(empreinte=cle, plan="").update(plan=entree["plan"])
+    finally:
+        _local.actif = False
+    return len(en_attente)
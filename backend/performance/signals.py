@@ -0,0 +1,151 @@
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from cours.models import Cours, Enseignant, Inscription, Session
+from eleves.models import Eleve, Garant, Pays
+from factures.models import DetailFacture, Facture, Paiement
+
+from .cache_objets import evincer
+from .compteurs import CONTRIBUTIONS, ajuster
+from .requetes_lentes import enregistrer, installer
+from .versions import APPS_VERSIONNEES, incrementer
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def versionner_ecriture(sender, **kwargs):
+    if sender._meta.app_label in APPS_VERSIONNEES:
+        incrementer(sender)
+
+
+@receiver(m2m_changed)
+def versionner_relation(sender, instance, action, model, **kwargs):
+    if action.startswith("post_") and sender._meta.app_label in APPS_VERSIONNEES:
+        # La table de liaison et les deux côtés de la relation
+        incrementer(sender, type(instance), model)
+
+
+# ------------------- CACHE DES OBJETS -------------------
+def _factures_des_eleves(eleves):
+    return Facture.objects.filter(
+        Q(eleve__in=eleves) | Q(inscription__eleve__in=eleves)
+    ).values_list("id", flat=True)
+
+
+def _evincer_eleve(instance):
+    evincer("eleve", [instance.pk])
+    evincer("facture", _factures_des_eleves([instance.pk]))
+
+
+def _evincer_pays(instance):
+    evincer("eleve", Eleve.objects.filter(pays_id=instance.pk).values_list("id", flat=True))
+
+
+def _evincer_garant(instance):
+    # get_facture reprend l'adresse du garant quand celle de l'élève est vide
+    evincer("facture", _factures_des_eleves(Eleve.objects.filter(garant_id=instance.pk)))
+
+
+def _evincer_session(instance):
+    evincer("session", [instance.pk])
+
+
+def _evincer_cours(instance):
+    evincer("session", Session.objects.filter(cours_id=instance.pk).values_list("id", flat=True))
+
+
+def _evincer_enseignant(instance):
+    evincer(
+        "session", Session.objects.filter(enseignant_id=instance.pk).values_list("id", flat=True)
+    )
+
+
+def _evincer_inscription(instance):
+    evincer("facture", Facture.objects.filter(inscription_id=instance.pk).values_list("id", flat=True))
+
+
+def _evincer_facture(instance):
+    evincer("facture", [instance.pk])
+
+
+def _evincer_ligne_facture(instance):
+    evincer("facture", [instance.facture_id])
+
+
+EVICTIONS = {
+    Eleve: _evincer_eleve,
+    Pays: _evincer_pays,
+    Garant: _evincer_garant,
+    Session: _evincer_session,
+    Cours: _evincer_cours,
+    Enseignant: _evincer_enseignant,
+    Inscription: _evincer_inscription,
+    Facture: _evincer_facture,
+    DetailFacture: _evincer_ligne_facture,
+    Paiement: _evincer_ligne_facture,
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def evincer_cache_objets(sender, instance, **kwargs):
+    if sender in EVICTIONS:
+        EVICTIONS[sender](instance)
+
+
+# ------------------- COMPTEURS MÉTIER -------------------
+@receiver(post_init, sender=Session)
+@receiver(post_init, sender=Inscription)
+@receiver(post_init, sender=DetailFacture)
+@receiver(post_init, sender=Paiement)
+def memoriser_contribution(sender, instance, **kwargs):
+    # Contribution lue en base, pour écrire le delta sans relire la ligne
+    _, champ, contribution = CONTRIBUTIONS[sender]
+    if instance.pk is not None and champ in instance.__dict__:
+        instance._contribution_avant = contribution(instance)
+
+
+@receiver(pre_save)
+def relire_contribution(sender, instance, **kwargs):
+    # Seulement si le champ n'a pas été chargé (only(), defer())
+    if (
+        sender in CONTRIBUTIONS
+        and instance.pk is not None
+        and not hasattr(instance, "_contribution_avant")
+    ):
+        _, _, contribution = CONTRIBUTIONS[sender]
+        ancien = sender._base_manager.filter(pk=instance.pk).first()
+        instance._contribution_avant = contribution(ancien) if ancien else 0
+
+
+@receiver(post_save)
+def ajuster_compteur_ecriture(sender, instance, created, **kwargs):
+    if sender in CONTRIBUTIONS:
+        nom, _, contribution = CONTRIBUTIONS[sender]
+        avant = 0 if created else getattr(instance, "_contribution_avant", 0)
+        ajuster(nom, contribution(instance) - avant)
+        instance._contribution_avant = contribution(instance)
+
+
+@receiver(post_delete)
+def ajuster_compteur_suppression(sender, instance, **kwargs):
+    if sender in CONTRIBUTIONS:
+        nom, _, contribution = CONTRIBUTIONS[sender]
+        ajuster(nom, -contribution(instance))
+
+
+# ------------------- REQUÊTES LENTES -------------------
+@receiver(connection_created)
+def surveiller_connexion(sender, connection, **kwargs):
+    if settings.REQUETES_LENTES:
+        installer(connection)
+
+
+@receiver(request_finished)
+def enregistrer_requetes_lentes(sender, **kwargs):
+    if settings.REQUETES_LENTES:
+        enregistrer()
@@ -0,0 +1,611 @@
+import asyncio
+import json
+import marshal
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q, Sum
+from django.http import Http404
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from cours.models import (
+    Enseignant,
+    Inscription,
+    Session,
+    StatutSessionChoices,
+    actualiser_statut_inscription,
+)
+from eleves.models import Eleve
+from eleves.tests import creer_eleve, creer_session
+from factures.models import DetailFacture, Facture, Paiement, actualiser_factures_impayees
+from recherche.models import DocumentRecherche, TermeRecherche
+
+from .cache_objets import statistiques
+from .charge import ClientHTTP, ReponseHTTP, Statistiques, Utilisateur, executer
+from .connexions import Pool
+from .compteurs import SESSIONS_OUVERTES, recalculer, valeurs
+from .donnees_test import Generateur
+from .instrumentation import AGREGATS
+from .metriques import Registre
+from .profilage import EchantillonneurPile, enregistrer
+from .rattrapage import _schema, noter_schema, rattraper
+from .referentiel import REFERENTIEL_ENSEIGNANTS
+from .requetes_lentes import SURVEILLANCE, _OCCURRENCES
+
+
+class CacheObjetsTests(TestCase):
+    def setUp(self):
+        caches["objets"].clear()
+        self.eleve = creer_eleve("Dupont", "Marie")
+        self.url = f"/api/eleves/eleve/{self.eleve.id}/"
+
+    def lire(self):
+        reponse = self.client.get(self.url)
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def test_lecture_suivante_servie_par_le_cache(self):
+        avant = statistiques()["eleve"]
+        self.lire()
+        self.lire()
+        apres = statistiques()["eleve"]
+
+        self.assertEqual(apres["misses"] - avant["misses"], 1)
+        self.assertEqual(apres["hits"] - avant["hits"], 1)
+
+    def test_modification_evince_l_objet(self):
+        self.assertEqual(self.lire()["nom"], "Dupont")
+
+        donnees = {
+            "nom": "Durand",
+            "prenom": "Marie",
+            "date_naissance": "2000-01-01",
+            "sexe": "F",
+            "telephone": "+41 79 123 45 67",
+            "email": "durand.marie@exemple.ch",
+            "type_permis": "B",
+            "pays_id": self.eleve.pays_id,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            reponse = self.client.put(
+                f"/api/eleves/eleves/{self.eleve.id}/", donnees, content_type="application/json"
+            )
+        self.assertEqual(reponse.status_code, 200)
+
+        self.assertEqual(self.lire()["nom"], "Durand")
+
+    def test_compteurs_hors_du_cache_partage(self):
+        cache = caches["objets"]
+        with mock.patch.object(cache, "incr") as incr, mock.patch.object(cache, "add") as add:
+            self.lire()
+            self.lire()
+
+        incr.assert_not_called()
+        add.assert_not_called()
+
+
+class _ClientFactice:
+    def __init__(self, *resultats):
+        self.resultats = list(resultats)
+
+    async def requete(self, methode, chemin, donnees=None):
+        resultat = self.resultats.pop(0)
+        if isinstance(resultat, Exception):
+            raise resultat
+        return ReponseHTTP(resultat, {}, b"{}")
+
+
+class ChargeTests(LiveServerTestCase):
+    def test_appels_classes_en_refus_et_erreurs(self):
+        stats = Statistiques()
+        client = _ClientFactice(200, 409, 503, asyncio.TimeoutError())
+        u = Utilisateur(client, stats, {}, None)
+
+        async def scenario():
+            return [await u.appel("etape", "GET", "/") for _ in range(4)]
+
+        reponses = asyncio.run(scenario())
+
+        self.assertEqual([r is not None for r in reponses], [True, False, False, False])
+        etape = stats.rapport(1.0)["etapes"]["etape"]
+        self.assertEqual((etape["appels"], etape["refus"], etape["erreurs"]), (4, 1, 2))
+        self.assertEqual(etape["taux_erreur"], 0.5)
+
+    def test_seules_les_lectures_rejouees_apres_une_coupure(self):
+        recues = []
+
+        async def servir(lecteur, ecrivain):
+            # Répond à la première requête de chaque connexion, coupe à la seconde
+            try:
+                for numero in range(2):
+                    entetes = await lecteur.readuntil(b"\r\n\r\n")
+                    ligne, *lignes = entetes.decode().split("\r\n")
+                    longueur = sum(
+                        int(entete.split(":")[1])
+                        for entete in lignes
+                        if entete.lower().startswith("content-length")
+                    )
+                    await lecteur.readexactly(longueur)
+                    recues.append(" ".join(ligne.split()[:2]))
+                    if numero:
+                        break
+                    ecrivain.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+                    await ecrivain.drain()
+            except asyncio.IncompleteReadError:  # client parti
+                pass
+            ecrivain.close()
+
+        async def scenario():
+            serveur = await asyncio.start_server(servir, "127.0.0.1", 0)
+            port = serveur.sockets[0].getsockname()[1]
+            client = ClientHTTP(f"http://127.0.0.1:{port}", timeout=5)
+            try:
+                await client.requete("GET", "/a")
+                with self.assertRaises((ConnectionError, asyncio.IncompleteReadError)):
+                    await client.requete("POST", "/inscrire", {"id_session": 1})
+                await client.requete("GET", "/b")
+                reponse = await client.requete("GET", "/c")
+            finally:
+                await client.fermer()
+                serveur.close()
+                await serveur.wait_closed()
+            return reponse
+
+        self.assertEqual(asyncio.run(scenario()).statut, 200)
+        self.assertEqual(recues, ["GET /a", "POST /inscrire", "GET /b", "GET /c", "GET /c"])
+
+    def test_parcours_en_lecture_seule_contre_le_serveur(self):
+        session = creer_session()
+        for nom in ("Dupont", "Martin"):
+            Inscription.objects.create(eleve=creer_eleve(nom), session=session)
+
+        rapport = asyncio.run(
+            executer(self.live_server_url, utilisateurs=2, duree=0.5, lecture_seule=True)
+        )
+
+        self.assertGreater(rapport["appels"], 0)
+        self.assertEqual(rapport["erreurs"], 0, rapport["etapes"])
+        self.assertLessEqual(set(rapport["scenarios"]), {"tableau_de_bord", "recherche_eleve"})
+        self.assertIn("dossier_eleve", rapport["etapes"])
+
+
+class CompteursTests(TestCase):
+    def setUp(self):
+        recalculer()
+
+    def valeur(self, nom):
+        return valeurs()[nom]
+
+    def test_delta_applique_apres_le_commit(self):
+        with self.captureOnCommitCallbacks() as rappels:
+            session = creer_session()
+            # La ligne partagée n'est pas touchée pendant la transaction
+            self.assertEqual(self.valeur(SESSIONS_OUVERTES), 0)
+        for rappel in rappels:
+            rappel()
+        self.assertEqual(self.valeur(SESSIONS_OUVERTES), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session.statut = StatutSessionChoices.FERMÉE
+            session.save()
+        self.assertEqual(self.valeur(SESSIONS_OUVERTES), 0)
+
+    def test_transaction_annulee_sans_effet(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    creer_session()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        self.assertEqual(self.valeur(SESSIONS_OUVERTES), 0)
+
+    def test_ancienne_valeur_sans_relecture(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            creer_session()
+        session = Session.objects.get()
+
+        session.statut = StatutSessionChoices.FERMÉE
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as requetes:
+                session.save()
+
+        relectures = [
+            q["sql"] for q in requetes.captured_queries
+            if q["sql"].startswith("SELECT") and 'FROM "cours_session"' in q["sql"]
+        ]
+        self.assertEqual(relectures, [])
+        self.assertEqual(self.valeur(SESSIONS_OUVERTES), 0)
+
+
+class _ConnexionBrute:
+    def __init__(self, cassee=False):
+        self.cassee = cassee
+        self.fermee = False
+
+    def cursor(self):
+        if self.cassee:
+            raise DatabaseError("server has gone away")
+        return mock.Mock()
+
+    def close(self):
+        self.fermee = True
+
+
+@override_settings(DB_POOL_TAILLE=2, DB_CONN_MAX_AGE=60)
+class PoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = Pool()
+
+    def test_reprise_et_taille_bornee(self):
+        a, b, c = _ConnexionBrute(), _ConnexionBrute(), _ConnexionBrute()
+        maintenant = time.monotonic()
+
+        self.assertIsNone(self.pool.prendre("default", verifier=False))
+        self.assertTrue(self.pool.rendre("default", a, maintenant))
+        self.assertTrue(self.pool.rendre("default", b, maintenant))
+        self.assertFalse(self.pool.rendre("default", c, maintenant))
+
+        self.assertEqual(self.pool.prendre("default", verifier=True), (b, maintenant))
+        self.assertEqual(self.pool.instantane()["default"]["disponibles"], 1)
+
+    def test_connexions_trop_vieilles_ou_cassees_fermees(self):
+        vieille, cassee = _ConnexionBrute(), _ConnexionBrute(cassee=True)
+        self.pool.rendre("default", vieille, time.monotonic() - 120)
+        self.pool.rendre("default", cassee, time.monotonic())
+
+        self.assertIsNone(self.pool.prendre("default", verifier=True))
+
+        self.assertTrue(vieille.fermee and cassee.fermee)
+        stats = self.pool.instantane()["default"]
+        self.assertEqual((stats["fermees_age"], stats["fermees_verification"]), (1, 1))
+
+
+class RegistreTests(TestCase):
+    def test_ecritures_concurrentes(self):
+        registre = Registre()
+        registre.incrementer("peg_requetes_http_total", operation="test", statut="200")
+        erreurs = []
+
+        def ecrire():
+            try:
+                for _ in range(50):
+                    registre.ecrire(forcer=True)
+            except Exception as e:
+                erreurs.append(e)
+
+        with tempfile.TemporaryDirectory() as dossier, self.settings(METRIQUES_DOSSIER=dossier):
+            fils = [threading.Thread(target=ecrire) for _ in range(8)]
+            for fil in fils:
+                fil.start()
+            for fil in fils:
+                fil.join()
+
+            self.assertEqual(erreurs, [])
+            self.assertEqual(os.listdir(dossier), [f"{os.getpid()}.json"])
+            self.assertIn('peg_requetes_http_total{operation="test",statut="200"} 1', registre.exposition())
+
+    def test_erreur_d_ecriture_ignoree(self):
+        with self.settings(METRIQUES_DOSSIER="/chemin/inexistant"):
+            Registre().ecrire(forcer=True)
+
+
+class RequetesLentesTests(TestCase):
+    def tearDown(self):
+        _OCCURRENCES.en_attente.clear()
+
+    def executer(self, sql):
+        with self.assertLogs("performance.requetes_lentes", "WARNING"), CaptureQueriesContext(
+            connection
+        ) as requetes, connection.execute_wrapper(SURVEILLANCE):
+            with connection.cursor() as curseur:
+                curseur.execute(sql)
+        return [q["sql"] for q in requetes.captured_queries]
+
+    @override_settings(REQUETES_LENTES_SEUIL_MS=0, REQUETES_LENTES_EXPLAIN=True)
+    def test_explain_dans_un_point_de_sauvegarde(self):
+        with transaction.atomic():
+            sql = self.executer("SELECT 1 AS requete_lente_savepoint")
+
+        explain = next(i for i, q in enumerate(sql) if q.startswith("EXPLAIN"))
+        self.assertTrue(sql[explain - 1].startswith("SAVEPOINT"))
+        self.assertTrue(sql[explain + 1].startswith("RELEASE SAVEPOINT"))
+
+    @override_settings(REQUETES_LENTES_SEUIL_MS=0, REQUETES_LENTES_EXPLAIN=True)
+    def test_pas_d_explain_apres_une_erreur(self):
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            self.executer("SELECT * FROM table_inexistante_requete_lente")
+
+        en_attente = [e for e in _OCCURRENCES.en_attente.values() if "table_inexistante" in e["sql"]]
+        self.assertEqual(len(en_attente), 1)
+        self.assertIsNone(en_attente[0]["plan"])
+
+
+class PlansTests(TestCase):
+    fixtures = ["pays"]
+
+    def test_plans_conformes_a_l_instantane(self):
+        # Même échelle que l'instantané (conseiller_index --generer 0.02 --enregistrer)
+        sortie = StringIO()
+        try:
+            call_command("conseiller_index", generer=0.02, verifier=True, stdout=sortie)
+        except CommandError as erreur:
+            self.fail(str(erreur))
+        self.assertIn(f"Plans conformes à {connection.vendor}.json", sortie.getvalue())
+
+
+class BudgetsTests(TestCase):
+    fixtures = ["pays"]
+
+    def mesurer(self):
+        sortie = StringIO()
+        call_command("banc_endpoints", generer=0.005, repetitions=1, stdout=sortie)
+        return sortie.getvalue()
+
+    def test_endpoints_dans_leur_budget(self):
+        try:
+            sortie = self.mesurer()
+        except CommandError as erreur:
+            self.fail(str(erreur))
+        self.assertIn("budgets respectés", sortie)
+
+    def test_depassement_de_budget(self):
+        with mock.patch.dict("performance.management.commands.banc_endpoints.BUDGETS", {"eleves": 0}):
+            with self.assertRaisesMessage(CommandError, "budget de requêtes dépassé : eleves"):
+                self.mesurer()
+
+
+class RattrapageTests(TestCase):
+    def setUp(self):
+        self.actif = creer_eleve("Dupont")
+        Inscription.objects.create(eleve=self.actif, session=creer_session())
+        self.facture = Facture.objects.create(eleve=self.actif)
+        DetailFacture.objects.create(facture=self.facture, description="Cours", montant=100)
+        # Colonnes ajoutées par migrate sur une base existante : valeur par défaut partout
+        Eleve.objects.update(statut_inscription="I")
+        Facture.objects.update(impayee=False)
+
+    def migrer(self, avant):
+        with mock.patch("performance.rattrapage._schema", side_effect=[avant, _schema("default")]):
+            noter_schema(None)
+            rattraper(None, verbosity=0)
+        self.actif.refresh_from_db()
+        return self.actif.statut_inscription
+
+    def sans_colonne(self, modele, colonne):
+        avant = _schema("default")
+        avant[modele._meta.db_table].discard(colonne)
+        return avant
+
+    def test_colonne_ajoutee_remplie(self):
+        self.assertEqual(self.migrer(self.sans_colonne(Eleve, "statut_inscription")), "A")
+        self.assertFalse(Facture.objects.get(id=self.facture.id).impayee)
+
+        self.migrer(self.sans_colonne(Facture, "impayee"))
+        self.assertTrue(Facture.objects.get(id=self.facture.id).impayee)
+
+    def test_index_de_recherche_cree_puis_rempli(self):
+        TermeRecherche.objects.all().delete()
+        DocumentRecherche.objects.all().delete()
+        avant = _schema("default")
+        del avant[TermeRecherche._meta.db_table]
+
+        self.migrer(avant)
+
+        self.assertTrue(DocumentRecherche.objects.filter(id_objet=self.actif.id).exists())
+
+    def test_base_neuve_ou_a_jour_inchangee(self):
+        self.assertEqual(self.migrer({}), "I")
+        self.assertEqual(self.migrer(_schema("default")), "I")
+        self.assertFalse(Facture.objects.get(id=self.facture.id).impayee)
+
+
+class ReferentielTests(TestCase):
+    def setUp(self):
+        REFERENTIEL_ENSEIGNANTS.invalider()
+        self.martin = Enseignant.objects.create(nom="Martin", prenom="Luc")
+
+    def test_lectures_servies_par_la_copie(self):
+        REFERENTIEL_ENSEIGNANTS.liste()
+        with self.assertNumQueries(0):
+            self.assertEqual(REFERENTIEL_ENSEIGNANTS.obtenir(self.martin.id)["nom"], "Martin")
+            REFERENTIEL_ENSEIGNANTS.verifier(self.martin.id)
+
+    def test_ecriture_du_processus_invalide_la_copie(self):
+        REFERENTIEL_ENSEIGNANTS.liste()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.martin.nom = "Marin"
+            self.martin.save()
+
+        self.assertEqual(REFERENTIEL_ENSEIGNANTS.obtenir(self.martin.id)["nom"], "Marin")
+
+    def test_ligne_creee_par_un_autre_worker(self):
+        REFERENTIEL_ENSEIGNANTS.liste()
+        # Sans signal ni nouvelle version visible par ce processus
+        Enseignant.objects.bulk_create([Enseignant(nom="Durand", prenom="Eva")])
+        autre = Enseignant.objects.get(nom="Durand")
+
+        self.assertEqual(REFERENTIEL_ENSEIGNANTS.obtenir(autre.id)["nom"], "Durand")
+        with self.assertRaises(Http404):
+            REFERENTIEL_ENSEIGNANTS.verifier(autre.id + 1)
+
+
+@override_settings(INSTRUMENTATION_SQL=True)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        AGREGATS.vider()
+        for i in range(3):
+            creer_eleve(f"Eleve{i}")
+
+    def test_requetes_comptees_par_route(self):
+        with self.assertLogs("performance", "INFO") as journal, CaptureQueriesContext(
+            connection
+        ) as requetes:
+            reponse = self.client.get("/api/eleves/eleves/")
+        nombre = len(requetes.captured_queries)
+
+        self.assertIn(f'desc="{nombre} requetes"', reponse["Server-Timing"])
+        ligne = json.loads(journal.records[-1].getMessage())
+        self.assertEqual((ligne["route"], ligne["requetes"]), ("GET api/eleves/eleves/", nombre))
+        agregat = AGREGATS.instantane()["GET api/eleves/eleves/"]
+        self.assertEqual(agregat["appels"], 1)
+        self.assertEqual(agregat["requetes_max"], nombre)
+        self.assertEqual(agregat["taille_moyenne_octets"], len(reponse.content))
+        self.assertIsNotNone(agregat["requete_plus_lente"])
+
+
+@override_settings(METRIQUES=True, METRIQUES_JETON="jeton", METRIQUES_DOSSIER="")
+class ExpositionMetriquesTests(TestCase):
+    def exposer(self):
+        reponse = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer jeton")
+        self.assertEqual(reponse.status_code, 200)
+        valeurs = {}
+        for ligne in reponse.content.decode().splitlines():
+            if ligne and not ligne.startswith("#"):
+                serie, valeur = ligne.rsplit(" ", 1)
+                valeurs[serie] = float(valeur)
+        return valeurs
+
+    def test_jeton_requis(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+    def test_requetes_et_compteurs_metier(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            creer_session()
+        avant = self.exposer()
+        self.client.get("/api/eleves/eleves/")
+        apres = self.exposer()
+
+        serie = 'peg_requetes_http_total{operation="eleves",statut="200"}'
+        self.assertEqual(apres[serie] - avant.get(serie, 0), 1)
+        duree = 'peg_requetes_http_duree_secondes_count{operation="eleves"}'
+        self.assertEqual(apres[duree] - avant.get(duree, 0), 1)
+        self.assertEqual(apres["peg_sessions_ouvertes"], 1)
+
+
+@override_settings(PROFILAGE=True, PROFILAGE_ECHANTILLON=0)
+class ProfilageTests(TestCase):
+    def test_echantillonneur_releve_la_pile_de_la_requete(self):
+        def vue_lente():
+            time.sleep(0.05)
+
+        profil = EchantillonneurPile()
+        profil.demarrer()
+        try:
+            vue_lente()
+        finally:
+            profil.arreter()
+
+        lignes = profil.resultat().decode().splitlines()
+        self.assertTrue(lignes)
+        pile, nombre = lignes[0].rsplit(" ", 1)
+        self.assertIn("vue_lente (", pile.split(";")[-1])
+        self.assertGreater(int(nombre), 1)
+
+    def test_profil_a_la_demande_reserve_au_staff(self):
+        reponse = self.client.get("/api/eleves/eleves/", {"__profile": "pstats"})
+        self.assertFalse(reponse.has_header("X-Profil-Statut"))
+
+        self.client.force_login(
+            User.objects.create_user("admin", password="x", is_staff=True)
+        )
+        reponse = self.client.get("/api/eleves/eleves/", {"__profile": "pstats"})
+
+        self.assertEqual(reponse["X-Profil-Statut"], "200")
+        self.assertTrue(reponse["Content-Disposition"].endswith('_eleves_%d.pstats"' % os.getpid()))
+        statistiques_profil = marshal.loads(reponse.content)
+        self.assertTrue(any(nom == "eleves" for _, _, nom in statistiques_profil))
+
+    def test_profil_renvoye_si_le_dossier_est_inutilisable(self):
+        self.client.force_login(User.objects.create_user("admin", password="x", is_staff=True))
+        with tempfile.NamedTemporaryFile() as fichier:
+            with self.settings(PROFILAGE_DOSSIER=fichier.name):
+                with self.assertLogs("performance", "ERROR"):
+                    reponse = self.client.get("/api/eleves/eleves/", {"__profile": "pstats"})
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse["X-Profil-Statut"], "200")
+        self.assertTrue(marshal.loads(reponse.content))
+
+    def test_profils_en_fond_limites_en_nombre(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            with self.settings(PROFILAGE_ECHANTILLON=1, PROFILAGE_DOSSIER=dossier):
+                with self.assertLogs("performance", "INFO"):
+                    self.assertEqual(self.client.get("/api/eleves/eleves/").status_code, 200)
+            self.assertEqual(len(os.listdir(dossier)), 1)
+
+            for i in range(4):
+                time.sleep(0.01)  # dates de modification distinctes
+                enregistrer(dossier, f"profil_{i}.collapsed", b"", garder=2)
+            self.assertEqual(sorted(os.listdir(dossier)), ["profil_2.collapsed", "profil_3.collapsed"])
+
+
+class GenerateurTests(TestCase):
+    fixtures = ["pays"]
+    reference = date(2025, 6, 2)
+
+    def generer(self):
+        generateur = Generateur(echelle=0.005, reference=self.reference, journal=lambda _: None)
+        crees = generateur.generer()
+        generateur.finaliser(indexer=False)
+        return crees
+
+    def empreinte(self):
+        return (
+            list(Eleve.objects.order_by("id").values_list("nom", "prenom", "email", "date_naissance")),
+            list(Paiement.objects.order_by("id").values_list("facture_id", "montant", "date_paiement")),
+        )
+
+    def test_meme_graine_memes_donnees(self):
+        with transaction.atomic():
+            self.generer()
+            premiere = self.empreinte()
+            transaction.set_rollback(True)
+        self.generer()
+
+        self.assertEqual(self.empreinte(), premiere)
+
+    def test_donnees_coherentes(self):
+        crees = self.generer()
+
+        self.assertEqual(crees["eleves.Eleve"], 250)
+        emails = Eleve.objects.values_list("email", flat=True)
+        self.assertEqual(len(set(emails)), len(emails))
+        # Facture liée à une inscription, ou à un cours privé et un élève
+        self.assertFalse(
+            Facture.objects.filter(
+                Q(inscription__isnull=True, cours_prive__isnull=True)
+                | Q(inscription__isnull=False, cours_prive__isnull=False)
+                | Q(cours_prive__isnull=False, eleve__isnull=True)
+            ).exists()
+        )
+        def sommes(modele):
+            return dict(
+                modele.objects.values("facture_id")
+                .annotate(s=Sum("montant"))
+                .values_list("facture_id", "s")
+            )
+
+        totaux, payes = sommes(DetailFacture), sommes(Paiement)
+        self.assertTrue(payes)
+        for facture_id, paye in payes.items():
+            self.assertLessEqual(paye, totaux[facture_id])
+        # finaliser : statuts, impayés et compteurs identiques à un recalcul
+        statuts = dict(Eleve.objects.values_list("id", "statut_inscription"))
+        impayees = dict(Facture.objects.values_list("id", "impayee"))
+        compteurs = valeurs()
+        actualiser_statut_inscription()
+        actualiser_factures_impayees()
+        self.assertEqual(dict(Eleve.objects.values_list("id", "statut_inscription")), statuts)
+        self.assertEqual(dict(Facture.objects.values_list("id", "impayee")), impayees)
+        self.assertEqual(recalculer(), compteurs)
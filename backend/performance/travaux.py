@@ -0,0 +1,12 @@
+from django.db import transaction
+
+from taches.file import travail
+
+from .compteurs import recalculer
+
+
+@travail("recalculer_compteurs", tentatives=3)
+def recalculer_compteurs():
+    with transaction.atomic():
+        valeurs = recalculer()
+    return {nom: str(valeur) for nom, valeur in valeurs.items()}
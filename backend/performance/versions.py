@@ -0,0 +1,60 @@
+"""
+Versions des tables métier.
+
+Chaque écriture sur un modèle des apps versionnées incrémente la version de
+sa table après le commit (signaux dans performance.signals). Les mises à
+jour en masse (``.update()``, ``bulk_create``) ne déclenchent pas de
+signaux : le code qui les fait appelle ``incrementer`` lui-même.
+"""
+from typing import Callable, Dict, Iterable, List, Set, Tuple, Type, Union
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import VersionTable
+
+APPS_VERSIONNEES = {"eleves", "cours", "factures"}
+
+Table = Union[str, Type[models.Model]]
+
+# Appelés dans ce processus après chaque incrément, avec les labels concernés
+_abonnes: List[Callable[[Set[str]], None]] = []
+
+
+def abonner(fonction: Callable[[Set[str]], None]) -> None:
+    _abonnes.append(fonction)
+
+
+def label(table: Table) -> str:
+    return table if isinstance(table, str) else table._meta.label_lower
+
+
+def incrementer(*tables: Table) -> None:
+    labels = {label(t) for t in tables}
+    # Après le commit : une version ne doit jamais désigner des données
+    # qu'un autre client ne peut pas encore lire.
+    transaction.on_commit(lambda: _incrementer(labels))
+
+
+def _incrementer(labels: Set[str]) -> None:
+    maintenant = timezone.now()
+    for nom in labels:
+        modifiees = VersionTable.objects.filter(nom=nom).update(
+            version=models.F("version") + 1, date_modification=maintenant
+        )
+        if not modifiees:
+            VersionTable.objects.get_or_create(
+                nom=nom, defaults={"version": 1, "date_modification": maintenant}
+            )
+    for fonction in _abonnes:
+        fonction(labels)
+
+
+def lire_versions(tables: Iterable[Table]) -> Dict[str, Tuple[int, object]]:
+    """{label: (version, date_modification)} en une requête ; absente = jamais modifiée."""
+    return {
+        nom: (version, date)
+        for nom, version, date in VersionTable.objects.filter(
+            nom__in=[label(t) for t in tables]
+        ).values_list("nom", "version", "date_modification")
+    }
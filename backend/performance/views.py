@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from .compteurs import JAUGES, valeurs
+from .metriques import REGISTRE, jauges
+
+
+@require_GET
+def metriques(request):
+    """Exposition texte des métriques de tous les workers et des compteurs métier."""
+    jeton = settings.METRIQUES_JETON
+    if jeton and request.headers.get("Authorization") != f"Bearer {jeton}":
+        return HttpResponse("Non autorisé", status=401)
+
+    compteurs = valeurs()
+    lignes = REGISTRE.exposition() + jauges(
+        [(metrique, aide, compteurs.get(nom, 0)) for nom, metrique, aide in JAUGES]
+    )
+    return HttpResponse(
+        "\n".join(lignes) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,65 @@
+import re
+from django.db.models import Count, Sum
+from ninja import Router
+
+from backend_ecole_peg.routage import lecture_replica
+
+from .indexation import LONGUEUR_MIN_PREFIXE, terme_telephone, tokeniser
+from .models import DocumentRecherche, TermeRecherche
+from .schemas import ResultatRechercheOut
+
+router = Router()
+
+LIMITE_RESULTATS = 50
+
+
+def termes_requete(q: str) -> list[str]:
+    # Une saisie qui ressemble à un numéro de téléphone cherche par la fin du numéro
+    if re.fullmatch(r"[\d\s\-\+\(\)\.]+", q.strip()) and len(re.sub(r"\D", "", q)) >= 6:
+        return [terme_telephone(q)]
+
+    return [
+        t
+        for t in dict.fromkeys(tokeniser(q))
+        if len(t) >= LONGUEUR_MIN_PREFIXE or t.isdigit()
+    ]
+
+
+# ------------------- RECHERCHE GLOBALE -------------------
+@router.get("/", response=list[ResultatRechercheOut])
+@lecture_replica
+def recherche(request, q: str, limite: int = 20):
+    """
+    Recherche dans les élèves, garants, enseignants, factures et commentaires.
+    Un objet n'est retourné que s'il correspond à tous les mots saisis ;
+    les résultats sont classés par score (mots complets avant les préfixes).
+    """
+    termes = termes_requete(q)
+    if not termes:
+        return []
+    limite = max(1, min(limite, LIMITE_RESULTATS))
+
+    # Intersection et score en SQL : un document doit porter chacun des termes
+    # (au plus une ligne par terme et par document), classé par poids cumulé
+    classement = list(
+        TermeRecherche.objects.filter(terme__in=termes)
+        .values("document_id")
+        .annotate(n=Count("terme", distinct=True), score=Sum("poids"))
+        .filter(n=len(termes))
+        .order_by("-score", "-document_id")
+        .values_list("score", "document_id")[:limite]
+    )
+
+    documents = DocumentRecherche.objects.in_bulk([d for _, d in classement])
+    return [
+        {
+            "type": documents[d].type_objet,
+            "id": documents[d].id_objet,
+            "libelle": documents[d].libelle,
+            "detail": documents[d].detail,
+            "id_eleve": documents[d].id_eleve,
+            "score": score,
+        }
+        for score, d in classement
+        if d in documents
+    ]
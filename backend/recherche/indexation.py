@@ -0,0 +1,240 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+
+from cours.models import Enseignant
+from eleves.models import Commentaire, Eleve, Garant
+from factures.models import Facture
+from .models import DocumentRecherche, TermeRecherche, TypeObjetChoices
+
+LONGUEUR_MAX_TERME = 100
+LONGUEUR_MIN_PREFIXE = 2
+LONGUEUR_MAX_PREFIXE = 20
+PREFIXE_TELEPHONE = "#"
+
+POIDS_IDENTIFIANT = 5
+POIDS_FORT = 3
+POIDS_FAIBLE = 1
+
+TYPES_PAR_MODELE = {
+    Eleve: TypeObjetChoices.ELEVE,
+    Garant: TypeObjetChoices.GARANT,
+    Enseignant: TypeObjetChoices.ENSEIGNANT,
+    Facture: TypeObjetChoices.FACTURE,
+    Commentaire: TypeObjetChoices.COMMENTAIRE,
+}
+
+
+# ------------------- NORMALISATION -------------------
+def normaliser(texte: str) -> str:
+    """Minuscules et suppression des accents ("Éloïse" -> "eloise")."""
+    texte = unicodedata.normalize("NFKD", texte)
+    return "".join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def tokeniser(texte: Optional[str]) -> List[str]:
+    if not texte:
+        return []
+    return [t[:LONGUEUR_MAX_TERME] for t in re.split(r"[^0-9a-z]+", normaliser(texte)) if t]
+
+
+def terme_telephone(texte: Optional[str]) -> Optional[str]:
+    """
+    Les numéros sont indexés à l'envers pour qu'une recherche par préfixe
+    sur l'index trouve les numéros par leur fin : "079 123 45 67" retrouve
+    "+41 79 123 45 67" quel que soit l'indicatif saisi.
+    """
+    chiffres = re.sub(r"\D", "", texte or "").lstrip("0")
+    if not chiffres:
+        return None
+    return (PREFIXE_TELEPHONE + chiffres[::-1])[:LONGUEUR_MAX_TERME]
+
+
+# ------------------- DOCUMENTS -------------------
+def _ajouter(
+    termes: Dict[str, int], valeurs: Iterable[str], poids: int, prefixes: bool = True
+):
+    """
+    Ajoute chaque terme avec un poids doublé, et ses préfixes avec le poids
+    simple : la recherche "dup" devient une égalité sur l'index au lieu d'un
+    LIKE, et "dupont" saisi en entier passe devant "dupontel".
+    """
+    for terme in valeurs:
+        candidats = [(terme, poids * 2)]
+        if prefixes:
+            fin = min(len(terme) - 1, LONGUEUR_MAX_PREFIXE)
+            candidats += [
+                (terme[:n], poids) for n in range(LONGUEUR_MIN_PREFIXE, fin + 1)
+            ]
+        for candidat, p in candidats:
+            if termes.get(candidat, 0) < p:
+                termes[candidat] = p
+
+
+def _eleve_de_facture(facture: Facture) -> Optional[Eleve]:
+    if facture.eleve_id:
+        return facture.eleve
+    if facture.inscription_id:
+        return facture.inscription.eleve
+    return None
+
+
+def construire_document(instance) -> Optional[dict]:
+    """
+    Retourne la description indexable d'une instance :
+    type, libellé, détail, élève lié et termes pondérés.
+    """
+    termes: Dict[str, int] = {}
+
+    if isinstance(instance, (Eleve, Garant)):
+        _ajouter(termes, tokeniser(instance.nom), POIDS_FORT)
+        _ajouter(termes, tokeniser(instance.prenom), POIDS_FORT)
+        _ajouter(termes, tokeniser(instance.email), POIDS_FORT)
+        _ajouter(termes, tokeniser(instance.localite), POIDS_FAIBLE)
+        telephone = terme_telephone(instance.telephone)
+        if telephone:
+            _ajouter(termes, [telephone], POIDS_FORT)
+        est_eleve = isinstance(instance, Eleve)
+        return {
+            "type_objet": TypeObjetChoices.ELEVE if est_eleve else TypeObjetChoices.GARANT,
+            "libelle": f"{instance.nom} {instance.prenom}",
+            "detail": instance.email,
+            "id_eleve": instance.id if est_eleve else None,
+            "termes": termes,
+        }
+
+    if isinstance(instance, Enseignant):
+        _ajouter(termes, tokeniser(instance.nom), POIDS_FORT)
+        _ajouter(termes, tokeniser(instance.prenom), POIDS_FORT)
+        return {
+            "type_objet": TypeObjetChoices.ENSEIGNANT,
+            "libelle": f"{instance.nom} {instance.prenom}",
+            "detail": None,
+            "id_eleve": None,
+            "termes": termes,
+        }
+
+    if isinstance(instance, Facture):
+        eleve = _eleve_de_facture(instance)
+        _ajouter(termes, [str(instance.id)], POIDS_IDENTIFIANT)
+        if eleve:
+            _ajouter(termes, tokeniser(eleve.nom), POIDS_FAIBLE)
+            _ajouter(termes, tokeniser(eleve.prenom), POIDS_FAIBLE)
+        return {
+            "type_objet": TypeObjetChoices.FACTURE,
+            "libelle": f"Facture n°{instance.id}",
+            "detail": f"{eleve.nom} {eleve.prenom}" if eleve else None,
+            "id_eleve": eleve.id if eleve else None,
+            "termes": termes,
+        }
+
+    if isinstance(instance, Commentaire):
+        eleve = instance.eleve
+        _ajouter(termes, tokeniser(instance.commentaire), POIDS_FAIBLE, prefixes=False)
+        return {
+            "type_objet": TypeObjetChoices.COMMENTAIRE,
+            "libelle": f"{eleve.nom} {eleve.prenom}",
+            "detail": instance.commentaire[:255],
+            "id_eleve": eleve.id,
+            "termes": termes,
+        }
+
+    return None
+
+
+# ------------------- MISE À JOUR -------------------
+def indexer(instance):
+    document = construire_document(instance)
+    if document is None:
+        return
+
+    termes = document.pop("termes")
+    with transaction.atomic():
+        doc, _ = DocumentRecherche.objects.update_or_create(
+            type_objet=document.pop("type_objet"),
+            id_objet=instance.id,
+            defaults=document,
+        )
+        TermeRecherche.objects.filter(document=doc).delete()
+        TermeRecherche.objects.bulk_create(
+            [TermeRecherche(document=doc, terme=t, poids=p) for t, p in termes.items()]
+        )
+
+
+def desindexer(type_objet: str, id_objet: int):
+    DocumentRecherche.objects.filter(type_objet=type_objet, id_objet=id_objet).delete()
+
+
+def reindexer_lot(instances: list) -> int:
+    """Réindexe des objets d'un même modèle en quelques requêtes, quel que soit leur nombre."""
+    if not instances:
+        return 0
+    with transaction.atomic():
+        DocumentRecherche.objects.filter(
+            type_objet=TYPES_PAR_MODELE[type(instances[0])],
+            id_objet__in=[i.id for i in instances],
+        ).delete()
+        return _indexer_lot(instances)
+
+
+def _indexer_lot(instances: list) -> int:
+    documents = [(i, construire_document(i)) for i in instances]
+    documents = [(i, d) for i, d in documents if d is not None]
+    if not documents:
+        return 0
+
+    type_objet = documents[0][1]["type_objet"]
+    DocumentRecherche.objects.bulk_create(
+        [
+            DocumentRecherche(
+                type_objet=d["type_objet"],
+                id_objet=i.id,
+                libelle=d["libelle"],
+                detail=d["detail"],
+                id_eleve=d["id_eleve"],
+            )
+            for i, d in documents
+        ]
+    )
+    # Relecture des clés : MySQL ne les renvoie pas après un bulk_create.
+    ids_documents = dict(
+        DocumentRecherche.objects.filter(
+            type_objet=type_objet, id_objet__in=[i.id for i, _ in documents]
+        ).values_list("id_objet", "id")
+    )
+    TermeRecherche.objects.bulk_create(
+        [
+            TermeRecherche(document_id=ids_documents[i.id], terme=t, poids=p)
+            for i, d in documents
+            for t, p in d["termes"].items()
+        ],
+        batch_size=5000,
+    )
+    return len(documents)
+
+
+def reconstruire(taille_lot: int = 1000) -> int:
+    """Vide et reconstruit entièrement l'index. Retourne le nombre de documents."""
+    sources = [
+        Eleve.objects.all(),
+        Garant.objects.all(),
+        Enseignant.objects.all(),
+        Facture.objects.select_related("eleve", "inscription__eleve"),
+        Commentaire.objects.select_related("eleve"),
+    ]
+
+    total = 0
+    with transaction.atomic():
+        TermeRecherche.objects.all().delete()
+        DocumentRecherche.objects.all().delete()
+        for qs in sources:
+            lot = []
+            for instance in qs.order_by("id").iterator(chunk_size=taille_lot):
+                lot.append(instance)
+                if len(lot) >= taille_lot:
+                    total += _indexer_lot(lot)
+                    lot = []
+            total += _indexer_lot(lot)
+    return total
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from recherche.indexation import reconstruire
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement l'index de la recherche globale"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lot", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = reconstruire(taille_lot=options["lot"])
+        self.stdout.write(self.style.SUCCESS(f"{total} objets indexés."))
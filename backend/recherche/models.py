@@ -0,0 +1,35 @@
+from django.db import models
+
+
+class TypeObjetChoices(models.TextChoices):
+    ELEVE = "eleve", "Élève"
+    GARANT = "garant", "Garant"
+    ENSEIGNANT = "enseignant", "Enseignant"
+    FACTURE = "facture", "Facture"
+    COMMENTAIRE = "commentaire", "Commentaire"
+
+
+class DocumentRecherche(models.Model):
+    """Un objet indexé : ce qui est renvoyé tel quel dans les résultats."""
+
+    type_objet = models.CharField(max_length=11, choices=TypeObjetChoices.choices)
+    id_objet = models.PositiveBigIntegerField()
+    libelle = models.CharField(max_length=255)
+    detail = models.CharField(max_length=255, blank=True, null=True)
+    id_eleve = models.PositiveBigIntegerField(blank=True, null=True)
+
+    class Meta:
+        unique_together = (("type_objet", "id_objet"),)
+
+
+class TermeRecherche(models.Model):
+    """Index inversé : un terme normalisé (ou un de ses préfixes) pointe vers un document."""
+
+    terme = models.CharField(max_length=100)
+    poids = models.PositiveSmallIntegerField(default=1)
+    document = models.ForeignKey(
+        DocumentRecherche, on_delete=models.CASCADE, related_name="termes"
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["terme", "poids"])]
@@ -0,0 +1,12 @@
+from typing import Optional
+from ninja import Schema
+
+
+# ------------------- RECHERCHE -------------------
+class ResultatRechercheOut(Schema):
+    type: str
+    id: int
+    libelle: str
+    detail: Optional[str] = None
+    id_eleve: Optional[int] = None
+    score: int
@@ -0,0 +1,54 @@
+from django.db.models import Q
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from cours.models import Enseignant
+from eleves.models import Eleve, Garant, Commentaire
+from factures.models import Facture
+from .indexation import indexer, desindexer, reindexer_lot, TYPES_PAR_MODELE
+
+# Champs de l'élève repris dans les documents de ses factures et commentaires
+CHAMPS_ELEVE_DEPENDANTS = ("nom", "prenom")
+
+
+def _champs_dependants(instance):
+    # __dict__ : un champ différé (only/defer) ne déclenche pas de requête
+    return tuple(instance.__dict__.get(champ) for champ in CHAMPS_ELEVE_DEPENDANTS)
+
+
+@receiver(post_init, sender=Eleve)
+def memoriser_champs_eleve(sender, instance, **kwargs):
+    instance._champs_indexes = _champs_dependants(instance)
+
+
+@receiver(post_save, sender=Eleve)
+@receiver(post_save, sender=Garant)
+@receiver(post_save, sender=Enseignant)
+@receiver(post_save, sender=Facture)
+@receiver(post_save, sender=Commentaire)
+def indexer_objet(sender, instance, **kwargs):
+    indexer(instance)
+
+    # Le nom de l'élève apparaît dans les résultats de ses factures et
+    # commentaires : réindexés, par lots, seulement s'il a changé
+    if sender is Eleve:
+        avant, apres = instance._champs_indexes, _champs_dependants(instance)
+        instance._champs_indexes = apres
+        if kwargs.get("created") or avant == apres:
+            return
+        reindexer_lot(
+            list(
+                Facture.objects.filter(
+                    Q(eleve=instance) | Q(inscription__eleve=instance)
+                ).select_related("eleve", "inscription__eleve")
+            )
+        )
+        reindexer_lot(list(instance.commentaires.all()))
+
+
+@receiver(post_delete, sender=Eleve)
+@receiver(post_delete, sender=Garant)
+@receiver(post_delete, sender=Enseignant)
+@receiver(post_delete, sender=Facture)
+@receiver(post_delete, sender=Commentaire)
+def desindexer_objet(sender, instance, **kwargs):
+    desindexer(TYPES_PAR_MODELE[sender], instance.id)
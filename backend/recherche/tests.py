@@ -0,0 +1,120 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from eleves.models import Commentaire
+from eleves.tests import creer_eleve
+from factures.models import Facture
+
+from .models import DocumentRecherche, TermeRecherche, TypeObjetChoices
+
+
+class RechercheTests(TestCase):
+    def rechercher(self, q, **params):
+        reponse = self.client.get("/api/recherche/", {"q": q, **params})
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def test_tous_les_mots_doivent_correspondre(self):
+        dupont = creer_eleve("Dupont", "Marie")
+        creer_eleve("Dupont", "Luc")
+        creer_eleve("Martin", "Marie")
+
+        resultats = self.rechercher("marie dupont")
+
+        self.assertEqual([(r["type"], r["id"]) for r in resultats], [("eleve", dupont.id)])
+
+    def test_mot_complet_avant_prefixe(self):
+        dupont = creer_eleve("Dupont", "Anne")
+        dupontel = creer_eleve("Dupontel", "Anne")
+
+        resultats = self.rechercher("dupont")
+
+        self.assertEqual([r["id"] for r in resultats], [dupont.id, dupontel.id])
+        self.assertGreater(resultats[0]["score"], resultats[1]["score"])
+
+    def test_prefixe_frequent_ne_masque_pas_les_correspondances(self):
+        # Milliers de documents portant « ma » avec un poids supérieur à
+        # celui de l'élève cherché : l'intersection ne doit rien tronquer
+        DocumentRecherche.objects.bulk_create(
+            DocumentRecherche(type_objet=TypeObjetChoices.GARANT, id_objet=i, libelle="x")
+            for i in range(1, 6001)
+        )
+        TermeRecherche.objects.bulk_create(
+            (TermeRecherche(document=d, terme="ma", poids=6) for d in DocumentRecherche.objects.all()),
+            batch_size=2000,
+        )
+        cible = creer_eleve("Dupont", "Marc")
+
+        resultats = self.rechercher("ma dupont")
+
+        self.assertEqual([(r["type"], r["id"]) for r in resultats], [("eleve", cible.id)])
+
+    def test_nombre_de_requetes_constant(self):
+        for i in range(20):
+            creer_eleve("Dupont", f"Prenom{i}")
+
+        with self.assertNumQueries(2):
+            resultats = self.rechercher("dupont", limite=50)
+        self.assertEqual(len(resultats), 20)
+
+
+class ReindexationTests(TestCase):
+    def setUp(self):
+        self.eleve = creer_eleve("Dupont", "Marie")
+        self.factures = [Facture.objects.create(eleve=self.eleve) for _ in range(5)]
+        self.commentaires = [
+            Commentaire.objects.create(eleve=self.eleve, commentaire=f"note {i}") for i in range(5)
+        ]
+
+    def documents(self, type_objet):
+        return DocumentRecherche.objects.filter(type_objet=type_objet, id_eleve=self.eleve.id)
+
+    def test_changement_de_nom_reindexe_factures_et_commentaires(self):
+        self.eleve.nom = "Durand"
+        self.eleve.save()
+
+        self.assertEqual(
+            set(self.documents(TypeObjetChoices.FACTURE).values_list("detail", flat=True)),
+            {"Durand Marie"},
+        )
+        self.assertEqual(
+            set(self.documents(TypeObjetChoices.COMMENTAIRE).values_list("libelle", flat=True)),
+            {"Durand Marie"},
+        )
+        self.assertFalse(
+            TermeRecherche.objects.filter(
+                terme="dupont", document__type_objet=TypeObjetChoices.FACTURE
+            ).exists()
+        )
+
+    def requetes_index(self, requetes, instruction):
+        return [q for q in requetes.captured_queries if q["sql"].startswith(instruction)]
+
+    def test_reindexation_par_lots(self):
+        for i in range(20):
+            Facture.objects.create(eleve=self.eleve)
+
+        self.eleve.prenom = "Anne"
+        with CaptureQueriesContext(connection) as requetes:
+            self.eleve.save()
+
+        # Un INSERT pour les 25 factures, un pour les 5 commentaires
+        self.assertEqual(
+            len(self.requetes_index(requetes, 'INSERT INTO "recherche_documentrecherche"')), 2
+        )
+        self.assertEqual(self.documents(TypeObjetChoices.FACTURE).count(), 25)
+
+    def test_sans_changement_de_nom_rien_a_reindexer(self):
+        seul = creer_eleve("Martin", "Luc")
+        requetes_par_eleve = []
+        for eleve in (seul, self.eleve):
+            eleve.telephone = "+41 78 000 00 00"
+            with CaptureQueriesContext(connection) as requetes:
+                eleve.save()
+            requetes_par_eleve.append(
+                [q for q in requetes.captured_queries if '"recherche_' in q["sql"]]
+            )
+
+        # Ses 5 factures et 5 commentaires n'ajoutent aucune requête sur l'index
+        self.assertEqual(len(requetes_par_eleve[1]), len(requetes_par_eleve[0]))
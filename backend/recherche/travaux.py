@@ -0,0 +1,8 @@
+from taches.file import travail
+
+from .indexation import reconstruire
+
+
+@travail("reconstruire_index_recherche", tentatives=3)
+def reconstruire_index_recherche(lot=1000):
+    return {"documents": reconstruire(taille_lot=lot)}
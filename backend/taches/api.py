@@ -0,0 +1,30 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from ninja import Router
+
+from .models import StatutTacheChoices, Tache
+from .schemas import TacheOut
+
+router = Router()
+
+
+# ------------------- TÂCHES -------------------
+@router.get("/{tache_id}/", response=TacheOut)
+def etat_tache(request, tache_id: int):
+    """État d'une tâche de la file, à interroger jusqu'à « Terminée » ou « Échouée »."""
+    return get_object_or_404(Tache, id=tache_id)
+
+
+@router.get("/{tache_id}/fichier/")
+def fichier_tache(request, tache_id: int):
+    """Fichier produit par une tâche terminée (ex. export XLSX)."""
+    tache = get_object_or_404(Tache, id=tache_id, statut=StatutTacheChoices.TERMINEE)
+    chemin = tache.resultat.get("fichier") if isinstance(tache.resultat, dict) else None
+    if not chemin or not default_storage.exists(chemin):
+        raise Http404("Aucun fichier pour cette tâche")
+    return FileResponse(
+        default_storage.open(chemin, "rb"), as_attachment=True, filename=os.path.basename(chemin)
+    )
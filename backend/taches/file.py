@@ -0,0 +1,148 @@
+"""
+File de travaux en base, sans broker.
+
+Déclaration, dans le ``travaux.py`` d'une app (découvert au démarrage) :
+
+    @travail("reconstruire_index_recherche", tentatives=3)
+    def reconstruire_index(lot=1000): ...
+
+Mise en file depuis une vue : ``planifier("reconstruire_index_recherche", lot=500)``
+renvoie la Tache, dont l'état se suit par GET /api/taches/{id}/. La tâche
+n'est visible des workers qu'au commit de la transaction qui l'a créée.
+
+``manage.py worker`` réserve les tâches dues par priorité décroissante
+(``reserver`` : SELECT … FOR UPDATE SKIP LOCKED, plusieurs workers se
+partagent la file sans se bloquer) puis les exécute (``executer``). Une
+erreur remet la tâche en attente après TACHES_BACKOFF_BASE × 2^(tentative-1)
+secondes (plafonné à TACHES_BACKOFF_MAX), jusqu'à ``tentatives_max`` ; une
+tâche restée en cours plus de TACHES_DELAI_EXPIRATION secondes (worker
+arrêté brutalement) est remise en attente par ``reprendre_expirees``.
+"""
+import logging
+import random
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable, Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from backend_ecole_peg.concurrence import verrouiller_libres
+
+from .models import StatutTacheChoices, Tache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Travail:
+    fonction: Callable[..., Any]
+    tentatives: int
+    priorite: int
+
+
+TRAVAUX: Dict[str, Travail] = {}
+
+
+def travail(nom: str, tentatives: int = 5, priorite: int = 0):
+    """Enregistre une fonction (arguments et résultat sérialisables en JSON) sous ``nom``."""
+
+    def enregistrer(fonction):
+        if nom in TRAVAUX and TRAVAUX[nom].fonction is not fonction:
+            raise ValueError(f"Travail déjà enregistré : {nom}")
+        TRAVAUX[nom] = Travail(fonction, tentatives, priorite)
+        return fonction
+
+    return enregistrer
+
+
+def planifier(nom: str, *, priorite: int = None, delai: float = 0, **arguments) -> Tache:
+    if nom not in TRAVAUX:
+        raise ValueError(f"Travail inconnu : {nom}")
+    definition = TRAVAUX[nom]
+    return Tache.objects.create(
+        nom=nom,
+        arguments=arguments,
+        priorite=definition.priorite if priorite is None else priorite,
+        tentatives_max=definition.tentatives,
+        executer_apres=timezone.now() + timedelta(seconds=delai),
+    )
+
+
+# ------------------- WORKER -------------------
+def reserver(nombre: int, worker: str) -> List[int]:
+    """Passe au plus ``nombre`` tâches dues en cours pour ``worker`` ; renvoie leurs ids."""
+    maintenant = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            verrouiller_libres(
+                Tache.objects.filter(
+                    statut=StatutTacheChoices.EN_ATTENTE, executer_apres__lte=maintenant
+                ).order_by("-priorite", "executer_apres", "id")
+            ).values_list("id", flat=True)[:nombre]
+        )
+        if ids:
+            Tache.objects.filter(id__in=ids).update(
+                statut=StatutTacheChoices.EN_COURS,
+                tentatives=F("tentatives") + 1,
+                date_debut=maintenant,
+                date_fin=None,
+                worker=worker,
+            )
+    return ids
+
+
+def delai_nouvel_essai(tentative: int) -> float:
+    delai = min(settings.TACHES_BACKOFF_BASE * 2 ** (tentative - 1), settings.TACHES_BACKOFF_MAX)
+    # ±10 % : des tâches échouées ensemble ne réessaient pas ensemble
+    return delai * random.uniform(0.9, 1.1)
+
+
+def executer(tache_id: int) -> str:
+    """Exécute une tâche réservée et enregistre son issue ; renvoie le statut final."""
+    tache = Tache.objects.get(id=tache_id)
+    try:
+        definition = TRAVAUX.get(tache.nom)
+        if definition is None:
+            tache.tentatives_max = tache.tentatives  # inutile de réessayer
+            raise ValueError(f"Travail inconnu : {tache.nom}")
+        resultat = definition.fonction(**tache.arguments)
+    except Exception:
+        tache.erreur = traceback.format_exc()
+        logger.warning("Tâche %s (%s) en erreur :\n%s", tache.id, tache.nom, tache.erreur)
+        if tache.tentatives < tache.tentatives_max:
+            tache.statut = StatutTacheChoices.EN_ATTENTE
+            tache.executer_apres = timezone.now() + timedelta(
+                seconds=delai_nouvel_essai(tache.tentatives)
+            )
+        else:
+            tache.statut = StatutTacheChoices.ECHOUEE
+        tache.date_fin = timezone.now()
+        tache.save(update_fields=["statut", "executer_apres", "erreur", "date_fin", "tentatives_max"])
+    else:
+        tache.statut = StatutTacheChoices.TERMINEE
+        tache.resultat = resultat
+        tache.erreur = ""
+        tache.date_fin = timezone.now()
+        tache.save(update_fields=["statut", "resultat", "erreur", "date_fin"])
+    return tache.statut
+
+
+def reprendre_expirees() -> int:
+    """
+    Tâches en cours depuis plus de TACHES_DELAI_EXPIRATION secondes (worker
+    arrêté en pleine exécution) : remises en attente, ou échouées si elles
+    ont épuisé leurs tentatives.
+    """
+    maintenant = timezone.now()
+    expirees = Tache.objects.filter(
+        statut=StatutTacheChoices.EN_COURS,
+        date_debut__lt=maintenant - timedelta(seconds=settings.TACHES_DELAI_EXPIRATION),
+    )
+    echouees = expirees.filter(tentatives__gte=F("tentatives_max")).update(
+        statut=StatutTacheChoices.ECHOUEE, date_fin=maintenant, erreur="Délai d'exécution dépassé"
+    )
+    return echouees + expirees.update(statut=StatutTacheChoices.EN_ATTENTE, executer_apres=maintenant)
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connections
+
+from taches import processus
+from taches.file import TRAVAUX, reprendre_expirees, reserver
+from taches.models import StatutTacheChoices
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les tâches de la file (taches.Tache) sur un pool de processus ; "
+        "plusieurs workers peuvent tourner en même temps sur la même base"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrence", type=int, default=2, help="Processus d'exécution")
+        parser.add_argument(
+            "--intervalle", type=float, default=settings.TACHES_INTERVALLE,
+            help="Secondes entre deux lectures de la file quand elle est vide",
+        )
+        parser.add_argument(
+            "--une-fois", action="store_true",
+            help="S'arrête dès que la file ne contient plus de tâche due",
+        )
+
+    def handle(self, *args, **options):
+        concurrence = options["concurrence"]
+        if concurrence < 1:
+            raise CommandError("--concurrence doit valoir au moins 1")
+        nom = f"{socket.gethostname()}:{os.getpid()}"
+        self.arret = False
+        signal.signal(signal.SIGTERM, self._arreter)
+        signal.signal(signal.SIGINT, self._arreter)
+
+        self.stdout.write(
+            f"Worker {nom} : {concurrence} processus, travaux : {', '.join(sorted(TRAVAUX)) or '-'}"
+        )
+        en_cours = {}
+        derniere_reprise = 0.0
+        with ProcessPoolExecutor(
+            max_workers=concurrence,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=processus.initialiser,
+        ) as pool:
+            while not self.arret:
+                close_old_connections()  # CONN_MAX_AGE, vérification de la connexion
+                libres = concurrence - len(en_cours)
+                try:
+                    if time.monotonic() - derniere_reprise > settings.TACHES_DELAI_EXPIRATION / 10:
+                        derniere_reprise = time.monotonic()
+                        reprises = reprendre_expirees()
+                        if reprises:
+                            self.stdout.write(self.style.WARNING(f"{reprises} tâche(s) expirée(s) reprise(s)"))
+                    ids = reserver(libres, nom) if libres else []
+                except DatabaseError as erreur:
+                    # Base indisponible ou verrouillée : les tâches en cours continuent
+                    self.stderr.write(f"Lecture de la file impossible : {erreur}")
+                    ids = []
+                for tache_id in ids:
+                    en_cours[pool.submit(processus.executer, tache_id)] = tache_id
+
+                if not en_cours:
+                    if options["une_fois"]:
+                        break
+                    time.sleep(options["intervalle"])
+                    continue
+                # Une tâche terminée libère une place : relire la file aussitôt
+                terminees, _ = wait(en_cours, timeout=options["intervalle"], return_when=FIRST_COMPLETED)
+                for future in terminees:
+                    self._rapporter(en_cours.pop(future), future)
+
+            if en_cours:
+                self.stdout.write(f"Arrêt : attente de {len(en_cours)} tâche(s) en cours")
+            for future in list(en_cours):
+                self._rapporter(en_cours.pop(future), future)
+        connections.close_all()
+
+    def _arreter(self, *args):
+        self.arret = True
+
+    def _rapporter(self, tache_id, future):
+        try:
+            statut = future.result()
+        except Exception as erreur:  # processus d'exécution tué
+            self.stderr.write(f"Tâche {tache_id} : {erreur!r}")
+            return
+        self.stdout.write(f"Tâche {tache_id} : {StatutTacheChoices(statut).label}")
@@ -0,0 +1,51 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class StatutTacheChoices(models.TextChoices):
+    EN_ATTENTE = "A", "En attente"
+    EN_COURS = "C", "En cours"
+    TERMINEE = "T", "Terminée"
+    ECHOUEE = "E", "Échouée"
+
+
+class Tache(models.Model):
+    """
+    Travail en file d'attente (voir taches.file) : exécuté hors requête par
+    ``manage.py worker``, réessayé avec un délai croissant en cas d'erreur.
+    """
+
+    nom = models.CharField(max_length=100)
+    arguments = models.JSONField(default=dict, blank=True)
+    priorite = models.SmallIntegerField(default=0)  # la plus haute d'abord
+    statut = models.CharField(
+        max_length=1,
+        choices=StatutTacheChoices.choices,
+        default=StatutTacheChoices.EN_ATTENTE,
+    )
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    tentatives_max = models.PositiveSmallIntegerField(default=5)
+    executer_apres = models.DateTimeField(default=timezone.now)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    resultat = models.JSONField(null=True, blank=True)
+    erreur = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-date_creation"]
+        indexes = [
+            models.Index(fields=["statut", "date_debut"]),
+            # Index partiel (PostgreSQL, SQLite ; ignoré par MySQL/MariaDB)
+            models.Index(
+                fields=["-priorite", "executer_apres", "id"],
+                condition=Q(statut=StatutTacheChoices.EN_ATTENTE),
+                name="tache_a_faire_idx",
+            ),
+            models.Index(fields=["statut", "-priorite", "executer_apres"]),
+        ]
+
+    def __str__(self):
+        return f"{self.nom} #{self.pk} ({self.get_statut_display()})"
@@ -0,0 +1,28 @@
+"""
+Côté processus d'exécution de ``manage.py worker``.
+
+Les processus sont lancés par « spawn » (aucune connexion à la base héritée
+du worker) : ce module est réimporté avant que Django soit chargé, il
+n'importe donc rien qui touche aux modèles avant ``initialiser``.
+"""
+import signal
+
+
+def initialiser():
+    import django
+
+    django.setup()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # l'arrêt passe par le worker
+
+
+def executer(tache_id):
+    from django.db import close_old_connections
+
+    from .file import executer as executer_tache
+
+    # Comme une requête : connexion vérifiée avant, rendue après
+    close_old_connections()
+    try:
+        return executer_tache(tache_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Any, Optional
+from ninja import Schema
+
+
+# ------------------- TÂCHES -------------------
+class TacheOut(Schema):
+    id: int
+    nom: str
+    statut: str
+    statut_libelle: str
+    priorite: int
+    tentatives: int
+    tentatives_max: int
+    date_creation: datetime
+    executer_apres: datetime
+    date_debut: Optional[datetime] = None
+    date_fin: Optional[datetime] = None
+    resultat: Optional[Any] = None
+    erreur: str = ""
+
+    @staticmethod
+    def resolve_statut_libelle(obj):
+        return obj.get_statut_display()
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from backend_ecole_peg.concurrence import verrouiller_libres
+
+from .file import (
+    TRAVAUX,
+    delai_nouvel_essai,
+    executer,
+    planifier,
+    reprendre_expirees,
+    reserver,
+    travail,
+)
+from .models import StatutTacheChoices, Tache
+
+
+def _additionner(a, b):
+    return a + b
+
+
+def _echouer():
+    raise RuntimeError("service indisponible")
+
+
+@override_settings(TACHES_BACKOFF_BASE=10, TACHES_BACKOFF_MAX=60, TACHES_DELAI_EXPIRATION=600)
+class FileTests(TestCase):
+    def setUp(self):
+        for nom, fonction, tentatives in (
+            ("test_additionner", _additionner, 5),
+            ("test_echouer", _echouer, 2),
+        ):
+            travail(nom, tentatives=tentatives)(fonction)
+            self.addCleanup(TRAVAUX.pop, nom)
+
+    def test_reservation_par_priorite_des_taches_dues(self):
+        basse = planifier("test_additionner", a=1, b=2)
+        haute = planifier("test_additionner", priorite=5, a=1, b=2)
+        planifier("test_additionner", delai=60, a=1, b=2)
+
+        self.assertEqual(reserver(5, "w1"), [haute.id, basse.id])
+        # Déjà en cours ou pas encore due : rien pour un second worker
+        self.assertEqual(reserver(5, "w2"), [])
+
+        haute.refresh_from_db()
+        self.assertEqual(
+            (haute.statut, haute.tentatives, haute.worker), (StatutTacheChoices.EN_COURS, 1, "w1")
+        )
+
+    def test_lignes_verrouillees_sautees(self):
+        with mock.patch.object(connection.features, "has_select_for_update_skip_locked", True):
+            requete = verrouiller_libres(Tache.objects.all()).query
+        self.assertTrue(requete.select_for_update)
+        self.assertTrue(requete.select_for_update_skip_locked)
+
+    def test_tache_terminee(self):
+        tache = planifier("test_additionner", a=1, b=2)
+        (tache_id,) = reserver(1, "w1")
+
+        self.assertEqual(executer(tache_id), StatutTacheChoices.TERMINEE)
+
+        reponse = self.client.get(f"/api/taches/{tache.id}/")
+        self.assertEqual(reponse.json()["resultat"], 3)
+        self.assertEqual(reponse.json()["statut_libelle"], "Terminée")
+
+    def test_nouvel_essai_differe_puis_echec(self):
+        tache = planifier("test_echouer")
+
+        with self.assertLogs("taches.file", "WARNING"):
+            self.assertEqual(executer(reserver(1, "w1")[0]), StatutTacheChoices.EN_ATTENTE)
+        tache.refresh_from_db()
+        delai = (tache.executer_apres - tache.date_fin).total_seconds()
+        self.assertTrue(9 <= delai <= 11, delai)
+        self.assertIn("service indisponible", tache.erreur)
+        self.assertEqual(reserver(1, "w1"), [])
+
+        Tache.objects.filter(id=tache.id).update(executer_apres=timezone.now())
+        with self.assertLogs("taches.file", "WARNING"):
+            self.assertEqual(executer(reserver(1, "w1")[0]), StatutTacheChoices.ECHOUEE)
+
+    def test_delai_croissant_et_plafonne(self):
+        self.assertTrue(36 <= delai_nouvel_essai(3) <= 44)
+        self.assertTrue(54 <= delai_nouvel_essai(10) <= 66)
+
+    def test_taches_expirees_reprises(self):
+        reprise = planifier("test_additionner", a=1, b=2)
+        epuisee = planifier("test_echouer")
+        reserver(2, "w1")
+        Tache.objects.filter(id=epuisee.id).update(tentatives=2)
+        Tache.objects.update(date_debut=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(reprendre_expirees(), 2)
+
+        reprise.refresh_from_db()
+        epuisee.refresh_from_db()
+        self.assertEqual(reprise.statut, StatutTacheChoices.EN_ATTENTE)
+        self.assertEqual(epuisee.statut, StatutTacheChoices.ECHOUEE)
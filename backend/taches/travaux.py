@@ -0,0 +1,8 @@
+from backend_ecole_peg.exports import ecrire_xlsx
+
+from .file import travail
+
+
+@travail("exporter_xlsx", tentatives=2)
+def exporter_xlsx(export, filtres):
+    return ecrire_xlsx(export, filtres)